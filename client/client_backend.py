@@ -1,10 +1,13 @@
 import logging
+import threading
 
 import utils.messages.message_formats as msg
+import local_store
 import uome
-from utils.crypto import rsa
+from utils.crypto import merkle, rsa
 from utils.messages.connection import connect, ConflictError, ForbiddenError, \
     UnauthorizedError, NotFoundError
+from utils.messages.uome_tools import UOMeTools
 
 
 class ProtocolError(Exception):
@@ -52,20 +55,40 @@ class Client:
                  group_server_pubkey: str,
                  main_server_pubkey: str,
                  proxy_server_url: str,
-                 email: str, key_path=None, keys=None):
+                 email: str, key_path=None, keys=None, store=None):
 
         self.group_server_url = group_server_url
         self.group_server_pubkey = group_server_pubkey
         self.main_server_pubkey = main_server_pubkey
         self.proxy_server_url = proxy_server_url
         self.email = email
+        # local store of the state obtained from the servers (optional)
+        self.store = store
 
-        if key_path:
-            self.key, self.pubkey = rsa.load_keys(key_path)
-        elif keys:
-            self.key, self.pubkey = keys
-        else:
-            self.key, self.pubkey = rsa.generate_keys()
+        # keys are only loaded or generated when they are first needed
+        self._key_path = key_path
+        self._keys = keys
+        # the keys may first be needed by several background threads at once
+        self._keys_lock = threading.Lock()
+
+    @property
+    def key(self) -> str:
+        return self._get_keys()[0]
+
+    @property
+    def pubkey(self) -> str:
+        return self._get_keys()[1]
+
+    def _get_keys(self):
+        if self._keys is None:
+            with self._keys_lock:
+                if self._keys is None:
+                    if self._key_path:
+                        self._keys = rsa.load_keys(self._key_path)
+                    else:
+                        self._keys = rsa.generate_keys()
+
+        return self._keys
 
     @property
     def id(self) -> str:
@@ -135,7 +158,8 @@ class Client:
                 raise AuthenticationError("Signature verification failed")
 
             try:
-                msg.GroupServerJoin.verify(
+                self._verify(
+                    msg.GroupServerJoin,
                     key=inviter_id,
                     signature_name='invite',
                     signature=response.inviter_signature,
@@ -149,7 +173,8 @@ class Client:
                 raise AuthenticationError("Inviter signature is invalid")
 
             try:
-                msg.GroupServerJoin.verify(
+                self._verify(
+                    msg.GroupServerJoin,
                     key=self.group_server_pubkey,
                     signature_name='group',
                     signature=response.group_signature,
@@ -217,7 +242,8 @@ class Client:
                 raise AuthenticationError("Signature verification failed")
 
             try:
-                msg.IssueUOMe.verify(
+                self._verify(
+                    msg.IssueUOMe,
                     key=self.main_server_pubkey,
                     signature_name='main',
                     signature=response.main_signature,
@@ -268,8 +294,21 @@ class Client:
             issued_by_user = list(map(uome.from_list, response.issued_by_user))
             waiting_for_user = list(map(uome.from_list, response.waiting_for_user))
 
+            if self.store:
+                self.store.replace_pending(issued_by_user, waiting_for_user)
+
             return issued_by_user, waiting_for_user
 
+    def cached_pending_UOMes(self):
+        """
+        Returns the pending UOMes obtained by the last call to pending_UOMes,
+        without contacting the server.
+        """
+        if not self.store:
+            return [], []
+
+        return self.store.pending_UOMes()
+
     def accept_UOMe(self, uome_uuid, loaner: str, value: int, description: str):
         # parameters that are common to the request and user signature
 
@@ -298,7 +337,8 @@ class Client:
                 raise AuthenticationError("Signature verification failed")
 
             try:
-                msg.AcceptUOMe.verify(
+                self._verify(
+                    msg.AcceptUOMe,
                     key=self.main_server_pubkey,
                     signature_name='main',
                     signature=response.main_signature,
@@ -307,12 +347,67 @@ class Client:
                     uome_uuid=uome_uuid,
                 )
 
-                # TODO store signature
-                # TODO store the UOMe-ID
-
             except rsa.InvalidSignature:
                 raise AuthenticationError("Main server signature is invalid")
 
+            if self.store:
+                self.store.set_state(uome_uuid, local_store.ACCEPTED,
+                                     response.main_signature)
+
+    def verify_UOMe_inclusion(self, uome_uuid, loaner: str, borrower: str, value: int,
+                              description: str) -> (int, str):
+        """
+        Checks that an accepted UOMe is in the ledger of the group. The main
+        server provides the signed root of the ledger and the inclusion proof
+        of the UOMe, which is checked against the root.
+
+        :return: the size and the hex root of the ledger the UOMe is in.
+        :raise AuthenticationError: if the root signature or the proof is not valid.
+        """
+        request = self._make_request(
+            request_type=msg.GetInclusionProof,
+            request_params={'uome_uuid': uome_uuid},
+            signature_params={'uome_uuid': uome_uuid}
+        )
+
+        with connect(self.proxy_server_url) as connection:
+            connection.request(request)
+
+            try:
+                response = connection.get_response(msg.GetInclusionProof)
+
+            except NotFoundError:
+                raise UOMeNotFoundError("The UOMe is not in the ledger")
+            except UnauthorizedError:
+                raise AuthenticationError("Signature verification failed")
+
+        try:
+            self._verify(
+                msg.GetInclusionProof,
+                key=self.main_server_pubkey,
+                signature_name='main',
+                signature=response.main_signature,
+                group_uuid=self.GROUP_ID,
+                tree_size=response.tree_size,
+                root=response.root,
+            )
+
+        except rsa.InvalidSignature:
+            raise AuthenticationError("Main server signature is invalid")
+
+        leaf = UOMeTools.leaf(self.GROUP_ID, loaner, borrower, value, description, uome_uuid)
+        try:
+            included = merkle.verify_inclusion(leaf, response.leaf_index, response.tree_size,
+                                               [bytes.fromhex(node) for node in response.proof],
+                                               bytes.fromhex(response.root))
+        except (ValueError, TypeError):  # the hashes are not hex
+            included = False
+
+        if not included:
+            raise AuthenticationError("The inclusion proof of the UOMe is invalid")
+
+        return response.tree_size, response.root
+
     def cancel_UOMe(self, UOMe_number):
         # parameters that are common to the request and user signature
         parameters = {'uome_uuid': UOMe_number}
@@ -337,7 +432,8 @@ class Client:
                 raise AuthenticationError("Signature verification failed")
 
             try:
-                msg.CancelUOMe.verify(
+                self._verify(
+                    msg.CancelUOMe,
                     key=self.main_server_pubkey,
                     signature_name='main',
                     signature=response.main_signature,
@@ -346,12 +442,13 @@ class Client:
                     uome_uuid=UOMe_number,
                 )
 
-                # TODO store signature
-                # TODO store the UOMe-ID
-
             except rsa.InvalidSignature:
                 raise AuthenticationError("Main server signature is invalid")
 
+            if self.store:
+                self.store.set_state(UOMe_number, local_store.CANCELLED,
+                                     response.main_signature)
+
     def totals(self):
         request = self._make_request(request_type=msg.CheckTotals)
 
@@ -368,6 +465,80 @@ class Client:
 
             return response.user_balance, response.suggested_transactions
 
+    def email_key_map(self) -> dict:
+        """
+        Synchronizes the email-key map of the group with the group server.
+        Once the map was obtained, only the users that joined the group
+        afterwards are requested.
+
+        :return: dict mapping the key of each user to its email.
+        """
+        # the cursor is kept per group, it is only valid for the group's map
+        cursor_name = 'email-key-map:%s' % self.GROUP_ID
+        cursor = self.store.get_cursor(cursor_name) if self.store else None
+
+        if cursor is None:
+            message_class = msg.EmailKeyMap
+            parameters = {}
+        else:
+            message_class = msg.EmailKeyMapDelta
+            parameters = {'cursor': cursor}
+
+        parameters['group_uuid'] = self.GROUP_ID
+        parameters['request_type'] = message_class.url
+        signature = message_class.sign(self.key, 'user', **parameters)
+
+        request = message_class.make_request(user=self.id, signature=signature,
+                                             **parameters)
+
+        with connect(self.group_server_url) as connection:
+            connection.request(request)
+
+            try:
+                response = connection.get_response(message_class)
+
+            except ForbiddenError:
+                raise PermissionDeniedError("User is not registered")
+            except UnauthorizedError:
+                raise AuthenticationError("Signature verification failed")
+
+        if not self.store:
+            return {key: email for email, key in response.members}
+
+        self.store.add_members(response.members)
+        self.store.set_cursor(cursor_name, response.cursor)
+
+        return self.store.members()
+
+    def name(self, key: str) -> str:
+        """
+        Returns the name to show for a user: its email if it is known and
+        the key otherwise. Only the local store is used.
+        """
+        email = self.store.email(key) if self.store else None
+        return email or key
+
+    def _verify(self, message_class, key, signature_name, signature, **parameters):
+        """
+        Verifies a signature of a message. Signatures found valid are recorded
+        in the local store and are not verified again.
+
+        :raise InvalidSignature: if the signature is not valid.
+        """
+        if self.store:
+            values = [message_class.__name__, signature_name] + \
+                     message_class._order_signature_parameters(signature_name,
+                                                                **parameters)
+
+            if self.store.is_verified(key, signature, *values):
+                return
+
+        message_class.verify(key=key, signature_name=signature_name,
+                             signature=signature, **parameters)
+
+        if self.store:
+            self.store.add_verified(key, signature, *values)
+
     def _make_request(self, request_type, request_params=None,
                       signature_params=None):
 
@@ -98,6 +98,17 @@ class _Configuration:
     def user_key_path(self, value):
         self._parameters["user_key_path"] = value
 
+    @property
+    def store_path(self):
+        try:
+            return self._parameters["store_path"]
+        except KeyError:
+            return os.path.join(self.app_dir, "store.sqlite3")
+
+    @store_path.setter
+    def store_path(self, value):
+        self._parameters["store_path"] = value
+
     @property
     def user_email(self):
         return self._parameters["user_email"]
@@ -1,5 +1,8 @@
 from PyQt5.QtWidgets import QDialog
+from PyQt5.QtWidgets import QMessageBox
+
 from ui_invite import Ui_InviteDialog
+from worker import run_in_background, error_message
 
 
 class InviteDialog(QDialog):
@@ -15,8 +18,12 @@ class InviteDialog(QDialog):
         self.ui.button_box.accepted.connect(self.invite)
 
     def invite(self):
-        self.client.invite(
+        run_in_background(
+            self.client.invite,
             invitee_id=self.ui.id_lineedit.text(),
-            invitee_email=self.ui.email_lineedit.text()
+            invitee_email=self.ui.email_lineedit.text(),
+            on_error=self._show_error
         )
 
+    def _show_error(self, error):
+        QMessageBox.warning(self, "Invite Failed", error_message(error))
@@ -0,0 +1,323 @@
+#
+# Load generator simulating many clients against local servers
+#
+# Provisions a group with the configured number of users and then has the
+# users issue, accept and check UOMes concurrently. At the end it reports
+# the throughput and the latency distribution of each operation.
+#
+# The group server must be running with DEBUG and INVITE_SECRET_CODE set,
+# the load generator uses that code to join the users it invites:
+#
+#   INVITE_SECRET_CODE=1234 python manage.py runserver 8001    (group_server)
+#   python manage.py runserver 8000                            (main_server)
+#   PYTHONPATH=.. python load_generator.py --users 100 --secret-code 1234
+#
+import argparse
+import bisect
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from client_backend import Client
+from utils.crypto import rsa
+from utils.crypto.key_pool import KeyPool
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MIX = "issue=3,accept=2,pending=3,totals=2"
+
+# upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def parse_mix(mix: str) -> dict:
+    """
+    Parses a traffic mix in the format 'operation=weight,...'.
+
+    :raise ValueError: if the mix is malformed or has an unknown operation.
+    """
+    weights = {}
+    for entry in mix.split(","):
+        operation, weight = entry.split("=")
+        operation = operation.strip()
+
+        if operation not in OPERATIONS:
+            raise ValueError("unknown operation: %s" % operation)
+
+        weights[operation] = float(weight)
+
+    return weights
+
+
+#
+# Statistics
+#
+
+class LatencyStats:
+    """ Latencies and errors of each operation, safe to use from threads """
+
+    def __init__(self):
+        self._latencies = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, latency: float, failed=False):
+        with self._lock:
+            if failed:
+                self._errors[operation] = self._errors.get(operation, 0) + 1
+            else:
+                self._latencies.setdefault(operation, []).append(latency)
+
+    def report(self, elapsed: float) -> str:
+        """ Report of the throughput and latencies of each operation """
+        with self._lock:
+            latencies = {operation: sorted(values)
+                         for operation, values in self._latencies.items()}
+            errors = dict(self._errors)
+
+        total = sum(map(len, latencies.values()))
+        lines = ["%d operations in %.1fs: %.1f ops/s, %d errors" % (
+            total, elapsed, total / elapsed if elapsed else 0.0,
+            sum(errors.values()))]
+
+        for operation in sorted(set(latencies) | set(errors)):
+            values = latencies.get(operation, [])
+            lines.append("")
+            lines.append("%s: %d ok, %d errors, %.1f ops/s" % (
+                operation, len(values), errors.get(operation, 0),
+                len(values) / elapsed if elapsed else 0.0))
+
+            if not values:
+                continue
+
+            lines.append("  p50 %.1fms  p90 %.1fms  p99 %.1fms  max %.1fms" % tuple(
+                percentile(values, p) * 1000 for p in (50, 90, 99, 100)))
+            lines.extend("  " + line for line in histogram(values))
+
+        return "\n".join(lines)
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """ Returns the p-th percentile of a sorted list of values """
+    index = max(0, int(round(p / 100 * len(sorted_values))) - 1)
+    return sorted_values[index]
+
+
+def histogram(sorted_values: list, width=40) -> list:
+    """ Draws the distribution of the latencies in lines of text """
+    counts = [0] * (len(LATENCY_BUCKETS) + 1)
+    for value in sorted_values:
+        counts[bisect.bisect_left(LATENCY_BUCKETS, value * 1000)] += 1
+
+    labels = ["<= %dms" % bound for bound in LATENCY_BUCKETS] + \
+             ["> %dms" % LATENCY_BUCKETS[-1]]
+    largest = max(counts)
+
+    return ["%10s %6d %s" % (label, count, "#" * (count * width // largest))
+            for label, count in zip(labels, counts) if count]
+
+
+#
+# Provisioning
+#
+
+def create_group(owner_pubkey: str, group_server_dir: str, name: str) -> str:
+    """
+    Creates a group with the given owner by running the 'create_group'
+    command of the group server, which registers it in the main server.
+
+    :return: uuid of the group.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        key_path = os.path.join(tmp_dir, "owner.pem")
+        rsa.dump_pubkey(owner_pubkey, key_path)
+
+        output = subprocess.check_output(
+            [sys.executable, "manage.py", "create_group", name,
+             "--owner-key", key_path, "--owner-email", "owner@load.test"],
+            cwd=group_server_dir
+        )
+
+    return output.decode().strip().splitlines()[-1]
+
+
+def make_client(args, keys, email, group_uuid) -> Client:
+    client = Client(
+        group_server_url=args.group_server_url,
+        group_server_pubkey=args.group_server_pubkey,
+        main_server_pubkey=args.main_server_pubkey,
+        proxy_server_url=args.proxy_server_url,
+        email=email,
+        keys=keys,
+    )
+    client.GROUP_ID = group_uuid
+
+    return client
+
+
+def join(owner: Client, user: Client, secret_code: str):
+    """ Has the owner invite a user and the user join the group """
+    owner.invite(user.id, user.email)
+    inviter_signature, group_signature = user.join(secret_code, owner.id)
+    user.confirm_join(group_signature)
+
+
+def provision(args, keys: list) -> list:
+    """
+    Creates the group and joins every simulated user.
+
+    :return: list with a client for each user.
+    """
+    owner_keys, user_keys = keys[0], keys[1:]
+
+    group_uuid = args.group_uuid or create_group(
+        owner_keys[1], args.group_server_dir, "load-test-%d" % int(time.time()))
+
+    owner = make_client(args, owner_keys, "owner@load.test", group_uuid)
+    users = [make_client(args, keys, "user%d@load.test" % index, group_uuid)
+             for index, keys in enumerate(user_keys)]
+
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        for future in [executor.submit(join, owner, user, args.secret_code)
+                       for user in users]:
+            future.result()
+
+    return users
+
+
+#
+# Traffic
+#
+
+def issue(user: Client, users: list, rng: random.Random):
+    borrower = rng.choice(users)
+    while borrower is user:
+        borrower = rng.choice(users)
+
+    value = rng.randint(1, 10000)
+    uome_uuid, main_signature = user.issue_UOMe(borrower.id, value, "load test")
+    user.confirm_UOMe(uome_uuid, borrower.id, value, "load test")
+
+
+def accept(user: Client, users: list, rng: random.Random):
+    issued_by_user, waiting_for_user = user.pending_UOMes()
+
+    if waiting_for_user:
+        uome = rng.choice(waiting_for_user)
+        user.accept_UOMe(uome.uuid, uome.user, uome.value, uome.description)
+
+
+def pending(user: Client, users: list, rng: random.Random):
+    user.pending_UOMes()
+
+
+def totals(user: Client, users: list, rng: random.Random):
+    user.totals()
+
+
+OPERATIONS = {
+    'issue': issue,
+    'accept': accept,
+    'pending': pending,
+    'totals': totals,
+}
+
+
+def run_traffic(users: list, mix: dict, concurrency: int, duration: float,
+                stats: LatencyStats, seed=None):
+    """
+    Runs operations chosen according to the mix, each by a random user, from
+    'concurrency' threads for 'duration' seconds.
+    """
+    operations = list(mix)
+    weights = [mix[operation] for operation in operations]
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_seed):
+        rng = random.Random(worker_seed)
+
+        while time.perf_counter() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            user = rng.choice(users)
+
+            start = time.perf_counter()
+            try:
+                OPERATIONS[operation](user, users, rng)
+            except Exception:
+                stats.record(operation, time.perf_counter() - start, failed=True)
+            else:
+                stats.record(operation, time.perf_counter() - start)
+
+    rng = random.Random(seed)
+    threads = [threading.Thread(target=worker, args=(rng.random(),))
+               for _ in range(concurrency)]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simulates many clients against local servers")
+    parser.add_argument("--users", type=int, default=100,
+                        help="number of simulated users")
+    parser.add_argument("--concurrency", type=int, default=20,
+                        help="number of concurrent requests")
+    parser.add_argument("--duration", type=float, default=60,
+                        help="seconds of traffic after provisioning")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help="weight of each operation (default: %s)" % DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, help="seed of the random choices")
+    parser.add_argument("--group-uuid",
+                        help="existing group, owned by the first cached key")
+    parser.add_argument("--secret-code", required=True,
+                        help="INVITE_SECRET_CODE of the group server")
+    parser.add_argument("--group-server-url", default="localhost:8001")
+    parser.add_argument("--proxy-server-url", default="localhost:8000")
+    parser.add_argument("--group-server-dir",
+                        default=os.path.join(HERE, "..", "group_server"))
+    parser.add_argument("--main-server-dir",
+                        default=os.path.join(HERE, "..", "main_server"))
+    parser.add_argument("--key-cache", default=os.path.join(
+                            tempfile.gettempdir(), "group_bank_load_keys.json"),
+                        help="key pool file, missing keys are generated and added")
+
+    args = parser.parse_args(argv)
+    args.mix = parse_mix(args.mix)
+
+    # the servers' keys are read from their directories
+    args.group_server_pubkey = rsa.load_keys(
+        os.path.join(args.group_server_dir, "server_keys.pem"))[1]
+    args.main_server_pubkey = rsa.load_keys(
+        os.path.join(args.main_server_dir, "server_keys.pem"))[1]
+
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    start = time.perf_counter()
+    keys = KeyPool(args.key_cache).take(args.users + 1)
+    print("loaded %d keys in %.1fs" % (len(keys), time.perf_counter() - start))
+
+    start = time.perf_counter()
+    users = provision(args, keys)
+    print("provisioned %d users in %.1fs" % (len(users), time.perf_counter() - start))
+
+    stats = LatencyStats()
+    start = time.perf_counter()
+    run_traffic(users, args.mix, args.concurrency, args.duration, stats, args.seed)
+
+    print(stats.report(time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
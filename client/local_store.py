@@ -0,0 +1,187 @@
+#
+# Local store of the client
+#
+import hashlib
+import sqlite3
+import threading
+
+from uome import UOMe
+
+# states of the UOMes kept in the store
+ISSUED = 'issued'  # pending, issued by the user
+WAITING = 'waiting'  # pending, waiting for the user to accept it
+ACCEPTED = 'accepted'
+CANCELLED = 'cancelled'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    fingerprint TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    email TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uomes (
+    uuid TEXT PRIMARY KEY,
+    group_uuid TEXT NOT NULL,
+    user TEXT NOT NULL,
+    borrower TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    main_signature TEXT,
+    state TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uomes_state ON uomes (state);
+CREATE TABLE IF NOT EXISTS verified_signatures (
+    digest TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS sync (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def fingerprint(key: str) -> str:
+    """ Returns the fingerprint of a key: the SHA-256 digest of its PEM """
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _digest(*values) -> str:
+    """
+    Digest of a sequence of values. Each value is prefixed by its length so
+    that different sequences never have the same digest.
+    """
+    digest = hashlib.sha256()
+    for value in values:
+        value = str(value).encode()
+        digest.update(b"%d:" % len(value))
+        digest.update(value)
+
+    return digest.hexdigest()
+
+
+class LocalStore:
+    """
+    On-disk store of the state the client obtained from the servers: the
+    email-key map of the group, the UOMes and the signatures that were
+    already verified. The store lets the client show the last known state
+    immediately and only ask the servers for what changed.
+
+    The store may be used from multiple threads.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: path of the SQLite file, it is created if it does not
+                     exist. Use ':memory:' for a store that is not persisted.
+        """
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _execute(self, sql: str, parameters=()) -> list:
+        with self._lock, self._connection:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _executemany(self, sql: str, parameters):
+        with self._lock, self._connection:
+            self._connection.executemany(sql, parameters)
+
+    #
+    # Email-key map
+    #
+
+    def add_members(self, members):
+        """ Stores a list of [email, key] pairs """
+        self._executemany(
+            "INSERT OR REPLACE INTO members (fingerprint, key, email) "
+            "VALUES (?, ?, ?)",
+            ((fingerprint(key), key, email) for email, key in members)
+        )
+
+    def email(self, key: str):
+        """ Returns the email of the user with the given key or None """
+        rows = self._execute("SELECT email FROM members WHERE fingerprint = ?",
+                             (fingerprint(key),))
+
+        return rows[0][0] if rows else None
+
+    def members(self) -> dict:
+        """ Returns a dict mapping the key of each member to its email """
+        return dict(self._execute("SELECT key, email FROM members"))
+
+    def get_cursor(self, name: str):
+        """ Returns the last synchronized version of some data or None """
+        rows = self._execute("SELECT value FROM sync WHERE name = ?", (name,))
+        return rows[0][0] if rows else None
+
+    def set_cursor(self, name: str, value: int):
+        self._execute("INSERT OR REPLACE INTO sync (name, value) VALUES (?, ?)",
+                      (name, value))
+
+    #
+    # UOMes
+    #
+
+    def replace_pending(self, issued_by_user: list, waiting_for_user: list):
+        """
+        Replaces the pending UOMes with the ones provided. The UOMes that are
+        no longer pending are removed unless they were accepted or cancelled
+        by the user.
+        """
+        rows = [uome + (ISSUED,) for uome in issued_by_user] + \
+               [uome + (WAITING,) for uome in waiting_for_user]
+
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM uomes WHERE state IN (?, ?)",
+                                     (ISSUED, WAITING))
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO uomes (group_uuid, user, borrower, value, "
+                "description, signature, uuid, state) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def pending_UOMes(self):
+        """ Returns the UOMes issued by the user and waiting for the user """
+        rows = self._execute("SELECT group_uuid, user, borrower, value, "
+                             "description, signature, uuid, state FROM uomes "
+                             "WHERE state IN (?, ?) ORDER BY rowid",
+                             (ISSUED, WAITING))
+
+        issued_by_user = [UOMe(*row[:-1]) for row in rows if row[-1] == ISSUED]
+        waiting_for_user = [UOMe(*row[:-1]) for row in rows if row[-1] == WAITING]
+
+        return issued_by_user, waiting_for_user
+
+    def set_state(self, uome_uuid: str, state: str, main_signature: str):
+        """ Stores the new state of a UOMe along with the main server's proof """
+        self._execute("UPDATE uomes SET state = ?, main_signature = ? "
+                      "WHERE uuid = ?", (state, main_signature, uome_uuid))
+
+    def main_signature(self, uome_uuid: str):
+        """ Returns the main server's signature for a UOMe or None """
+        rows = self._execute("SELECT main_signature FROM uomes WHERE uuid = ?",
+                             (uome_uuid,))
+
+        return rows[0][0] if rows else None
+
+    #
+    # Verified signatures
+    #
+
+    def is_verified(self, key: str, signature: str, *values) -> bool:
+        """ Checks if the signature of the values was already verified """
+        rows = self._execute("SELECT 1 FROM verified_signatures WHERE digest = ?",
+                             (_digest(key, signature, *values),))
+        return bool(rows)
+
+    def add_verified(self, key: str, signature: str, *values):
+        """ Records that the signature of the values is valid """
+        self._execute("INSERT OR IGNORE INTO verified_signatures (digest) VALUES (?)",
+                      (_digest(key, signature, *values),))
@@ -5,6 +5,7 @@ from PyQt5.QtWidgets import QMessageBox
 
 from client_backend import Client
 from configuration import config
+from local_store import LocalStore
 from ui_login import Ui_LoginDialog
 from utils.crypto import rsa
 
@@ -93,7 +94,8 @@ class LoginDialog(QDialog):
             main_server_pubkey,
             config.proxy_server_url,
             config.user_email,
-            keys=user_keys
+            keys=user_keys,
+            store=LocalStore(config.store_path)
         )
 
         # Call the accept method of the QDialog
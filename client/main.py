@@ -1,26 +1,32 @@
+# imported first, so the startup report includes the other imports
+import startup
+
 import os
 import sys
 
+from PyQt5.QtCore import QTimer
 from PyQt5.QtWidgets import QApplication
 
 from configuration import config
-from login_dialog import LoginDialog
-from main_window import MainWindow
-from register_dialog import RegisterDialog
 
 
 def main():
     app = QApplication(sys.argv)
+    startup.mark("qt")
 
     if len(sys.argv) > 1:
         config.app_dir = sys.argv[1]
 
+    # dialogs and the crypto backend are only imported when they are needed
+
     if os.path.exists(config.config_path):
         # User is already registered
 
         config.load()
 
+        from login_dialog import LoginDialog
         dialog = LoginDialog()
+        startup.mark("login dialog")
 
         if dialog.exec() != 1:
             print("Error: failed to login user\n"
@@ -34,7 +40,9 @@ def main():
         # User needs to register first
 
         # Present the user with the register dialog
+        from register_dialog import RegisterDialog
         dialog = RegisterDialog()
+        startup.mark("register dialog")
 
         if dialog.exec() != 1:
             print("Error: failed to register user\n"
@@ -44,10 +52,19 @@ def main():
         # Get registered client
         client = dialog.client
 
+    # time spent by the user in the dialog is not part of the startup
+    startup.mark("dialog closed")
+
+    from main_window import MainWindow
     window = MainWindow(client)
-    window.refresh()
     window.adjustSize()
     window.show()
+    startup.mark("main window")
+
+    # the first synchronization starts once the window is shown
+    QTimer.singleShot(0, window.refresh)
+    QTimer.singleShot(0, startup.print_report)
+
     sys.exit(app.exec_())
 
 
@@ -1,9 +1,11 @@
 from PyQt5.QtWidgets import QMainWindow
+from PyQt5.QtWidgets import QMessageBox
 
 from invite_dialog import InviteDialog
 from pending_dialog import PendingWidget
 from ui_main import Ui_MainWindow
 from uome_dialog import UOMeDialog
+from worker import run_in_background, error_message
 
 
 class MainWindow(QMainWindow):
@@ -23,17 +25,24 @@ class MainWindow(QMainWindow):
         self._pending_dialog = None
         self._waiting_dialog = None
 
+        # last totals obtained from the server
+        self._totals = None
+
         self.ui.uome_button.clicked.connect(self.issue_uome)
         self.ui.invite_button.clicked.connect(self.invite)
         self.ui.refresh_button.clicked.connect(self.refresh)
 
         self._pending_widget = PendingWidget(self.client)
         self.ui.main_layout.addWidget(self._pending_widget)
-        self._pending_widget.refresh()
+
+        # the pending list is refreshed once the issued UOMe is confirmed
+        self._uome_dialog.issued.connect(self._pending_widget.refresh)
+
+        # show the last known state right away, refresh synchronizes it
+        self._pending_widget.show_cached()
 
     def issue_uome(self):
         self._uome_dialog.exec()
-        self._pending_widget.refresh()
 
     def invite(self):
         if not self._invite_dialog:
@@ -41,18 +50,40 @@ class MainWindow(QMainWindow):
         self._invite_dialog.show()
 
     def refresh(self):
-        balance, transactions = self.client.totals()
+        """
+        Requests the totals, the pending UOMes and the new members of the
+        group concurrently. Each part of the window is updated as soon as its
+        response arrives.
+        """
+        run_in_background(self.client.totals,
+                          on_result=self._show_totals, on_error=self._show_error)
+        self._pending_widget.refresh()
+        run_in_background(self.client.email_key_map,
+                          on_result=self._show_names, on_error=self._show_error)
+
+    def _show_totals(self, totals):
+        self._totals = totals
+        balance, transactions = totals
 
         self.ui.balance_value.setText("%0.2f" % (balance / 100.0))
         pattern = "Pay %0.2f to %s" if balance < 0 else "Receive %0.2f from %s"
 
         self.ui.transactions_list.clear()
         for user, value in transactions.items():
-            self.ui.transactions_list.addItem(pattern % (value / 100.0, user))
+            self.ui.transactions_list.addItem(
+                pattern % (value / 100.0, self.client.name(user)))
+
+    def _show_names(self, members):
+        # members may have joined since the lists were shown
+        if self._totals:
+            self._show_totals(self._totals)
+        self._pending_widget.redraw()
+
+    def _show_error(self, error):
+        QMessageBox.warning(self, "Refresh Failed", error_message(error))
 
     def pending(self):
         if not self._pending_dialog:
             self._pending_dialog = PendingWidget(self.client)
         self._pending_dialog.refresh()
         self._pending_dialog.show()
-
@@ -1,9 +1,9 @@
-from PyQt5.QtWidgets import QTableWidgetItem
+from PyQt5.QtWidgets import QMessageBox
 from PyQt5.QtWidgets import QWidget
 
-from accept_button import AcceptButton
-from cancel_button import CancelButton
 from ui_pending import Ui_PendingWidget
+from uome_table import UOMeTableModel, ButtonDelegate
+from worker import run_in_background, error_message
 
 
 class PendingWidget(QWidget):
@@ -16,30 +16,69 @@ class PendingWidget(QWidget):
         self.ui = Ui_PendingWidget()
         self.ui.setupUi(self)
 
+        # UOMes issued by the user can be cancelled,
+        # UOMes waiting for the user can be accepted
+        self._loans = UOMeTableModel("cancel", "Borrower", "borrower",
+                                     name=client.name, parent=self)
+        self._debts = UOMeTableModel("accept", "Loaner", "user",
+                                     name=client.name, parent=self)
+
+        self._cancel_delegate = ButtonDelegate(self)
+        self._cancel_delegate.clicked.connect(self._cancel)
+        self._accept_delegate = ButtonDelegate(self)
+        self._accept_delegate.clicked.connect(self._accept)
+
+        for table, model, delegate in [
+            (self.ui.loans_table, self._loans, self._cancel_delegate),
+            (self.ui.debts_table, self._debts, self._accept_delegate),
+        ]:
+            table.setModel(model)
+            table.setItemDelegateForColumn(UOMeTableModel.ACTION_COLUMN, delegate)
+
     def refresh(self):
-        loans, debts = self.client.pending_UOMes()
-
-        # Update both tables
-        self._refresh_table(self.ui.loans_table, loans, CancelButton)
-        self._refresh_table(self.ui.debts_table, debts, AcceptButton)
-
-    def _refresh_table(self, table, uomes, button_type):
-        # Fill the loans table with each UOMe
-        table.setRowCount(len(uomes))
-        for i, uome in enumerate(uomes):
-            # Add a check box for each UOMe
-            table.setIndexWidget(table.model().index(i, 0),
-                                 button_type(self.client, table, i))
-
-            if table == self.ui.loans_table:
-                other_user = uome.borrower
-            else:
-                other_user = uome.user
-
-            table.setItem(i, 1, QTableWidgetItem(uome.uuid))
-            table.setItem(i, 2, QTableWidgetItem(other_user))
-            table.setItem(i, 3, QTableWidgetItem("%.2f" % (uome.value / 100.0)))
-            table.setItem(i, 4, QTableWidgetItem(uome.description))
+        """ Requests the pending UOMes in the background and shows them """
+        run_in_background(self.client.pending_UOMes,
+                          on_result=self._show_pending, on_error=self._show_error)
+
+    def show_cached(self):
+        """ Shows the UOMes stored locally without contacting the server """
+        self.show_uomes(*self.client.cached_pending_UOMes())
+
+    def show_uomes(self, loans, debts):
+        # only the rows that changed are updated
+        self._loans.set_uomes(loans)
+        self._debts.set_uomes(debts)
+
+    def redraw(self):
+        self._loans.refresh_names()
+        self._debts.refresh_names()
+
+    def _show_pending(self, pending):
+        self.show_uomes(*pending)
+
+    def _show_error(self, error):
+        QMessageBox.warning(self, "Refresh Failed", error_message(error))
+
+    def _cancel(self, row):
+        uome = self._loans.uome(row)
+        self._commit(self._loans, uome, self.client.cancel_UOMe, uome.uuid)
+
+    def _accept(self, row):
+        uome = self._debts.uome(row)
+        self._commit(self._debts, uome, self.client.accept_UOMe, uome.uuid,
+                     uome.user, uome.value, uome.description)
+
+    def _commit(self, model, uome, operation, *args):
+        # the action is disabled until the server answers
+        model.set_busy(uome.uuid, True)
+
+        def failed(error):
+            model.set_busy(uome.uuid, False)
+            QMessageBox.warning(self, "Operation Failed", error_message(error))
+
+        run_in_background(operation, *args,
+                          on_result=lambda result: model.remove(uome.uuid),
+                          on_error=failed)
 
     def _current_table(self):
         if self.ui.tab_widget.currentIndex() == 0:
@@ -48,4 +87,3 @@ class PendingWidget(QWidget):
         else:
             # debts tab is active
             return self.ui.debts_table
-
@@ -1,14 +1,18 @@
 import os
 
 import sys
+from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QDialog
+from PyQt5.QtWidgets import QDialogButtonBox
 from PyQt5.QtWidgets import QMessageBox
 
 from client_backend import Client
 from client_backend import ProtocolError
 from configuration import config
+from local_store import LocalStore
 from ui_register import Ui_RegisterDialog
 from utils.crypto import rsa
+from worker import run_in_background, error_message
 
 
 class RegisterDialog(QDialog):
@@ -33,12 +37,37 @@ class RegisterDialog(QDialog):
             )
             sys.exit(1)
 
-        # Generate keys for client
-        self._key, self._pubkey = rsa.generate_keys()
-        self.ui.id_line.setText(self._pubkey)
+        # Generate keys for client in the background, the dialog can only be
+        # accepted once they are ready
+        self._key, self._pubkey = None, None
+        self.ui.buttonBox.button(QDialogButtonBox.Ok).setEnabled(False)
+        self._generate_keys()
 
         self.client = None
 
+    def _generate_keys(self):
+        self.ui.id_line.setPlaceholderText("Generating keys...")
+        self.setCursor(Qt.BusyCursor)
+        run_in_background(rsa.generate_keys, on_result=self._keys_generated,
+                          on_error=self._keys_failed)
+
+    def _keys_failed(self, error):
+        self.unsetCursor()
+        self.ui.id_line.setPlaceholderText("Key generation failed")
+
+        answer = QMessageBox.warning(self, "Key Generation Failed", error_message(error),
+                                     QMessageBox.Retry | QMessageBox.Cancel)
+        if answer == QMessageBox.Retry:
+            self._generate_keys()
+        else:
+            self.reject()
+
+    def _keys_generated(self, keys):
+        self._key, self._pubkey = keys
+        self.ui.id_line.setText(self._pubkey)
+        self.ui.buttonBox.button(QDialogButtonBox.Ok).setEnabled(True)
+        self.unsetCursor()
+
     def accept(self):
 
         # Show a warning if one of the inputs is empty
@@ -58,7 +87,8 @@ class RegisterDialog(QDialog):
             main_server_pubkey=self._main_server_pubkey,
             proxy_server_url=config.proxy_server_url,
             email=self.ui.email_line.text(),
-            keys=(self._key, self._pubkey)
+            keys=(self._key, self._pubkey),
+            store=LocalStore(config.store_path)
         )
 
         try:
@@ -0,0 +1,39 @@
+#
+# Startup timing report
+#
+import os
+import sys
+import time
+
+# set this environment variable to print the report when the window shows up
+REPORT_VARIABLE = "GROUP_BANK_STARTUP_REPORT"
+
+_start = time.perf_counter()
+_marks = []
+
+
+def mark(name: str):
+    """ Records that a startup step finished now """
+    _marks.append((name, time.perf_counter()))
+
+
+def report() -> str:
+    """
+    Returns a report with the time each startup step took and the time
+    elapsed from the start of the process until the step finished.
+    """
+    lines = ["Startup timing:"]
+
+    previous = _start
+    for name, moment in _marks:
+        lines.append("  %-20s %7.1fms  (at %7.1fms)" % (
+            name, (moment - previous) * 1000, (moment - _start) * 1000))
+        previous = moment
+
+    return "\n".join(lines)
+
+
+def print_report(file=sys.stderr):
+    """ Prints the report if it was requested through the environment """
+    if os.environ.get(REPORT_VARIABLE):
+        print(report(), file=file)
@@ -1,3 +1,5 @@
+import threading
+import time
 from unittest.mock import Mock, MagicMock
 
 from pytest import fixture
@@ -7,10 +9,13 @@ import client.client_backend as c
 import utils.messages.message as m
 import utils.messages.message_formats as msg
 import utils.crypto.rsa as rsa
+from utils.crypto import merkle
 from client.client_backend import Client
+from client.local_store import LocalStore
 from client.uome import UOMe
 from utils.messages.connection import ConflictError, ForbiddenError, \
     UnauthorizedError
+from utils.messages.uome_tools import UOMeTools
 
 
 # noinspection PyUnusedLocal
@@ -413,6 +418,58 @@ class TestClient:
         with raises(c.AuthenticationError):
             client.pending_UOMes()
 
+    @staticmethod
+    def ledger_response(proof_transform=lambda proof: proof):
+        """ Response of the main server with a ledger of 3 UOMes, the second being #2 """
+        leaves = [merkle.leaf_hash(b'#1'), UOMeTools.leaf("1", "C2", "C1", 10, "debt", "#2"),
+                  merkle.leaf_hash(b'#3')]
+        nodes = {}
+        for index, leaf in enumerate(leaves):
+            for level, node_index, value in merkle.append(index, leaf, lambda *key: nodes[key]):
+                nodes[level, node_index] = value
+
+        root = merkle.root(3, lambda *key: nodes[key]).hex()
+        proof = [node.hex() for node in merkle.inclusion_proof(1, 3, lambda *key: nodes[key])]
+
+        return msg.GetInclusionProof.make_response(
+            leaf_index=1,
+            tree_size=3,
+            root=root,
+            proof=proof_transform(proof),
+            main_signature="pM:1-3-" + root
+        )
+
+    def test_verify_UOMe_inclusion_ValidProof_ReturnsTheSignedLedger(
+            self, client, mock_connection, predictable_signatures):
+        response = self.ledger_response()
+        mock_connection.get_response.return_value = response
+
+        assert client.verify_UOMe_inclusion("#2", "C2", "C1", 10, "debt") == (3, response.root)
+
+        mock_connection.request.assert_called_once_with(
+            msg.GetInclusionProof.make_request(
+                group_uuid="1",
+                user="C1",
+                uome_uuid="#2",
+                user_signature="pC1:1-C1-#2"
+            )
+        )
+
+    def test_verify_UOMe_inclusion_ProofOfAnotherUOMe_RaisesAuthenticationError(
+            self, client, mock_connection, predictable_signatures):
+        mock_connection.get_response.return_value = self.ledger_response()
+
+        with raises(c.AuthenticationError):
+            client.verify_UOMe_inclusion("#2", "C2", "C1", 20, "debt")
+
+    def test_verify_UOMe_inclusion_TamperedProof_RaisesAuthenticationError(
+            self, client, mock_connection, predictable_signatures):
+        mock_connection.get_response.return_value = \
+            self.ledger_response(lambda proof: proof[::-1])
+
+        with raises(c.AuthenticationError):
+            client.verify_UOMe_inclusion("#2", "C2", "C1", 10, "debt")
+
     def test_totals_SendsCorrectRequest(
             self, client, mock_connection, predictable_signatures):
 
@@ -420,6 +477,7 @@ class TestClient:
             msg.CheckTotals.make_response(
                 user_balance=0,
                 suggested_transactions={},
+                settlement_version=1,
                 main_signature="ignored"
             )
 
@@ -440,6 +498,7 @@ class TestClient:
             msg.CheckTotals.make_response(
                 user_balance=10,
                 suggested_transactions={"C2": 5, "C3": 5},
+                settlement_version=1,
                 main_signature="ignored"
             )
 
@@ -454,6 +513,7 @@ class TestClient:
             msg.CheckTotals.make_response(
                 user_balance=10,
                 suggested_transactions={"C2": 5, "C3": 5},
+                settlement_version=1,
                 main_signature="ignored"
             )
 
@@ -474,3 +534,131 @@ class TestClient:
 
         with raises(c.PermissionDeniedError):
             client.totals()
+
+    @fixture
+    def client_with_store(self):
+        return Client(
+            group_server_url="http://register.com",
+            group_server_pubkey="G",
+            proxy_server_url="P",
+            main_server_pubkey="M",
+            email="c1@email.com",
+            keys=("pC1", "C1"),
+            store=LocalStore(":memory:")
+        )
+
+    def test_email_key_map_FirstSync_SendsFullMapRequest(
+            self, client_with_store, mock_connection, predictable_signatures):
+        mock_connection.get_response.return_value = \
+            msg.EmailKeyMap.make_response(
+                members=[["c1@email.com", "C1"], ["c2@email.com", "C2"]],
+                cursor=2
+            )
+
+        members = client_with_store.email_key_map()
+
+        mock_connection.request.assert_called_once_with(
+            msg.EmailKeyMap.make_request(
+                group_uuid="1",
+                user="C1",
+                request_type="email-key-map",
+                signature="pC1:1-email-key-map"
+            )
+        )
+        assert members == {"C1": "c1@email.com", "C2": "c2@email.com"}
+        assert client_with_store.name("C2") == "c2@email.com"
+        assert client_with_store.store.get_cursor("email-key-map:1") == 2
+
+    def test_email_key_map_FirstSyncOfAnotherGroup_SendsFullMapRequest(
+            self, client_with_store, mock_connection, predictable_signatures):
+        mock_connection.get_response.return_value = \
+            msg.EmailKeyMap.make_response(members=[["c1@email.com", "C1"]],
+                                          cursor=1)
+        client_with_store.email_key_map()
+
+        mock_connection.request.reset_mock()
+        client_with_store.GROUP_ID = "2"
+        client_with_store.email_key_map()
+
+        mock_connection.request.assert_called_once_with(
+            msg.EmailKeyMap.make_request(
+                group_uuid="2",
+                user="C1",
+                request_type="email-key-map",
+                signature="pC1:2-email-key-map"
+            )
+        )
+
+    def test_email_key_map_SecondSync_RequestsOnlyTheNewMembers(
+            self, client_with_store, mock_connection, predictable_signatures):
+        mock_connection.get_response.return_value = \
+            msg.EmailKeyMap.make_response(members=[["c1@email.com", "C1"]],
+                                          cursor=1)
+        client_with_store.email_key_map()
+
+        mock_connection.request.reset_mock()
+        mock_connection.get_response.return_value = \
+            msg.EmailKeyMapDelta.make_response(members=[["c2@email.com", "C2"]],
+                                               cursor=2)
+        members = client_with_store.email_key_map()
+
+        mock_connection.request.assert_called_once_with(
+            msg.EmailKeyMapDelta.make_request(
+                group_uuid="1",
+                user="C1",
+                request_type="email-key-map-delta",
+                cursor=1,
+                signature="pC1:1-email-key-map-delta-1"
+            )
+        )
+        assert members == {"C1": "c1@email.com", "C2": "c2@email.com"}
+
+    def test_cancel_UOMe_SignatureAlreadyVerified_IsNotVerifiedAgain(
+            self, client_with_store, mock_connection, predictable_signatures):
+        mock_connection.get_response.return_value = \
+            msg.CancelUOMe.make_response(main_signature="pM:1-C1-#1")
+
+        client_with_store.cancel_UOMe("#1")
+        client_with_store.cancel_UOMe("#1")
+
+        assert m.verify.call_count == 1
+
+    def test_init_WithoutKeys_KeysAreOnlyGeneratedWhenNeeded(self, monkeypatch):
+        generate_keys = Mock(return_value=("pC1", "C1"))
+        monkeypatch.setattr(c.rsa, "generate_keys", generate_keys)
+
+        client = Client(
+            group_server_url="http://register.com",
+            group_server_pubkey="G",
+            proxy_server_url="P",
+            main_server_pubkey="M",
+            email="c1@email.com",
+        )
+        assert not generate_keys.called
+
+        assert client.id == "C1"
+        assert client.key == "pC1"
+        generate_keys.assert_called_once_with()
+
+    def test_init_WithoutKeys_KeysNeededByManyThreadsAreGeneratedOnce(self, monkeypatch):
+        def slow_generate_keys():
+            time.sleep(0.05)
+            return "pC1", "C1"
+
+        generate_keys = Mock(side_effect=slow_generate_keys)
+        monkeypatch.setattr(c.rsa, "generate_keys", generate_keys)
+
+        client = Client(
+            group_server_url="http://register.com",
+            group_server_pubkey="G",
+            proxy_server_url="P",
+            main_server_pubkey="M",
+            email="c1@email.com",
+        )
+        threads = [threading.Thread(target=lambda: client.id) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        generate_keys.assert_called_once_with()
@@ -0,0 +1,37 @@
+from pytest import raises
+
+from load_generator import parse_mix, percentile, histogram, LatencyStats
+
+
+class TestLoadGenerator:
+
+    def test_parse_mix_ValidMix_ReturnsWeightOfEachOperation(self):
+        assert parse_mix("issue=3, totals=1") == {"issue": 3.0, "totals": 1.0}
+
+    def test_parse_mix_UnknownOperation_RaisesValueError(self):
+        with raises(ValueError):
+            parse_mix("issue=3,fly=1")
+
+    def test_percentile_SortedValues_ReturnsNearestRank(self):
+        values = list(range(1, 101))
+
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile(values, 100) == 100
+
+    def test_histogram_Latencies_CountsEachBucket(self):
+        lines = histogram([0.001, 0.002, 0.2])
+
+        assert lines[0].split()[:3] == ["<=", "5ms", "2"]
+        assert lines[1].split()[:3] == ["<=", "250ms", "1"]
+
+    def test_report_SomeErrors_ReportsThroughputAndErrors(self):
+        stats = LatencyStats()
+        stats.record("totals", 0.01)
+        stats.record("totals", 0.02)
+        stats.record("issue", 0.5, failed=True)
+
+        report = stats.report(elapsed=2.0)
+
+        assert report.splitlines()[0] == "2 operations in 2.0s: 1.0 ops/s, 1 errors"
+        assert "issue: 0 ok, 1 errors, 0.0 ops/s" in report
@@ -0,0 +1,59 @@
+from pytest import fixture
+
+from local_store import LocalStore, ACCEPTED, fingerprint
+from uome import UOMe
+
+
+class TestLocalStore:
+
+    @fixture
+    def store(self, tmpdir):
+        store = LocalStore(str(tmpdir.join("store.sqlite3")))
+        yield store
+        store.close()
+
+    def test_email_StoredMember_ReturnsItsEmail(self, store):
+        store.add_members([["c2@email.com", "C2"]])
+
+        assert store.email("C2") == "c2@email.com"
+        assert store.email("C3") is None
+
+    def test_fingerprint_DifferentKeys_HaveDifferentFingerprints(self):
+        assert fingerprint("C1") != fingerprint("C2")
+
+    def test_get_cursor_NeverSet_ReturnsNone(self, store):
+        assert store.get_cursor("email-key-map") is None
+
+        store.set_cursor("email-key-map", 3)
+
+        assert store.get_cursor("email-key-map") == 3
+
+    def test_pending_UOMes_AfterReplace_ReturnsTheNewUOMes(self, store):
+        store.replace_pending([UOMe("1", "C1", "C2", 10, "d1", "s1", "#1")],
+                              [UOMe("1", "C3", "C1", 20, "d2", "s2", "#2")])
+        store.replace_pending([], [UOMe("1", "C3", "C1", 20, "d2", "s2", "#2")])
+
+        assert store.pending_UOMes() == \
+            ([], [UOMe("1", "C3", "C1", 20, "d2", "s2", "#2")])
+
+    def test_set_state_AcceptedUOMe_IsNoLongerPendingAndKeepsSignature(self, store):
+        store.replace_pending([], [UOMe("1", "C3", "C1", 20, "d2", "s2", "#2")])
+
+        store.set_state("#2", ACCEPTED, "main-signature")
+
+        assert store.pending_UOMes() == ([], [])
+        assert store.main_signature("#2") == "main-signature"
+
+    def test_is_verified_OnlyForTheRecordedValues(self, store):
+        store.add_verified("M", "signature", "a", "b")
+
+        assert store.is_verified("M", "signature", "a", "b")
+        assert not store.is_verified("M", "signature", "ab")
+
+    def test_store_IsPersisted(self, tmpdir):
+        path = str(tmpdir.join("store.sqlite3"))
+        store = LocalStore(path)
+        store.add_members([["c2@email.com", "C2"]])
+        store.close()
+
+        assert LocalStore(path).members() == {"C2": "c2@email.com"}
@@ -17,6 +17,7 @@ class TestMainWindow:
             UOMe("1", "C1", "C2", 10, "debtC1C2", "sign1", "#1"),
             UOMe("1", "C1", "C3", 10, "debtC1C3", "sign2", "#2"),
         ]
+        client.cached_pending_UOMes.return_value = [], []
         client.email = "user@email.com"
 
         app = QApplication(sys.argv)
@@ -0,0 +1,23 @@
+import io
+
+import startup
+
+
+class TestStartup:
+
+    def test_report_AfterMarks_ListsEachStepInOrder(self):
+        startup.mark("first step")
+        startup.mark("second step")
+
+        lines = startup.report().splitlines()
+
+        assert lines[-2].split()[:2] == ["first", "step"]
+        assert lines[-1].split()[:2] == ["second", "step"]
+
+    def test_print_report_NotRequested_PrintsNothing(self, monkeypatch):
+        monkeypatch.delenv(startup.REPORT_VARIABLE, raising=False)
+        output = io.StringIO()
+
+        startup.print_report(file=output)
+
+        assert output.getvalue() == ""
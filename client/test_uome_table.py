@@ -0,0 +1,68 @@
+from PyQt5.QtCore import QCoreApplication, Qt
+from pytest import fixture
+
+from uome import UOMe
+from uome_table import UOMeTableModel
+
+
+def make_uome(uuid, value=10):
+    return UOMe("1", "C1", "C2", value, "description", "signature", uuid)
+
+
+class TestUOMeTableModel:
+
+    @fixture
+    def model(self):
+        self.app = QCoreApplication.instance() or QCoreApplication([])
+        model = UOMeTableModel("accept", "Loaner", "user", name=str.lower)
+
+        self.inserted = []
+        self.removed = []
+        self.changed = []
+        model.rowsInserted.connect(lambda parent, first, last: self.inserted.append((first, last)))
+        model.rowsRemoved.connect(lambda parent, first, last: self.removed.append((first, last)))
+        model.dataChanged.connect(lambda first, last, roles: self.changed.append(first.row()))
+
+        return model
+
+    def test_set_uomes_EmptyModel_InsertsAllRowsAtOnce(self, model):
+        model.set_uomes([make_uome("#1"), make_uome("#2")])
+
+        assert model.rowCount() == 2
+        assert self.inserted == [(0, 1)]
+        assert model.index(1, UOMeTableModel.UUID_COLUMN).data() == "#2"
+        assert model.index(0, UOMeTableModel.USER_COLUMN).data() == "c1"
+        assert model.index(0, UOMeTableModel.VALUE_COLUMN).data() == "0.10"
+
+    def test_set_uomes_SomeUOMesChanged_OnlyChangedRowsAreUpdated(self, model):
+        model.set_uomes([make_uome("#1"), make_uome("#2"), make_uome("#3"),
+                         make_uome("#4")])
+        self.inserted.clear()
+
+        model.set_uomes([make_uome("#1"), make_uome("#4", value=20),
+                         make_uome("#5")])
+
+        assert self.removed == [(1, 2)]
+        assert self.changed == [1]
+        assert self.inserted == [(2, 2)]
+        assert [model.uome(row).uuid for row in range(model.rowCount())] == \
+            ["#1", "#4", "#5"]
+
+    def test_set_busy_UOMeIsBusy_ActionIsDisabled(self, model):
+        model.set_uomes([make_uome("#1")])
+        action = model.index(0, UOMeTableModel.ACTION_COLUMN)
+
+        model.set_busy("#1", True)
+        assert not model.flags(action) & Qt.ItemIsEnabled
+
+        model.set_busy("#1", False)
+        assert model.flags(action) & Qt.ItemIsEnabled
+
+    def test_remove_UOMeInTheMiddle_FollowingRowsMoveUp(self, model):
+        model.set_uomes([make_uome("#1"), make_uome("#2"), make_uome("#3")])
+
+        model.remove("#2")
+        model.remove("#3")
+
+        assert self.removed == [(1, 1), (1, 1)]
+        assert model.rowCount() == 1
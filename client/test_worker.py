@@ -0,0 +1,46 @@
+import threading
+
+from PyQt5.QtCore import QCoreApplication, QThreadPool
+from pytest import fixture
+
+from worker import run_in_background, error_message
+
+
+class TestWorker:
+
+    @fixture
+    def app(self):
+        return QCoreApplication.instance() or QCoreApplication([])
+
+    @staticmethod
+    def wait(app):
+        QThreadPool.globalInstance().waitForDone()
+        app.processEvents()
+
+    def test_run_in_background_OperationReturns_ResultDeliveredInCallerThread(self, app):
+        results = []
+        operation_threads = []
+
+        def operation(a, b):
+            operation_threads.append(threading.current_thread())
+            return a + b
+
+        run_in_background(operation, 1, 2, on_result=lambda result: results.append(
+            (result, threading.current_thread())))
+        self.wait(app)
+
+        assert results == [(3, threading.current_thread())]
+        assert operation_threads != [threading.current_thread()]
+
+    def test_run_in_background_OperationRaises_ErrorDelivered(self, app):
+        errors = []
+
+        def operation():
+            raise ValueError("failed")
+
+        run_in_background(operation, on_result=lambda result: errors.append(None),
+                          on_error=errors.append)
+        self.wait(app)
+
+        assert len(errors) == 1
+        assert error_message(errors[0]) == "failed"
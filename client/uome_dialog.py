@@ -1,9 +1,16 @@
+from PyQt5.QtCore import pyqtSignal
 from PyQt5.QtWidgets import QDialog
+from PyQt5.QtWidgets import QMessageBox
+
 from ui_uome import Ui_UOMeDialog
+from worker import run_in_background, error_message
 
 
 class UOMeDialog(QDialog):
 
+    # emitted once an UOMe was issued and confirmed
+    issued = pyqtSignal()
+
     def __init__(self, client):
         super(UOMeDialog, self).__init__()
         self.client = client
@@ -15,15 +22,23 @@ class UOMeDialog(QDialog):
         self.ui.button_box.accepted.connect(self.issue_uome)
 
     def issue_uome(self):
-        # TODO store signature
-        # TODO store the UOMe-ID
-
         borrower = self.ui.borrower_lineedit.text()
         value = int(self.ui.amount_spinbox.value() * 100)
         description = self.ui.description_lineedit.text()
 
+        run_in_background(self._issue_and_confirm, borrower, value, description,
+                          on_result=lambda result: self.issued.emit(),
+                          on_error=self._show_error)
+
+    def _issue_and_confirm(self, borrower, value, description):
+        """ Executed in a background thread """
+        # TODO store signature
+        # TODO store the UOMe-ID
+
         uome_uuid, main_signature = self.client.issue_UOMe(borrower, value,
                                                            description)
 
         self.client.confirm_UOMe(uome_uuid, borrower, value, description)
 
+    def _show_error(self, error):
+        QMessageBox.warning(self, "Issue Failed", error_message(error))
@@ -0,0 +1,196 @@
+#
+# Model and delegate of the tables of UOMes
+#
+from PyQt5.QtCore import QAbstractTableModel, QEvent, QModelIndex, Qt, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QStyle, QStyleOptionButton, \
+    QStyledItemDelegate
+
+
+class UOMeTableModel(QAbstractTableModel):
+    """
+    Table of UOMes, identified by their uuid. Setting a new list of UOMes
+    only inserts, removes and updates the rows that changed, which allows
+    the views to keep their state and to only repaint what changed.
+
+    The first column holds the action the user can take on each UOMe, it
+    is meant to be shown with a ButtonDelegate. While the action is being
+    executed the UOMe is busy and the action is disabled.
+    """
+
+    ACTION_COLUMN = 0
+    UUID_COLUMN = 1
+    USER_COLUMN = 2
+    VALUE_COLUMN = 3
+    DESCRIPTION_COLUMN = 4
+
+    def __init__(self, action: str, user_header: str, user_field: str,
+                 name=str, parent=None):
+        """
+        :param action:      text of the action of each UOMe.
+        :param user_header: header of the column of the other user.
+        :param user_field:  field of the UOMe with the key of the other user.
+        :param name:        function returning the name to show for a key.
+        """
+        super().__init__(parent)
+        self.action = action
+        self.user_field = user_field
+        self.name = name
+
+        self._headers = ["", "UOMe ID", user_header, "Amount", "Description"]
+        self._uomes = []
+        self._rows = {}  # uuid -> row
+        self._busy = set()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._uomes)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self._headers[section]
+
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index):
+        flags = super().flags(index)
+
+        if index.column() == self.ACTION_COLUMN and \
+                self._uomes[index.row()].uuid in self._busy:
+            flags &= ~Qt.ItemIsEnabled
+
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        uome = self._uomes[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            if column == self.ACTION_COLUMN:
+                return self.action
+            elif column == self.UUID_COLUMN:
+                return uome.uuid
+            elif column == self.USER_COLUMN:
+                return self.name(getattr(uome, self.user_field))
+            elif column == self.VALUE_COLUMN:
+                return "%.2f" % (uome.value / 100.0)
+            elif column == self.DESCRIPTION_COLUMN:
+                return uome.description
+
+        elif role == Qt.UserRole:
+            # the UOMe itself, used by the actions
+            return uome
+
+        return None
+
+    def uome(self, row: int):
+        return self._uomes[row]
+
+    def set_uomes(self, uomes: list):
+        """
+        Replaces the UOMes of the table. UOMes that are already in the table
+        keep their row, new UOMes are appended to the end.
+        """
+        new_uomes = {uome.uuid: uome for uome in uomes}
+
+        # remove the UOMes that are gone, from the bottom to keep the rows valid
+        row = len(self._uomes) - 1
+        while row >= 0:
+            if self._uomes[row].uuid in new_uomes:
+                row -= 1
+                continue
+
+            # remove the whole run of consecutive rows at once
+            last = row
+            while row > 0 and self._uomes[row - 1].uuid not in new_uomes:
+                row -= 1
+
+            self.beginRemoveRows(QModelIndex(), row, last)
+            del self._uomes[row:last + 1]
+            self.endRemoveRows()
+            row -= 1
+
+        self._busy.intersection_update(new_uomes)
+        self._rows = {uome.uuid: row for row, uome in enumerate(self._uomes)}
+
+        # update the UOMes that changed
+        for row, uome in enumerate(self._uomes):
+            if new_uomes[uome.uuid] != uome:
+                self._uomes[row] = new_uomes[uome.uuid]
+                self.dataChanged.emit(self.index(row, 0),
+                                      self.index(row, self.columnCount() - 1))
+
+        # append the new UOMes
+        added = [uome for uome in uomes if uome.uuid not in self._rows]
+        if added:
+            first = len(self._uomes)
+            self.beginInsertRows(QModelIndex(), first, first + len(added) - 1)
+            for row, uome in enumerate(added, start=first):
+                self._uomes.append(uome)
+                self._rows[uome.uuid] = row
+            self.endInsertRows()
+
+    def remove(self, uuid: str):
+        """ Removes a UOMe from the table, if it is still there """
+        try:
+            row = self._rows[uuid]
+        except KeyError:
+            return
+
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._uomes[row]
+        self._busy.discard(uuid)
+        self._rows = {uome.uuid: row for row, uome in enumerate(self._uomes)}
+        self.endRemoveRows()
+
+    def set_busy(self, uuid: str, busy: bool):
+        """ Enables or disables the action of a UOMe """
+        if busy:
+            self._busy.add(uuid)
+        else:
+            self._busy.discard(uuid)
+
+        row = self._rows.get(uuid)
+        if row is not None:
+            index = self.index(row, self.ACTION_COLUMN)
+            self.dataChanged.emit(index, index)
+
+    def refresh_names(self):
+        """ Notifies the views that the names of the users may have changed """
+        if self._uomes:
+            self.dataChanged.emit(self.index(0, self.USER_COLUMN),
+                                  self.index(len(self._uomes) - 1, self.USER_COLUMN),
+                                  [Qt.DisplayRole])
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    """
+    Paints the items of a column as push buttons. A single delegate serves
+    every row, instead of one button widget per row.
+    """
+
+    # emitted with the row of the button that was clicked
+    clicked = pyqtSignal(int)
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect
+        button.text = index.data()
+        button.state = QStyle.State_Raised
+        if index.flags() & Qt.ItemIsEnabled:
+            button.state |= QStyle.State_Enabled
+
+        QApplication.style().drawControl(QStyle.CE_PushButton, button, painter)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and \
+                event.button() == Qt.LeftButton and \
+                index.flags() & Qt.ItemIsEnabled:
+            self.clicked.emit(index.row())
+            return True
+
+        return False
@@ -0,0 +1,78 @@
+#
+# Background execution of the client operations
+#
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class WorkerSignals(QObject):
+    """ Signals emitted by a worker, delivered in the GUI thread """
+
+    # emitted with the result of the operation
+    result = pyqtSignal(object)
+    # emitted with the exception raised by the operation
+    error = pyqtSignal(object)
+    # emitted after result or error
+    finished = pyqtSignal()
+
+
+class Worker(QRunnable):
+    """
+    Runs an operation in a thread of the pool and reports its outcome
+    through signals. Operations usually call blocking Client methods, which
+    wait for the servers and sign or verify messages.
+    """
+
+    def __init__(self, function, *args, **kwargs):
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+
+        # the worker is owned by python, which keeps it until it finishes
+        self.setAutoDelete(False)
+
+    def run(self):
+        try:
+            result = self.function(*self.args, **self.kwargs)
+        except Exception as error:
+            self.signals.error.emit(error)
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+# workers are kept alive until their signals are delivered
+_active_workers = set()
+
+
+def run_in_background(function, *args, on_result=None, on_error=None,
+                      **kwargs) -> Worker:
+    """
+    Runs function(*args, **kwargs) in the global thread pool. Must be called
+    from the GUI thread: the callbacks are called in the GUI thread.
+
+    :param function:  operation to execute in the background.
+    :param on_result: called with the value returned by the operation.
+    :param on_error:  called with the exception raised by the operation.
+    :return: the worker executing the operation.
+    """
+    worker = Worker(function, *args, **kwargs)
+
+    if on_result:
+        worker.signals.result.connect(on_result)
+    if on_error:
+        worker.signals.error.connect(on_error)
+
+    _active_workers.add(worker)
+    worker.signals.finished.connect(lambda: _active_workers.discard(worker))
+
+    QThreadPool.globalInstance().start(worker)
+
+    return worker
+
+
+def error_message(error: Exception) -> str:
+    """ Message to show to the user when an operation fails """
+    return getattr(error, 'message', None) or str(error) or type(error).__name__
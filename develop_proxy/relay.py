@@ -0,0 +1,426 @@
+#
+# Relay proxy between the clients and the main server
+#
+# Runs next to the group server and relays the HTTP requests of the clients
+# to the main server, hiding their addresses from it. Requests are sent over
+# a pool of persistent connections to the main server, so many clients
+# connecting through the relay do not each open a connection upstream. The
+# number of concurrent requests of each client address is limited, further
+# requests wait for one of them to finish.
+#
+# The relay understands HTTP/1.1 and does not add any forwarding headers.
+# Use the stream pass-through in nginx.conf when the main server is only
+# reachable over HTTPS: requests encrypted end to end can not be relayed
+# over shared connections.
+#
+#   PYTHONPATH=.. python relay.py --listen 0.0.0.0:8000 --upstream main.server:8000 \
+#       --metrics 127.0.0.1:9100
+#
+import argparse
+import asyncio
+import logging
+import time
+
+from utils import metrics
+
+logger = logging.getLogger('relay')
+
+# headers that only apply to a single connection and are never relayed
+HOP_BY_HOP_HEADERS = {b'connection', b'keep-alive', b'proxy-authenticate',
+                      b'proxy-authorization', b'te', b'trailer',
+                      b'transfer-encoding', b'upgrade'}
+
+MAX_HEADER_SIZE = 64 * 1024
+
+_request_time = metrics.histogram('relay_request_seconds',
+                                  'Time to relay a request and its response')
+_upstream_wait = metrics.histogram('relay_upstream_wait_seconds',
+                                   'Time requests waited for an upstream connection')
+_client_wait = metrics.histogram('relay_client_wait_seconds',
+                                 'Time requests waited for the concurrency limit of their client')
+_upstream_connections = metrics.counter('relay_upstream_connections',
+                                        'Connections opened to the upstream server')
+_failed_requests = metrics.counter('relay_failed_requests',
+                                   'Requests that could not be relayed')
+
+
+class ProtocolError(Exception):
+    """ Raised when a message is not valid HTTP/1.1 or is not supported """
+
+
+#
+# HTTP messages
+#
+
+async def read_head(reader: asyncio.StreamReader):
+    """
+    Reads the start line and the headers of a message.
+
+    :return: start line and list of (name, value) headers, or None if the
+             connection was closed before the message started.
+    :raise ProtocolError: if the head is malformed or too large.
+    """
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as error:
+        if not error.partial:
+            return None
+        raise ProtocolError("connection closed in the middle of a message")
+    except asyncio.LimitOverrunError:
+        raise ProtocolError("message head is too large")
+
+    lines = head[:-4].split(b'\r\n')
+    headers = []
+    for line in lines[1:]:
+        name, separator, value = line.partition(b':')
+        if not separator:
+            raise ProtocolError("malformed header: %r" % line)
+        headers.append((name.strip(), value.strip()))
+
+    return lines[0], headers
+
+
+def header(headers: list, name: bytes):
+    """ Returns the value of a header or None, names are case insensitive """
+    for header_name, value in headers:
+        if header_name.lower() == name:
+            return value
+
+    return None
+
+
+def keeps_alive(version: bytes, headers: list) -> bool:
+    """ Checks if the connection is kept open after a message """
+    connection = (header(headers, b'connection') or b'').lower()
+
+    if version == b'HTTP/1.0':
+        return connection == b'keep-alive'
+
+    return connection != b'close'
+
+
+def forwarded_head(start_line: bytes, headers: list, extra=()) -> bytes:
+    """ Head of a relayed message: the hop-by-hop headers are replaced """
+    lines = [start_line]
+    lines.extend(name + b': ' + value for name, value in headers
+                 if name.lower() not in HOP_BY_HOP_HEADERS)
+    lines.extend(name + b': ' + value for name, value in extra)
+
+    return b'\r\n'.join(lines) + b'\r\n\r\n'
+
+
+async def copy_body(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                    headers: list, chunk_size=64 * 1024):
+    """
+    Copies the body of a message, delimited by its Content-Length or by the
+    chunked transfer coding. Chunked bodies are copied as they are.
+
+    :return: True if the body had a delimited length, False if it lasted
+             until the connection was closed.
+    """
+    transfer_encoding = header(headers, b'transfer-encoding')
+    content_length = header(headers, b'content-length')
+
+    if transfer_encoding is not None:
+        if transfer_encoding.lower() != b'chunked':
+            raise ProtocolError("unsupported transfer coding: %r" % transfer_encoding)
+
+        while True:
+            size_line = await reader.readuntil(b'\r\n')
+            writer.write(size_line)
+            size = int(size_line.split(b';')[0], 16)
+
+            if size == 0:
+                # trailers, up to the empty line
+                while True:
+                    line = await reader.readuntil(b'\r\n')
+                    writer.write(line)
+                    if line == b'\r\n':
+                        return True
+
+            writer.write(await reader.readexactly(size + 2))
+            await writer.drain()
+
+    if content_length is not None:
+        remaining = int(content_length)
+        while remaining > 0:
+            chunk = await reader.read(min(remaining, chunk_size))
+            if not chunk:
+                raise ProtocolError("connection closed in the middle of a body")
+            writer.write(chunk)
+            remaining -= len(chunk)
+            await writer.drain()
+        return True
+
+    # the body lasts until the connection is closed
+    while True:
+        chunk = await reader.read(chunk_size)
+        if not chunk:
+            return False
+        writer.write(chunk)
+        await writer.drain()
+
+
+#
+# Upstream connections
+#
+
+class UpstreamPool:
+    """
+    Persistent connections to the upstream server. At most 'size'
+    connections are open at the same time, requests wait for a free one.
+    """
+
+    def __init__(self, host: str, port: int, size: int):
+        self.host = host
+        self.port = port
+        self.size = size
+
+        self._idle = []
+        self._available = asyncio.Semaphore(size)
+
+    async def acquire(self):
+        """
+        Provides a connection to the upstream server, opening it if there is
+        no idle connection.
+
+        :return: (reader, writer, reused) where reused tells whether the
+                 connection was used by a previous request.
+        """
+        await self._available.acquire()
+
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        except BaseException:
+            self._available.release()
+            raise
+
+        _upstream_connections.inc()
+        return reader, writer, False
+
+    def release(self, reader, writer, reusable: bool):
+        """ Returns a connection to the pool, or closes it if not reusable """
+        if reusable and not writer.is_closing():
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+
+        self._available.release()
+
+    def close(self):
+        for reader, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+
+#
+# Relay
+#
+
+class Relay:
+    """ Relays the requests of the clients over an UpstreamPool """
+
+    def __init__(self, upstream: UpstreamPool, client_limit: int):
+        """
+        :param upstream:     pool of connections to the upstream server.
+        :param client_limit: maximum number of concurrent requests of each
+                             client address.
+        """
+        self.upstream = upstream
+        self.client_limit = client_limit
+
+        self._clients = {}  # address -> [semaphore, number of connections]
+
+    async def handle_client(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter):
+        """ Serves the requests sent over a client connection """
+        address = writer.get_extra_info('peername')[0]
+        client = self._clients.setdefault(
+            address, [asyncio.Semaphore(self.client_limit), 0])
+        client[1] += 1
+
+        try:
+            while True:
+                head = await read_head(reader)
+                if head is None:
+                    break
+
+                start = time.perf_counter()
+                async with client[0]:
+                    _client_wait.observe(time.perf_counter() - start)
+                    keep_alive = await self.relay(head, reader, writer)
+
+                _request_time.observe(time.perf_counter() - start)
+                if not keep_alive:
+                    break
+
+        except (ProtocolError, ValueError) as error:
+            logger.info("bad request: %s", error)
+            _failed_requests.inc()
+            writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n'
+                         b'Connection: close\r\n\r\n')
+        except OSError as error:
+            logger.warning("failed to relay a request: %s", error)
+            _failed_requests.inc()
+            writer.write(b'HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n'
+                         b'Connection: close\r\n\r\n')
+        except asyncio.IncompleteReadError:
+            _failed_requests.inc()
+
+        finally:
+            client[1] -= 1
+            if client[1] == 0:
+                del self._clients[address]
+
+            writer.close()
+
+    async def relay(self, head, reader, writer) -> bool:
+        """
+        Relays one request and its response.
+
+        :return: True if the client connection can be used for other requests.
+        """
+        request_line, headers = head
+        method, target, version = request_line.split(b' ')
+
+        if header(headers, b'transfer-encoding') is not None:
+            raise ProtocolError("chunked requests are not supported")
+
+        # the body is read before it is sent, to be able to retry the request
+        length = int(header(headers, b'content-length') or 0)
+        body = await reader.readexactly(length)
+
+        request = forwarded_head(
+            b'%s %s HTTP/1.1' % (method, target),
+            [(name, value) for name, value in headers if name.lower() != b'host'],
+            extra=[(b'Host', b'%s:%d' % (self.upstream.host.encode(), self.upstream.port))]
+        ) + body
+
+        client_keep_alive = keeps_alive(version, headers)
+
+        for attempt in range(2):
+            start = time.perf_counter()
+            upstream_reader, upstream_writer, reused = await self.upstream.acquire()
+            _upstream_wait.observe(time.perf_counter() - start)
+
+            reusable = False
+            try:
+                try:
+                    upstream_writer.write(request)
+                    await upstream_writer.drain()
+                    response_head = await read_head(upstream_reader)
+                except ConnectionError:
+                    response_head = None
+
+                if response_head is None:
+                    # the upstream server may have closed an idle connection,
+                    # nothing was sent to the client yet so retry once
+                    if reused and attempt == 0:
+                        continue
+                    raise ConnectionError("upstream closed the connection")
+
+                keep_alive, reusable = await self.respond(
+                    method, client_keep_alive, response_head, upstream_reader, writer)
+                return keep_alive
+
+            finally:
+                self.upstream.release(upstream_reader, upstream_writer, reusable)
+
+    async def respond(self, method, client_keep_alive, response_head,
+                      upstream_reader, writer) -> (bool, bool):
+        """
+        Relays the response of the upstream server to the client.
+
+        :return: whether the client connection and the upstream connection
+                 can be used for other requests.
+        """
+        status_line, headers = response_head
+        status = int(status_line.split(b' ')[1])
+        chunked = header(headers, b'transfer-encoding') is not None
+
+        has_body = not (method == b'HEAD' or status in (204, 304) or 100 <= status < 200)
+        # without a length the body lasts until the connection is closed
+        delimited = not has_body or chunked or \
+            header(headers, b'content-length') is not None
+        keep_alive = client_keep_alive and delimited
+
+        writer.write(forwarded_head(status_line, headers, extra=[
+            (b'Connection', b'keep-alive' if keep_alive else b'close'),
+        ] + ([(b'Transfer-Encoding', b'chunked')] if chunked else [])))
+
+        if has_body:
+            await copy_body(upstream_reader, writer, headers)
+        await writer.drain()
+
+        return keep_alive, delimited and keeps_alive(b'HTTP/1.1', headers)
+
+
+async def serve_metrics(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """ Answers any request with the metrics in the Prometheus text format """
+    try:
+        await read_head(reader)
+        body = metrics.render().encode()
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n'
+                     b'Content-Length: %d\r\nConnection: close\r\n\r\n' % len(body) + body)
+        await writer.drain()
+    except (ProtocolError, OSError):
+        pass
+    finally:
+        writer.close()
+
+
+def parse_address(address: str) -> (str, int):
+    host, _, port = address.rpartition(':')
+    return host, int(port)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Relays the clients' requests to the main server")
+    parser.add_argument("--listen", default="0.0.0.0:8000",
+                        help="address the clients connect to")
+    parser.add_argument("--upstream", required=True,
+                        help="address of the main server")
+    parser.add_argument("--upstream-connections", type=int, default=16,
+                        help="maximum number of connections to the main server")
+    parser.add_argument("--client-limit", type=int, default=4,
+                        help="maximum number of concurrent requests of each client")
+    parser.add_argument("--metrics",
+                        help="address serving the relay metrics, disabled by default")
+
+    return parser.parse_args(argv)
+
+
+async def run(args):
+    upstream = UpstreamPool(*parse_address(args.upstream), size=args.upstream_connections)
+    relay = Relay(upstream, args.client_limit)
+
+    servers = [await asyncio.start_server(relay.handle_client, *parse_address(args.listen),
+                                          limit=MAX_HEADER_SIZE)]
+    if args.metrics:
+        servers.append(await asyncio.start_server(serve_metrics, *parse_address(args.metrics)))
+
+    logger.info("relaying %s to %s", args.listen, args.upstream)
+    try:
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+    finally:
+        upstream.close()
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    try:
+        asyncio.run(run(parse_args(argv)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import asyncio
+
+from relay import Relay, UpstreamPool, read_head, header
+
+
+class FakeUpstream:
+    """
+    HTTP server that answers each request with its path and body. Keeps
+    track of the connections it accepted and of its concurrent requests.
+    """
+
+    def __init__(self, chunked=False, close_after=None, delay=0.0):
+        self.chunked = chunked
+        self.close_after = close_after  # requests served per connection
+        self.delay = delay
+
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+        self.hosts = []
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        served = 0
+
+        while True:
+            head = await read_head(reader)
+            if head is None:
+                break
+
+            request_line, headers = head
+            self.hosts.append(header(headers, b'host'))
+            body = await reader.readexactly(int(header(headers, b'content-length') or 0))
+
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            await asyncio.sleep(self.delay)
+            self.active -= 1
+
+            content = request_line.split(b' ')[1] + b' ' + body
+            if self.chunked:
+                writer.write(b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n'
+                             b'%x\r\n%s\r\n0\r\n\r\n' % (len(content), content))
+            else:
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s'
+                             % (len(content), content))
+            await writer.drain()
+
+            served += 1
+            if served == self.close_after:
+                break
+
+        writer.close()
+
+
+async def start(upstream: FakeUpstream, connections=4, client_limit=4):
+    upstream_server = await asyncio.start_server(upstream.handle, '127.0.0.1', 0)
+    upstream_port = upstream_server.sockets[0].getsockname()[1]
+
+    relay = Relay(UpstreamPool('127.0.0.1', upstream_port, connections), client_limit)
+    relay_server = await asyncio.start_server(relay.handle_client, '127.0.0.1', 0)
+
+    return upstream_server, relay_server, relay_server.sockets[0].getsockname()[1]
+
+
+async def post(port, path: bytes, body: bytes, keep_alive=False):
+    """ Sends a request through a new connection and returns the response """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b'POST %s HTTP/1.1\r\nHost: relay\r\nContent-Length: %d\r\n%s\r\n%s' % (
+        path, len(body), b'' if keep_alive else b'Connection: close\r\n', body))
+
+    response = await reader.read()
+    writer.close()
+
+    return response
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class TestRelay:
+
+    def test_SequentialClients_ShareOneUpstreamConnection(self):
+        upstream = FakeUpstream()
+
+        async def scenario():
+            upstream_server, relay_server, port = await start(upstream)
+            responses = [await post(port, b'/issue', b'data=%d' % i) for i in range(5)]
+            relay_server.close()
+            upstream_server.close()
+            return responses
+
+        responses = run(scenario())
+
+        assert responses[3].startswith(b'HTTP/1.1 200 OK\r\n')
+        assert b'Connection: close' in responses[3]
+        assert responses[3].endswith(b'\r\n\r\n/issue data=3')
+        assert upstream.connections == 1
+
+    def test_Request_IsSentWithTheUpstreamHost(self):
+        upstream = FakeUpstream()
+
+        async def scenario():
+            upstream_server, relay_server, port = await start(upstream)
+            await post(port, b'/totals', b'')
+            relay_server.close()
+            upstream_server.close()
+
+        run(scenario())
+
+        assert upstream.hosts[0].startswith(b'127.0.0.1:')
+
+    def test_ConcurrentClients_NeverExceedTheUpstreamConnections(self):
+        upstream = FakeUpstream(delay=0.01)
+
+        async def scenario():
+            upstream_server, relay_server, port = await start(upstream, connections=2)
+            await asyncio.gather(*(post(port, b'/p', b'') for _ in range(10)))
+            relay_server.close()
+            upstream_server.close()
+
+        run(scenario())
+
+        assert upstream.connections == 2
+        assert upstream.max_active == 2
+
+    def test_ClientLimit_BoundsTheConcurrentRequestsOfAClient(self):
+        upstream = FakeUpstream(delay=0.01)
+
+        async def scenario():
+            upstream_server, relay_server, port = await start(upstream, connections=8,
+                                                              client_limit=1)
+            await asyncio.gather(*(post(port, b'/p', b'') for _ in range(5)))
+            relay_server.close()
+            upstream_server.close()
+
+        run(scenario())
+
+        assert upstream.max_active == 1
+
+    def test_UpstreamClosedIdleConnection_RequestIsRetried(self):
+        upstream = FakeUpstream(close_after=1)
+
+        async def scenario():
+            upstream_server, relay_server, port = await start(upstream)
+            first = await post(port, b'/a', b'')
+            second = await post(port, b'/b', b'')
+            relay_server.close()
+            upstream_server.close()
+            return first, second
+
+        first, second = run(scenario())
+
+        assert first.endswith(b'/a ')
+        assert second.endswith(b'/b ')
+        assert upstream.connections == 2
+
+    def test_ChunkedResponse_IsRelayedOverAKeptAliveConnection(self):
+        upstream = FakeUpstream(chunked=True)
+
+        async def scenario():
+            upstream_server, relay_server, port = await start(upstream)
+
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            responses = []
+            for path in (b'/a', b'/b'):
+                writer.write(b'GET %s HTTP/1.1\r\nHost: relay\r\n\r\n' % path)
+                status_line, headers = await read_head(reader)
+                size = int(await reader.readuntil(b'\r\n'), 16)
+                responses.append((headers, await reader.readexactly(size)))
+                await reader.readuntil(b'0\r\n\r\n')
+            writer.close()
+
+            relay_server.close()
+            upstream_server.close()
+            return responses
+
+        responses = run(scenario())
+
+        assert [body for headers, body in responses] == [b'/a ', b'/b ']
+        assert header(responses[0][0], b'transfer-encoding') == b'chunked'
+        assert header(responses[0][0], b'connection') == b'keep-alive'
+        assert upstream.connections == 1
+
+    def test_MalformedRequest_IsAnsweredWithBadRequest(self):
+        upstream = FakeUpstream()
+
+        async def scenario():
+            upstream_server, relay_server, port = await start(upstream)
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'POST / HTTP/1.1\r\nno separator\r\n\r\n')
+            response = await reader.read()
+            writer.close()
+            relay_server.close()
+            upstream_server.close()
+            return response
+
+        assert run(scenario()).startswith(b'HTTP/1.1 400 Bad Request')
+        assert upstream.connections == 0
@@ -12,12 +12,46 @@ https://docs.djangoproject.com/en/1.10/ref/settings/
 
 import os
 from utils.crypto.rsa import load_keys, load_pubkey
+from utils.server.database import database_from_env
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 PRIVATE_KEY, PUBLIC_KEY = load_keys(BASE_DIR + '/server_keys.pem')
 MAIN_PUBLIC_KEY = load_pubkey(BASE_DIR + '/main_pub.pem')
 
+# Main server where the users are registered when they confirm their join
+MAIN_SERVER_URL = os.environ.get('MAIN_SERVER_URL', 'localhost:8000')
+MAIN_SERVER_TIMEOUT = 10  # seconds
+
+# When set, the registration in the main server is queued and ConfirmJoin returns
+# right away. Queued registrations are run by the 'run_main_server_jobs' command.
+MAIN_SERVER_JOIN_ASYNC = os.environ.get('MAIN_SERVER_JOIN_ASYNC', '') == '1'
+MAIN_SERVER_JOB_MAX_ATTEMPTS = 10
+MAIN_SERVER_JOB_RETRY_DELAY = 5  # seconds, doubled after each failed attempt
+MAIN_SERVER_JOB_MAX_RETRY_DELAY = 600  # seconds
+
+# Secret code given to every invitation instead of a random one. Only used when
+# DEBUG is set, to let load tests against a local server join the users they invite
+INVITE_SECRET_CODE = os.environ.get('INVITE_SECRET_CODE', '')
+
+# Workers used to sign and verify signatures, 0 signs inline on the request thread
+CRYPTO_POOL_WORKERS = int(os.environ.get('CRYPTO_POOL_WORKERS', 0))
+CRYPTO_POOL_KIND = os.environ.get('CRYPTO_POOL_KIND', 'thread')  # 'thread' or 'process'
+
+# Request timing: requests slower than TIMING_SLOW_REQUEST seconds are logged as
+# warnings and, if sampled for profiling, have their profile dumped to TIMING_PROFILE_DIR
+TIMING_SLOW_REQUEST = float(os.environ.get('TIMING_SLOW_REQUEST', 0.5))
+TIMING_PROFILE_RATE = float(os.environ.get('TIMING_PROFILE_RATE', 0.0))
+TIMING_PROFILE_DIR = os.environ.get('TIMING_PROFILE_DIR')
+
+# Response bodies of at least COMPRESSION_MIN_SIZE bytes are compressed for the
+# clients that accept it (gzip or deflate)
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+
+# Addresses allowed to scrape the metrics endpoint (comma separated)
+METRICS_ALLOWED_ADDRESSES = os.environ.get('METRICS_ALLOWED_ADDRESSES', '127.0.0.1,::1').split(',')
+
 
 #Email Settings
 EMAIL_HOST = 'localhost'
@@ -48,6 +82,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.server.middleware.MetricsMiddleware',
+    'utils.server.middleware.TimingMiddleware',
+    'utils.server.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,11 +118,10 @@ WSGI_APPLICATION = 'group_server.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/1.10/ref/settings/#databases
 
+# The database is selected with environment variables, see utils.server.database
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': database_from_env('group_server', os.path.join(BASE_DIR, 'db.sqlite3')),
 }
 
 
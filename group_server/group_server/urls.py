@@ -16,7 +16,11 @@ Including another URLconf
 from django.conf.urls import url, include
 from django.contrib import admin
 
+from utils.server import views as server_views
+
 urlpatterns = [
     url(r'^admin/', admin.site.urls),
+    url(r'^timing$', server_views.timing_stats, name='timing'),
+    url(r'^metrics$', server_views.metrics_text, name='metrics'),
     url(r'^', include('group_server_app.urls')),
 ]
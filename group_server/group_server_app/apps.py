@@ -1,7 +1,16 @@
 from __future__ import unicode_literals
 
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+from utils.crypto import pool
+from utils.server.database import configure_sqlite
 
 
 class GroupServerAppConfig(AppConfig):
     name = 'group_server_app'
+
+    def ready(self):
+        pool.configure(settings.CRYPTO_POOL_WORKERS, settings.CRYPTO_POOL_KIND)
+        connection_created.connect(configure_sqlite)
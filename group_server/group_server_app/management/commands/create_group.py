@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+
+from group_server_app.models import Group, User
+from group_server_app.services import key_map, main_server
+
+from utils.crypto.rsa import load_pubkey
+
+
+class Command(BaseCommand):
+    help = "Registers a new group in the main server and creates its owner. " \
+           "Prints the uuid of the group."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help="name of the group")
+        parser.add_argument('--owner-key', required=True,
+                            help="file with the owner's public key in PEM format")
+        parser.add_argument('--owner-email', required=True,
+                            help="e-mail of the owner")
+
+    def handle(self, *args, **options):
+        owner_key = load_pubkey(options['owner_key'])
+
+        group_uuid = main_server.register_group(options['name'])
+        group = Group.objects.create(uuid=group_uuid, name=options['name'],
+                                     key=settings.PUBLIC_KEY)
+
+        # the owner is the only user without an invitation
+        owner = User.objects.create(group=group, key=owner_key,
+                                    email=options['owner_email'])
+        main_server.register_user(group, owner)
+        key_map.add_member(group, owner)
+
+        self.stdout.write(str(group.uuid))
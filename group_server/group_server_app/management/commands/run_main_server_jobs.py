@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from group_server_app.services import main_server
+
+
+class Command(BaseCommand):
+    help = "Registers the users with queued joins in the main server"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="seconds to wait when there are no jobs due")
+        parser.add_argument('--batch', type=int, default=100,
+                            help="maximum number of jobs claimed at once")
+        parser.add_argument('--once', action='store_true',
+                            help="run the jobs that are due and exit")
+
+    def handle(self, *args, **options):
+        while True:
+            count = main_server.run_pending_jobs(limit=options['batch'])
+
+            if options['once']:
+                self.stdout.write("ran %d jobs" % count)
+                return
+
+            if count == 0:
+                time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group_server_app', '0003_auto_20170102_1544'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MainServerJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_signature', models.CharField(max_length=400)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('last_error', models.CharField(blank=True, default='', max_length=200)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='group_server_app.group')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='group_server_app.user')),
+            ],
+        ),
+    ]
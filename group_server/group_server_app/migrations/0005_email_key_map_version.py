@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group_server_app', '0004_main_server_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='members_version',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='join_version',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
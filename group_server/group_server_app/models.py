@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 import uuid
 
 key_length = 400;
@@ -8,6 +9,9 @@ class Group(models.Model):
     name = models.CharField(max_length=80)
 
     key = models.CharField(max_length=key_length)
+
+    # incremented every time a user is confirmed, identifies the email-key map
+    members_version = models.IntegerField(default=0)
     
     def __str__(self):
         return self.name
@@ -17,6 +21,8 @@ class User(models.Model):
     key = models.CharField(primary_key=True, max_length=key_length)
     email = models.EmailField(max_length=254)
     confirmed = models.BooleanField(default=False)
+    # members_version of the group when the user was confirmed
+    join_version = models.IntegerField(default=0, db_index=True)
 
     def __str__(self):
         return self.key
@@ -36,8 +42,28 @@ class Invitation(models.Model):
 	def __str__(self):
 		return str(self.uuid)
 
-	
-	
 
+class MainServerJob(models.Model):
+	"""
+	Registration of a user in the main server that is still to be done. The
+	user is only confirmed once the main server acknowledges the registration.
+	Failed attempts are retried with an exponential backoff.
+	"""
+	PENDING = 'pending'
+	DONE = 'done'
+	FAILED = 'failed'
+	STATES = ((PENDING, 'Pending'), (DONE, 'Done'), (FAILED, 'Failed'))
 
+	group = models.ForeignKey(Group, on_delete=models.CASCADE)
+	user = models.ForeignKey(User, on_delete=models.CASCADE)
+	# signature of the user's ConfirmJoin, stored in the invitation once done
+	user_signature = models.CharField(max_length=key_length)
+
+	state = models.CharField(max_length=10, choices=STATES, default=PENDING)
+	attempts = models.IntegerField(default=0)
+	next_attempt = models.DateTimeField(default=timezone.now, db_index=True)
+	last_error = models.CharField(max_length=200, default='', blank=True)
+	created = models.DateTimeField(auto_now_add=True)
 
+	def __str__(self):
+		return "%s: %s" % (self.state, self.user)
@@ -0,0 +1,87 @@
+"""
+E-mail to key map of the confirmed users of each group.
+
+Every time a user is confirmed the group's members_version is incremented
+and stored in the user's join_version. The version identifies the map: the
+map of a group is built once per version and kept in the cache, and clients
+that already have the map of a version only need the members that joined
+after it.
+
+Users must be confirmed through 'add_member' for the version to be kept up
+to date.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from ..models import Group, User
+
+from utils import metrics
+
+_cache_requests = metrics.counter('email_key_map_cache_requests',
+                                  'Lookups of the email-key map cache per result',
+                                  labels=('result',))
+
+# maps are replaced by a new version as soon as a member joins
+CACHE_TIMEOUT = 60 * 60
+
+
+def add_member(group, user):
+    """
+    Confirms a user of the group and increments the version of the group's
+    map. The user is saved.
+    """
+    with transaction.atomic():
+        Group.objects.filter(pk=group.pk) \
+            .update(members_version=F('members_version') + 1)
+        group.refresh_from_db(fields=['members_version'])
+
+        user.confirmed = True
+        user.join_version = group.members_version
+        user.save()
+
+
+def _cache_key(group) -> str:
+    return 'email-key-map:%s:%d' % (group.uuid, group.members_version)
+
+
+def get_members(group) -> list:
+    """
+    Provides the map of the current version of the group.
+
+    :return: list of [email, key, join_version] ordered by join version.
+    """
+    key = _cache_key(group)
+    members = cache.get(key)
+
+    if members is not None:
+        _cache_requests.inc(result='hit')
+        return members
+
+    _cache_requests.inc(result='miss')
+    members = [list(member) for member in
+               User.objects.filter(group=group, confirmed=True)
+                   .order_by('join_version', 'pk')
+                   .values_list('email', 'key', 'join_version')]
+
+    cache.set(key, members, CACHE_TIMEOUT)
+    return members
+
+
+def all_members(group) -> list:
+    """
+    Provides every member of the group.
+
+    :return: list of [email, key] pairs ordered by join version.
+    """
+    return [[email, key] for email, key, join_version in get_members(group)]
+
+
+def members_since(group, cursor: int) -> list:
+    """
+    Provides the members that joined the group after the given version.
+
+    :return: list of [email, key] pairs ordered by join version.
+    """
+    return [[email, key] for email, key, join_version in get_members(group)
+            if join_version > cursor]
@@ -0,0 +1,219 @@
+"""
+Registration of the group's users in the main server.
+
+A user is registered in the main server when he confirms his join. The
+registration is either done synchronously, inside the ConfirmJoin request,
+or queued as a MainServerJob when MAIN_SERVER_JOIN_ASYNC is set. Queued jobs
+are executed by the 'run_main_server_jobs' management command.
+"""
+import http.client
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Invitation, MainServerJob
+from . import key_map
+
+from utils import metrics
+from utils.crypto.rsa import InvalidSignature
+from utils.messages import message_formats as msg
+from utils.messages.connection import ConnectionPool, UnknownError, error_exception
+from utils.messages.message import DecodeError
+
+logger = logging.getLogger(__name__)
+
+_jobs = metrics.counter('main_server_jobs', 'Main server registration attempts per result',
+                        labels=('result',))
+
+# time a worker has to process a claimed job before other workers may claim it
+JOB_LEASE = timedelta(minutes=5)
+
+
+class SecurityException(Exception):
+    """ Raised when the response of the main server can not be trusted """
+
+
+# errors after which the registration is worth retrying: connection errors,
+# error status codes and invalid responses from the main server
+_RETRY_ERRORS = (OSError, http.client.HTTPException, SecurityException, UnknownError) \
+                + tuple(error_exception.values())
+
+
+_pool = None  # type: ConnectionPool
+
+
+def _connect():
+    """ Provides a connection to the main server from a pool of connections """
+    global _pool
+
+    if _pool is None:
+        _pool = ConnectionPool(settings.MAIN_SERVER_URL,
+                               timeout=settings.MAIN_SERVER_TIMEOUT)
+
+    return _pool.connect()
+
+
+def register_group(name: str) -> str:
+    """
+    Registers a new group, signed with the group server's key, in the main
+    server.
+
+    :return: uuid of the group assigned by the main server.
+    :raise SecurityException: if the main server's response is invalid.
+    :raise OSError: if the main server could not be reached.
+    """
+    group_signature = msg.RegisterGroup.sign(settings.PRIVATE_KEY, 'group',
+                                             group_name=name,
+                                             group_key=settings.PUBLIC_KEY)
+
+    with _connect() as connection:
+        request = msg.RegisterGroup.make_request(group_name=name,
+                                                 group_key=settings.PUBLIC_KEY,
+                                                 group_signature=group_signature)
+        connection.request(request)
+
+        try:
+            response = connection.get_response(msg.RegisterGroup)
+        except DecodeError:
+            raise SecurityException('Response format not correct')
+
+        try:
+            msg.RegisterGroup.verify(settings.MAIN_PUBLIC_KEY, 'main',
+                                     response.main_signature,
+                                     group_uuid=response.group_uuid,
+                                     group_name=name,
+                                     group_key=settings.PUBLIC_KEY)
+        except InvalidSignature:
+            raise SecurityException('Signature of the response is invalid')
+
+    return response.group_uuid
+
+
+def register_user(group, user):
+    """
+    Registers a user of the group in the main server.
+
+    :raise SecurityException: if the main server's response is invalid.
+    :raise OSError: if the main server could not be reached.
+    """
+    group_signature = msg.MainServerJoin.sign(settings.PRIVATE_KEY, 'group',
+                                              group_uuid=str(group.uuid),
+                                              user=user.key)
+
+    with _connect() as connection:
+        request = msg.MainServerJoin.make_request(group_uuid=str(group.uuid),
+                                                  user=user.key,
+                                                  group_signature=group_signature)
+        connection.request(request)
+
+        try:
+            response = connection.get_response(msg.MainServerJoin)
+        except DecodeError:
+            raise SecurityException('Response format not correct')
+
+        try:
+            msg.MainServerJoin.verify(settings.MAIN_PUBLIC_KEY, 'main',
+                                      response.main_signature,
+                                      group_uuid=str(group.uuid), user=user.key)
+        except InvalidSignature:
+            raise SecurityException('Signature of the response is invalid')
+
+
+def complete_join(group, user, user_signature):
+    """
+    Completes the join of a user already registered in the main server:
+    stores the user's signature in his invitation and confirms the user.
+    """
+    invitation = Invitation.objects.get(invitee=user, group=group)
+    invitation.signature_invitee = user_signature
+    invitation.save()
+
+    key_map.add_member(group, user)
+
+
+def enqueue_join(group, user, user_signature) -> MainServerJob:
+    """
+    Queues the registration of the user in the main server. If the user
+    already has a pending registration that one is returned instead.
+    """
+    job, created = MainServerJob.objects.get_or_create(
+        group=group, user=user, state=MainServerJob.PENDING,
+        defaults={'user_signature': user_signature}
+    )
+
+    return job
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """ Delay before the next attempt grows exponentially up to a maximum """
+    delay = settings.MAIN_SERVER_JOB_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.MAIN_SERVER_JOB_MAX_RETRY_DELAY))
+
+
+def claim_jobs(limit: int) -> list:
+    """
+    Claims up to 'limit' pending jobs that are due. Claimed jobs are leased,
+    so that other workers skip them while they are being processed.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        jobs = list(MainServerJob.objects
+                    .select_for_update(skip_locked=True)
+                    .filter(state=MainServerJob.PENDING, next_attempt__lte=now)
+                    .order_by('next_attempt')[:limit])
+
+        MainServerJob.objects.filter(pk__in=[job.pk for job in jobs]) \
+            .update(next_attempt=now + JOB_LEASE)
+
+    return jobs
+
+
+def run_job(job: MainServerJob):
+    """
+    Tries to register the job's user in the main server. On success the
+    user's join is completed. On failure the job is rescheduled, or marked as
+    failed once it reaches the maximum number of attempts.
+    """
+    job.attempts += 1
+
+    try:
+        register_user(job.group, job.user)
+
+    except _RETRY_ERRORS as error:
+        logger.warning("main server registration of %s failed (attempt %d): %r",
+                       job.user, job.attempts, error)
+
+        job.last_error = repr(error)[:200]
+        if job.attempts >= settings.MAIN_SERVER_JOB_MAX_ATTEMPTS:
+            job.state = MainServerJob.FAILED
+            _jobs.inc(result='failed')
+        else:
+            job.next_attempt = timezone.now() + retry_delay(job.attempts)
+            _jobs.inc(result='retry')
+
+        job.save()
+        return
+
+    with transaction.atomic():
+        complete_join(job.group, job.user, job.user_signature)
+        job.state = MainServerJob.DONE
+        job.save()
+
+    _jobs.inc(result='done')
+
+
+def run_pending_jobs(limit=100) -> int:
+    """
+    Runs the pending jobs that are due.
+
+    :return: number of jobs that were run.
+    """
+    jobs = claim_jobs(limit)
+    for job in jobs:
+        run_job(job)
+
+    return len(jobs)
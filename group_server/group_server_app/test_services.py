@@ -0,0 +1,105 @@
+import http.client
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Group, User, Invitation, MainServerJob
+from .services import main_server
+
+from utils.crypto import example_keys, rsa
+
+
+class MainServerJobTests(TestCase):
+    def setUp(self):
+        self.group = Group.objects.create(name='test', key=example_keys.G1_pub)
+        self.user = User.objects.create(group=self.group, key=example_keys.C2_pub, email='c2@example.pt')
+        inviter = User.objects.create(group=self.group, key=example_keys.C1_pub, email='c1@example.pt', confirmed=True)
+        Invitation.objects.create(group=self.group, invitee=self.user, inviter=inviter, signature_inviter='sig', secret_code='0000')
+
+        self.job = main_server.enqueue_join(self.group, self.user, 'user_signature')
+
+    def test_successful_job_confirms_the_user(self):
+        with patch.object(main_server, 'register_user') as register_user:
+            assert main_server.run_pending_jobs() == 1
+
+        register_user.assert_called_once_with(self.group, self.user)
+        self.job.refresh_from_db()
+        assert self.job.state == MainServerJob.DONE
+        assert User.objects.get(key=self.user.key).confirmed
+        assert Invitation.objects.get(invitee=self.user).signature_invitee == 'user_signature'
+        self.group.refresh_from_db()
+        assert self.group.members_version == 1
+        assert User.objects.get(key=self.user.key).join_version == 1
+
+    def test_failed_job_is_retried_with_backoff(self):
+        with patch.object(main_server, 'register_user', side_effect=ConnectionRefusedError()):
+            main_server.run_pending_jobs()
+
+        self.job.refresh_from_db()
+        assert self.job.state == MainServerJob.PENDING
+        assert self.job.attempts == 1
+        assert self.job.next_attempt > timezone.now()
+        assert not User.objects.get(key=self.user.key).confirmed
+
+        # the job is not due yet
+        assert main_server.run_pending_jobs() == 0
+
+    def test_job_whose_response_was_lost_is_retried(self):
+        # the main server registered the user but its response was lost, the
+        # retried registration is answered as the first one
+        with patch.object(main_server, 'register_user',
+                          side_effect=[http.client.RemoteDisconnected(), None]) as register_user:
+            main_server.run_pending_jobs()
+            MainServerJob.objects.update(next_attempt=timezone.now())
+            main_server.run_pending_jobs()
+
+        assert register_user.call_count == 2
+        self.job.refresh_from_db()
+        assert self.job.state == MainServerJob.DONE
+        assert self.job.attempts == 2
+        assert User.objects.get(key=self.user.key).confirmed
+
+    def test_job_fails_after_the_maximum_number_of_attempts(self):
+        with self.settings(MAIN_SERVER_JOB_MAX_ATTEMPTS=2), \
+                patch.object(main_server, 'register_user',
+                             side_effect=main_server.SecurityException()):
+            for _ in range(2):
+                MainServerJob.objects.update(next_attempt=timezone.now())
+                main_server.run_pending_jobs()
+
+        self.job.refresh_from_db()
+        assert self.job.state == MainServerJob.FAILED
+        assert self.job.attempts == 2
+
+    def test_retry_delay_grows_exponentially_up_to_a_maximum(self):
+        with self.settings(MAIN_SERVER_JOB_RETRY_DELAY=5, MAIN_SERVER_JOB_MAX_RETRY_DELAY=60):
+            assert main_server.retry_delay(1) == timedelta(seconds=5)
+            assert main_server.retry_delay(3) == timedelta(seconds=20)
+            assert main_server.retry_delay(10) == timedelta(seconds=60)
+
+
+class CreateGroupCommandTests(TestCase):
+    def test_creates_the_group_and_its_confirmed_owner(self):
+        group_uuid = str(uuid4())
+        key_path = os.path.join(tempfile.mkdtemp(), 'owner.pem')
+        rsa.dump_pubkey(example_keys.C1_pub, key_path)
+        output = StringIO()
+
+        with patch.object(main_server, 'register_group', return_value=group_uuid), \
+                patch.object(main_server, 'register_user') as register_user:
+            call_command('create_group', 'friends', owner_key=key_path,
+                         owner_email='c1@example.pt', stdout=output)
+
+        assert output.getvalue().strip() == group_uuid
+        group = Group.objects.get(pk=group_uuid)
+        owner = User.objects.get(key=example_keys.C1_pub)
+        assert owner.group == group and owner.confirmed
+        assert group.members_version == 1
+        register_user.assert_called_once_with(group, owner)
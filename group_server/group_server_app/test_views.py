@@ -8,7 +8,8 @@ from uuid import uuid4
 
 from collections import defaultdict
 
-from .models import Group, User, Invitation
+from .models import Group, User, Invitation, MainServerJob
+from .services import key_map
 
 from utils.crypto.rsa import generate_keys, sign, verify
 from utils.crypto import example_keys
@@ -38,6 +39,14 @@ class InviteUserTests(TestCase):
         raw_response = self.client.post(reverse('group_server_app:invite_user'),{'data': request.dumps()})
         assert raw_response.status_code == 201
     
+    def test_fixed_secret_code_in_debug(self):
+        signature = self.message_class.sign(self.private_key, 'user', group_uuid=str(self.group.uuid), user=self.inviter.key, invitee=example_keys.C2_pub,invitee_email='c2@example.pt')
+        request = self.message_class.make_request(group_uuid=str(self.group.uuid), user=self.inviter.key, invitee=example_keys.C2_pub, invitee_email='c2@example.pt', user_signature=signature)
+        with self.settings(DEBUG=True, INVITE_SECRET_CODE='1234'):
+            raw_response = self.client.post(reverse('group_server_app:invite_user'),{'data': request.dumps()})
+        assert raw_response.status_code == 201
+        assert Invitation.objects.get(invitee_id=example_keys.C2_pub).secret_code == '1234'
+    
     def test_inviter_different_group_error(self):
         signature = self.message_class.sign(self.private_key, 'user', group_uuid=str(self.group.uuid), user=self.inviter.key, invitee=example_keys.C2_pub,invitee_email='c2@example.pt')
         request = self.message_class.make_request(group_uuid=str(self.group2.uuid), user=self.inviter.key, invitee=example_keys.C2_pub, invitee_email='c2@example.pt', user_signature=signature)
@@ -105,7 +114,7 @@ class ConfirmJoinTests(TestCase):
         self.private_key1, self.key1 = example_keys.C1_priv, example_keys.C1_pub 
         self.inviter = User.objects.create(group=self.group, key=self.key1, email='c1@example.pt', confirmed=True) 
         
-        def mock_server(main_server_url):
+        def mock_server(*args):
             mock_connection = MagicMock()
             mock_connection.__enter__.return_value = mock_connection
             mock_connection.__exit__.return_value = None
@@ -116,7 +125,7 @@ class ConfirmJoinTests(TestCase):
             response = msg.MainServerJoin.make_response(group_uuid=str(self.group.uuid), user=self.key2, main_signature='rdfsfsdfsdfsdfsd' )
             return response    
         
-        patch('group_server_app.views.connect', mock_server).start()
+        patch('group_server_app.services.main_server._connect', mock_server).start()
         patch('utils.messages.connection.Connection.get_response', forge_request).start()
          
     def test_correct_input(self): 
@@ -132,6 +141,39 @@ class ConfirmJoinTests(TestCase):
         raw_response = self.client.post(reverse('group_server_app:confirm_join'),{'data': request.dumps()}) 
         assert raw_response.status_code == 200 
         
+class ConfirmJoinAsyncTests(TestCase):
+    def setUp(self):
+        self.message_class = msg.ConfirmJoin
+        self.group = Group.objects.create(name='test', key=example_keys.G1_pub)
+        self.user = User.objects.create(group=self.group, key=example_keys.C2_pub, email='c2@example.pt')
+        self.inviter = User.objects.create(group=self.group, key=example_keys.C1_pub, email='c1@example.pt', confirmed=True)
+
+        inviter_signature = msg.UserInvite.sign(example_keys.C1_priv, 'user', group_uuid=str(self.group.uuid), user=self.inviter.key, invitee=self.user.key, invitee_email='c2@example.pt')
+        group_signature = msg.GroupServerJoin.sign(settings.PRIVATE_KEY, 'group', inviter_signature=inviter_signature)
+        Invitation.objects.create(group=self.group, invitee=self.user, inviter=self.inviter, signature_inviter=inviter_signature, signature_group=group_signature, secret_code='0000')
+
+        signature = self.message_class.sign(example_keys.C2_priv, 'user', group_uuid=str(self.group.uuid), user=self.user.key, group_server_signature=group_signature)
+        self.request = self.message_class.make_request(group_uuid=str(self.group.uuid), user=self.user.key, user_signature=signature)
+
+    def test_join_is_queued_and_returns_immediately(self):
+        with self.settings(MAIN_SERVER_JOIN_ASYNC=True), \
+                patch('group_server_app.services.main_server.register_user') as register_user:
+            raw_response = self.client.post(reverse('group_server_app:confirm_join'), {'data': self.request.dumps()})
+
+        assert raw_response.status_code == 202
+        register_user.assert_not_called()
+        assert MainServerJob.objects.filter(user=self.user, state=MainServerJob.PENDING).count() == 1
+        assert not User.objects.get(key=self.user.key).confirmed
+
+    def test_repeated_confirm_does_not_queue_the_join_twice(self):
+        with self.settings(MAIN_SERVER_JOIN_ASYNC=True):
+            self.client.post(reverse('group_server_app:confirm_join'), {'data': self.request.dumps()})
+            raw_response = self.client.post(reverse('group_server_app:confirm_join'), {'data': self.request.dumps()})
+
+        assert raw_response.status_code == 202
+        assert MainServerJob.objects.filter(user=self.user).count() == 1
+
+
 class EmailKeyMap(TestCase):
     def setUp(self):   
         self.message_class = msg.EmailKeyMap
@@ -146,5 +188,36 @@ class EmailKeyMap(TestCase):
         request = self.message_class.make_request(group_uuid=str(self.group.uuid), user=self.user.key, request_type='email-key-map', signature=signature)
         raw_response = self.client.post(reverse('group_server_app:email_key_map'),{'data': request.dumps()})
         assert raw_response.status_code == 200
+
+        response = self.message_class.load_response(raw_response.content.decode())
+        assert sorted(response.members) == sorted([['c1@example.pt', self.key],
+                                                   ['c2@example.pt', example_keys.C2_pub],
+                                                   ['c3@example.pt', example_keys.C3_pub]])
+        assert response.cursor == 0
+
+    def test_delta_returns_only_members_added_after_the_cursor(self):
+        invitee = User.objects.create(group=self.group, key=example_keys.C4_pub, email='c4@example.pt')
+        key_map.add_member(self.group, invitee)
+
+        message_class = msg.EmailKeyMapDelta
+        signature = message_class.sign(self.private_key, 'user', group_uuid=str(self.group.uuid),
+                                       request_type='email-key-map-delta', cursor=0)
+        request = message_class.make_request(group_uuid=str(self.group.uuid), user=self.user.key,
+                                             request_type='email-key-map-delta', cursor=0, signature=signature)
+        raw_response = self.client.post(reverse('group_server_app:email_key_map_delta'), {'data': request.dumps()})
+
+        assert raw_response.status_code == 200
+        response = message_class.load_response(raw_response.content.decode())
+        assert response.members == [['c4@example.pt', example_keys.C4_pub]]
+        assert response.cursor == 1
+
+    def test_map_is_rebuilt_when_a_member_joins(self):
+        assert len(key_map.get_members(self.group)) == 3
+
+        invitee = User.objects.create(group=self.group, key=example_keys.C4_pub, email='c4@example.pt')
+        key_map.add_member(self.group, invitee)
+
+        assert len(key_map.get_members(self.group)) == 4
+        assert key_map.members_since(self.group, 1) == []
         
         
@@ -7,4 +7,5 @@ urlpatterns = [
     url(r'^join-group$', views.join_group, name='join_group'),
     url(r'^confirm-join$', views.confirm_join, name='confirm_join'),
     url(r'^email-key-map$', views.email_key_map, name='email_key_map'),
+    url(r'^email-key-map-delta$', views.email_key_map_delta, name='email_key_map_delta'),
 ]
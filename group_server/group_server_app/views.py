@@ -5,21 +5,21 @@ from django.db import transaction
 from django.conf import settings
 from collections import defaultdict
 from django.core.mail import send_mail
-from utils.messages.connection import connect, Connection
 import json
 import os
 
 from .models import Group, User, Invitation
+from .services import key_map, main_server
 
+from utils import metrics
 from utils.crypto.rsa import sign, verify, InvalidSignature
 from utils.messages import message_formats as msg
 from utils.messages.message import DecodeError
 
-# Create your views here.
-
-class SecurityException(Exception):
-    pass
+_group_size = metrics.histogram('group_size_users', 'Number of confirmed users per key map',
+                                buckets=(2, 5, 10, 20, 50, 100, 200, 500, 1000))
 
+# Create your views here.
 
 def invite_user(request):
     message_class = msg.UserInvite
@@ -61,7 +61,10 @@ def invite_user(request):
     invitee = User.objects.create(group=group, key=request.invitee, email=request.invitee_email)
     
     #Generate secret code
-    secret_code = str(int.from_bytes(os.urandom(4), byteorder="big")) #Is it big enough?
+    if settings.DEBUG and settings.INVITE_SECRET_CODE:
+        secret_code = settings.INVITE_SECRET_CODE
+    else:
+        secret_code = str(int.from_bytes(os.urandom(4), byteorder="big")) #Is it big enough?
     
     # #Set proxy URL
     # proxy_url = 'proxy.com' #TODO: change to proxy address
@@ -155,34 +158,19 @@ def confirm_join(request):
         
     if user.confirmed:
         return HttpResponse('409 Conflict', status=409)
-        
+
+    if settings.MAIN_SERVER_JOIN_ASYNC:
+        # the user is confirmed once the main server acknowledges the join
+        main_server.enqueue_join(group, user, request.user_signature)
+
+        response = message_class.make_response(group_uuid=str(group.uuid), user=user.key)
+        return HttpResponse(response.dumps(), status=202)
+
     #Confirm to main server successfull registration of user
-    main_server_url = 'localhost:8000' #TODO: change to real address
-    
-    group_signature = msg.MainServerJoin.sign(settings.PRIVATE_KEY, 'group', group_uuid=str(group.uuid), user=user.key)
-    
-    with connect(main_server_url) as connection:
-        request_main = msg.MainServerJoin.make_request(group_uuid=str(group.uuid), user=user.key, group_signature=group_signature)
-        connection.request(request_main)
-        
-        try:
-            response = connection.get_response(msg.MainServerJoin)   
-
-        except DecodeError:
-            raise SecurityException('Response format not correct')
-            
-        try:
-            msg.MainServerJoin.verify(settings.MAIN_PUBLIC_KEY, 'main', response.main_signature, group_uuid=str(group.uuid), user=user.key)
-        except InvalidSignature:
-            raise SecurityException('Signature of the response is invalid')    
-    
-    #Save user_signature
-    invitation.signature_invitee = request.user_signature
-    invitation.save()
-        
-    #Change user status to confirmed
-    user.confirmed = True
-    user.save()
+    main_server.register_user(group, user)
+
+    #Save user_signature and change user status to confirmed
+    main_server.complete_join(group, user, request.user_signature)
 
     response = message_class.make_response(group_uuid=str(group.uuid), user=user.key)
 
@@ -190,8 +178,12 @@ def confirm_join(request):
     return HttpResponse(response.dumps(), status=200)
 
 def email_key_map(request):
+    return _email_key_map(request, msg.EmailKeyMap)
 
-    message_class = msg.EmailKeyMap
+def email_key_map_delta(request):
+    return _email_key_map(request, msg.EmailKeyMapDelta)
+
+def _email_key_map(request, message_class):
     
     try:  # convert the message into the request object
         request = message_class.load_request(request.POST['data'])
@@ -207,21 +199,23 @@ def email_key_map(request):
     if not user.confirmed:
         return HttpResponseForbidden()
 
+    # only delta requests carry a cursor
+    cursor = getattr(request, 'cursor', None)
+
     try:
         message_class.verify(user.key, 'user', request.signature,
                                  group_uuid=request.group_uuid,
-                                 request_type='email-key-map')
+                                 request_type=message_class.url,
+                                 cursor=cursor)
     except InvalidSignature:
         return HttpResponse('401 Unauthorized', status=401)
-        
-    keymap = User.objects.filter(group_id=request.group_uuid, confirmed=True)
-    
-    mapkey = ''
-    
-    for person in keymap:
-        mapkey = mapkey + person.email + ':' + person.key + '\n'
-        
-    response = message_class.make_response(mapkey=mapkey)     
-      
+
+    if cursor is None:
+        members = key_map.all_members(group)
+        _group_size.observe(len(members))
+    else:
+        members = key_map.members_since(group, cursor)
+
+    response = message_class.make_response(members=members, cursor=group.members_version)
 
     return HttpResponse(response.dumps(), status=200)
@@ -0,0 +1,20 @@
+"""
+ASGI config for main_server project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Under ASGI the async views (see main_server_app.views) run in the event loop,
+for instance with:
+
+    uvicorn --workers 4 main_server.asgi:application
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main_server.settings")
+
+application = get_asgi_application()
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/1.10/ref/settings/
 
 import os
 from utils.crypto.rsa import load_keys
+from utils.server.database import database_from_env, shard_databases
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -19,6 +20,42 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 PRIVATE_KEY, PUBLIC_KEY = load_keys(BASE_DIR + '/server_keys.pem')
 UOME_DESCRIPTION_MAX_LENGTH = 140  # twitter style!
 
+# Workers used to sign and verify signatures, 0 signs inline on the request thread
+CRYPTO_POOL_WORKERS = int(os.environ.get('CRYPTO_POOL_WORKERS', 0))
+CRYPTO_POOL_KIND = os.environ.get('CRYPTO_POOL_KIND', 'thread')  # 'thread' or 'process'
+
+# Request timing: requests slower than TIMING_SLOW_REQUEST seconds are logged as
+# warnings and, if sampled for profiling, have their profile dumped to TIMING_PROFILE_DIR
+TIMING_SLOW_REQUEST = float(os.environ.get('TIMING_SLOW_REQUEST', 0.5))
+TIMING_PROFILE_RATE = float(os.environ.get('TIMING_PROFILE_RATE', 0.0))
+TIMING_PROFILE_DIR = os.environ.get('TIMING_PROFILE_DIR')
+
+# Settlement of the groups' debts (see main_server_app.services.settlement): 'immediate'
+# settles on every accept, 'deferred' leaves it to the run_settlement_worker command,
+# which settles each dirty group SETTLEMENT_INTERVAL seconds after its first accept
+SETTLEMENT_MODE = os.environ.get('SETTLEMENT_MODE', 'immediate')
+SETTLEMENT_INTERVAL = float(os.environ.get('SETTLEMENT_INTERVAL', 5.0))
+# Algorithm simplifying the debts, one of main_server_app.services.simplify_debt.ENGINES
+SETTLEMENT_ENGINE = os.environ.get('SETTLEMENT_ENGINE', 'greedy')
+
+# The balances of a group are saved every CHECKPOINT_INTERVAL accepted UOMes, the
+# balances at any point of its history are replayed from the nearest checkpoint
+CHECKPOINT_INTERVAL = int(os.environ.get('CHECKPOINT_INTERVAL', 1000))
+
+# Directory of the append-only ledger files of the groups, replayed to recover them
+# (disabled if empty), synced to disk at most every LEDGER_FSYNC_INTERVAL seconds (0: on
+# every accepted UOMe)
+LEDGER_FILES_DIR = os.environ.get('LEDGER_FILES_DIR', '')
+LEDGER_FSYNC_INTERVAL = float(os.environ.get('LEDGER_FSYNC_INTERVAL', 0.1))
+
+# Response bodies of at least COMPRESSION_MIN_SIZE bytes are compressed for the
+# clients that accept it (gzip or deflate)
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+
+# Addresses allowed to scrape the metrics endpoint (comma separated)
+METRICS_ALLOWED_ADDRESSES = os.environ.get('METRICS_ALLOWED_ADDRESSES', '127.0.0.1,::1').split(',')
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/1.10/howto/deployment/checklist/
 
@@ -45,6 +82,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.server.middleware.MetricsMiddleware',
+    'utils.server.middleware.TimingMiddleware',
+    'utils.server.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,18 +113,24 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'main_server.wsgi.application'
+ASGI_APPLICATION = 'main_server.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/1.10/ref/settings/#databases
 
+# The database is selected with environment variables, see utils.server.database
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': database_from_env('main_server', os.path.join(BASE_DIR, 'db.sqlite3')),
 }
 
+# The groups are spread across DATABASE_SHARDS databases, the default database
+# is the first shard (see main_server_app.sharding)
+DATABASES.update(shard_databases(DATABASES['default']))
+SHARDS = list(DATABASES)
+DATABASE_ROUTERS = ['main_server_app.routers.GroupShardRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.10/ref/settings/#auth-password-validators
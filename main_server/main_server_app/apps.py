@@ -1,5 +1,20 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+
+from main_server_app.services import simplify_debt
+from utils.crypto import pool
+from utils.server.database import configure_sqlite
 
 
 class MainServerAppConfig(AppConfig):
     name = 'main_server_app'
+
+    def ready(self):
+        # fail at startup instead of in every accept
+        if settings.SETTLEMENT_ENGINE not in simplify_debt.ENGINES:
+            raise ImproperlyConfigured("unknown settlement engine: %s" % settings.SETTLEMENT_ENGINE)
+
+        pool.configure(settings.CRYPTO_POOL_WORKERS, settings.CRYPTO_POOL_KIND)
+        connection_created.connect(configure_sqlite)
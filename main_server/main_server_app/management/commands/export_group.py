@@ -0,0 +1,25 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from main_server_app.models import Group
+from main_server_app.services.export import export_group
+from main_server_app.sharding import shard_of
+from utils.server.sharding import use_shard
+
+
+class Command(BaseCommand):
+    help = "Exports the UOMes, balances and ledger of a group to a columnar file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('group_uuid', help="uuid of the group to export")
+        parser.add_argument('path', help="path of the file to write")
+
+    def handle(self, *args, **options):
+        try:
+            with use_shard(shard_of(options['group_uuid'])):
+                group = Group.objects.get(pk=options['group_uuid'])
+                count = export_group(group, options['path'])
+        except (ValueError, ValidationError, Group.DoesNotExist) as error:
+            raise CommandError(error)
+
+        self.stdout.write("exported %d UOMes to %s" % (count, options['path']))
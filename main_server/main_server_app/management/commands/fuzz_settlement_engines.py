@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main_server_app.services import engine_harness, simplify_debt
+
+
+class Command(BaseCommand):
+    help = "Settles random and adversarial balance vectors with every settlement engine, " \
+           "checks the settlements and their time budgets and compares their numbers of debts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engine', action='append', choices=sorted(simplify_debt.ENGINES),
+                            help="engine to check, can be repeated, defaults to all of them")
+        parser.add_argument('--sizes', default='2,10,100,1000',
+                            help="comma separated numbers of users of the vectors")
+        parser.add_argument('--iterations', type=int, default=10,
+                            help="number of vectors of each size and kind")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--no-time-budgets', action='store_true',
+                            help="only report the times of the engines")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+            report = engine_harness.run(options['engine'], sizes,
+                                        iterations=options['iterations'], seed=options['seed'],
+                                        time_budgets=not options['no_time_budgets'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        self.stdout.write("%d vectors" % report.vectors)
+        for engine in report.engines:
+            times = ' '.join("%d:%.6fs" % (size, seconds) for size, seconds in
+                             sorted(report.worst_times[engine].items()))
+            self.stdout.write("%s: %d debts, more than the best engine for %d vectors, "
+                              "worst times %s" % (engine, report.debts[engine],
+                                                  report.more_debts[engine], times))
+
+        for engine, kind, size, seed, problem in report.failures:
+            self.stderr.write("FAIL %s on %s vector of %d users (seed %d): %s" % (
+                engine, kind, size, seed, problem))
+
+        for engine, kind, size, seed, seconds in report.over_budget:
+            self.stderr.write("SLOW %s on %s vector of %d users (seed %d): %.6fs > %.6fs" % (
+                engine, kind, size, seed, seconds, engine_harness.budget(size)))
+
+        if not report.ok:
+            raise CommandError("%d failures, %d settlements over budget" % (
+                len(report.failures), len(report.over_budget)))
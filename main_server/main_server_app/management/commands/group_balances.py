@@ -0,0 +1,36 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from main_server_app.models import Group
+from main_server_app.services.checkpoints import balances_at
+from main_server_app.sharding import shard_of
+from utils.server.sharding import use_shard
+
+
+class Command(BaseCommand):
+    help = "Prints the balances of the users of a group at a point of its history, " \
+           "replayed from the nearest checkpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument('group_uuid', help="uuid of the group")
+        parser.add_argument('--at', help="ISO 8601 datetime, e.g. 2017-06-01T12:00:00Z")
+        parser.add_argument('--ledger-size', type=int,
+                            help="number of accepted UOMes to include")
+
+    def handle(self, *args, **options):
+        when = None
+        if options['at']:
+            when = parse_datetime(options['at'])
+            if when is None:
+                raise CommandError("invalid datetime: %s" % options['at'])
+
+        try:
+            with use_shard(shard_of(options['group_uuid'])):
+                group = Group.objects.get(pk=options['group_uuid'])
+                balances = balances_at(group, options['ledger_size'], when)
+        except (ValueError, ValidationError, Group.DoesNotExist) as error:
+            raise CommandError(error)
+
+        for key, balance in sorted(balances.items()):
+            self.stdout.write("%s %d" % (key, balance))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main_server_app.services.export import import_group
+from utils.columnar import FormatError
+
+
+class Command(BaseCommand):
+    help = "Imports a group exported with the export_group command"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="path of the exported file")
+        parser.add_argument('--batch', type=int, default=1000,
+                            help="number of objects inserted at once")
+
+    def handle(self, *args, **options):
+        try:
+            group = import_group(options['path'], batch_size=options['batch'])
+        except (OSError, ValueError, FormatError) as error:
+            raise CommandError(error)
+
+        self.stdout.write("imported group %s" % group.uuid)
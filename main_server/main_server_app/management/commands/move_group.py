@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main_server_app.models import Group
+from main_server_app.sharding import move_group, shard_of
+
+
+class Command(BaseCommand):
+    help = "Moves the data of a group to another shard. The group must not " \
+           "receive requests while it is moved."
+
+    def add_arguments(self, parser):
+        parser.add_argument('group_uuid', help="uuid of the group to move")
+        parser.add_argument('shard', help="alias of the target shard")
+
+    def handle(self, *args, **options):
+        try:
+            source = shard_of(options['group_uuid'])
+            moved = move_group(options['group_uuid'], options['shard'])
+        except (ValueError, Group.DoesNotExist) as error:
+            raise CommandError(error)
+
+        self.stdout.write("moved %d objects from %s to %s" % (moved, source, options['shard']))
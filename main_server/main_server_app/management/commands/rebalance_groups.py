@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main_server_app.services import simplify_debt
+from main_server_app.services.rebalance import rebalance_groups
+
+
+class Command(BaseCommand):
+    help = "Recomputes the user debts of every group from the balances of its users, " \
+           "across a pool of processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shard', action='append',
+                            help="shard to rebalance, can be repeated, defaults to all of them")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="number of processes, defaults to the number of CPUs, "
+                                 "0 to simplify in this process")
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help="number of groups read and written at once")
+        parser.add_argument('--engine', choices=sorted(simplify_debt.ENGINES),
+                            help="settlement engine, defaults to SETTLEMENT_ENGINE")
+        parser.add_argument('--slowest', type=int, default=10,
+                            help="number of slowest groups to report")
+
+    def handle(self, *args, **options):
+        unknown = set(options['shard'] or ()) - set(settings.SHARDS)
+        if unknown:
+            raise CommandError("unknown shards: %s" % ', '.join(sorted(unknown)))
+
+        timings = []
+
+        def on_group(group_id, users, debts, seconds):
+            timings.append((seconds, group_id, users, debts))
+            if options['verbosity'] >= 2:
+                self.stdout.write("%s: %d users, %d debts in %.6fs" % (group_id, users, debts,
+                                                                       seconds))
+
+        summary = rebalance_groups(options['shard'], options['workers'], options['chunk_size'],
+                                   options['engine'], on_group)
+
+        self.stdout.write("rebalanced %(groups)d groups (%(users)d users, %(debts)d debts) "
+                          "in %(seconds).3fs, %(retried)d settled again after accepts" % summary)
+
+        for seconds, group_id, users, debts in sorted(timings, reverse=True)[:options['slowest']]:
+            self.stdout.write("slowest %s: %d users in %.6fs" % (group_id, users, seconds))
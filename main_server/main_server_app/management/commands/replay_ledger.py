@@ -0,0 +1,37 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from main_server_app.models import Group
+from main_server_app.services import ledger_files
+from main_server_app.sharding import shard_of
+from utils import ledger_file
+from utils.server.sharding import use_shard
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the balances, ledger, checkpoints and user debts of a group " \
+           "from its ledger file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('group_uuid', help="uuid of the group to recover")
+        parser.add_argument('--file', help="path of the ledger file, defaults to the "
+                                           "group's file in LEDGER_FILES_DIR")
+        parser.add_argument('--truncate', action='store_true',
+                            help="remove the torn record left at the end of the file by a crash")
+
+    def handle(self, *args, **options):
+        try:
+            with use_shard(shard_of(options['group_uuid'])):
+                group = Group.objects.get(pk=options['group_uuid'])
+                path = options['file'] or ledger_files.path(group)
+
+                if options['truncate']:
+                    removed = ledger_file.truncate(path)
+                    if removed:
+                        self.stdout.write("removed %d bytes of a torn record" % removed)
+
+                count = ledger_files.replay(group, path)
+        except (ValueError, ValidationError, OSError, Group.DoesNotExist) as error:
+            raise CommandError(error)
+
+        self.stdout.write("replayed %d UOMes from %s" % (count, path))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main_server_app.services import settlement
+
+
+class Command(BaseCommand):
+    help = "Settles the debts of the groups with accepts left unsettled by the " \
+           "deferred settlement mode"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help="seconds a group stays dirty before it is settled, "
+                                 "defaults to SETTLEMENT_INTERVAL")
+        parser.add_argument('--batch', type=int, default=100,
+                            help="maximum number of groups settled at once per shard")
+        parser.add_argument('--once', action='store_true',
+                            help="settle the groups that are due and exit")
+
+    def handle(self, *args, **options):
+        while True:
+            count = settlement.settle_due_groups(options['interval'], limit=options['batch'])
+
+            if options['once']:
+                self.stdout.write("settled %d groups" % count)
+                return
+
+            if count == 0:
+                time.sleep(1.0)
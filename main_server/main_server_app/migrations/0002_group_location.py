@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_server_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupLocation',
+            fields=[
+                ('group_uuid', models.UUIDField(primary_key=True, serialize=False)),
+                ('shard', models.CharField(max_length=80)),
+            ],
+        ),
+    ]
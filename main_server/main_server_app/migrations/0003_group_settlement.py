@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_server_app', '0002_group_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='balance_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='dirty_since',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='settlement_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
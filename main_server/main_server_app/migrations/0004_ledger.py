@@ -0,0 +1,47 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_server_app', '0003_group_settlement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='ledger_root',
+            field=models.CharField(default='e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='ledger_signature',
+            field=models.CharField(blank=True, default='', max_length=400),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='ledger_size',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='uome',
+            name='ledger_index',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='LedgerNode',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('index', models.PositiveIntegerField()),
+                ('hash', models.BinaryField(max_length=32)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_server_app.group')),
+            ],
+            options={
+                'unique_together': {('group', 'level', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_server_app', '0004_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ledger_size', models.PositiveIntegerField()),
+                ('accepted_at', models.DateTimeField(db_index=True)),
+                ('balances', models.JSONField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='uome',
+            name='accepted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='uome',
+            index=models.Index(fields=['group', 'ledger_index'], name='main_server_group_i_03609b_idx'),
+        ),
+        migrations.AddField(
+            model_name='balancecheckpoint',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_server_app.group'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='balancecheckpoint',
+            unique_together={('group', 'ledger_size')},
+        ),
+    ]
@@ -1,10 +1,13 @@
 from django.db import models
 import uuid
 
+from utils.crypto.merkle import EMPTY_ROOT
+
 
 description_length = 80
 signature_length = 400
 key_length = 400  # 2048 bit key in base 64? I don't know what I'm doing :)
+EMPTY_LEDGER_ROOT = EMPTY_ROOT.hex()  # hex root of the ledger of a new group
 # TODO: Use correct key length and signature_length
 # Create your models here.
 
@@ -14,6 +17,18 @@ class Group(models.Model):
     name = models.CharField(max_length=80)
 
     key = models.CharField(max_length=key_length)
+
+    # each accepted UOMe bumps the balance version, the user debts were computed
+    # from the balances of the settlement version (see services.settlement)
+    balance_version = models.PositiveIntegerField(default=0)
+    settlement_version = models.PositiveIntegerField(default=0)
+    # when the group's balances first got ahead of its settlement, None if settled
+    dirty_since = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    # Merkle tree over the accepted UOMes and the signature of its root (see services.ledger)
+    ledger_size = models.PositiveIntegerField(default=0)
+    ledger_root = models.CharField(max_length=64, default=EMPTY_LEDGER_ROOT)
+    ledger_signature = models.CharField(max_length=signature_length, default='', blank=True)
     # owner_email = models.EmailField(max_length=254)
     # TODO: add proxy/name server address
 
@@ -34,6 +49,7 @@ class User(models.Model):
 class UOMe(models.Model):
     class Meta:
         verbose_name_plural = "UOMe's"  # for the Django Admin panel
+        indexes = [models.Index(fields=['group', 'ledger_index'])]
 
     group = models.ForeignKey(Group, on_delete=models.CASCADE)
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)    
@@ -51,6 +67,10 @@ class UOMe(models.Model):
     issuer_signature = models.CharField(max_length=signature_length, default='', blank=True)
     borrower_signature = models.CharField(max_length=signature_length, default='', blank=True)
 
+    # position in the group's ledger and time when it was appended to it, once accepted
+    ledger_index = models.PositiveIntegerField(null=True, blank=True)
+    accepted_at = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
         return "%.3f€ from %s to %s: %s" % (int(self.value)/100, self.borrower, self.lender, self.description)
 
@@ -75,3 +95,43 @@ class UserDebt(models.Model):
 
     def __str__(self):
         return "%.3f€ from %s to %s" % (int(self.value)/100, self.borrower, self.lender)
+
+
+class LedgerNode(models.Model):
+    # root of a complete subtree of the Merkle tree over the accepted UOMes of a
+    # group, covering the leaves index * 2**level to (index + 1) * 2**level - 1
+    class Meta:
+        unique_together = ('group', 'level', 'index')
+
+    group = models.ForeignKey(Group, on_delete=models.CASCADE)
+    level = models.PositiveSmallIntegerField()
+    index = models.PositiveIntegerField()
+    hash = models.BinaryField(max_length=32)
+
+    def __str__(self):
+        return "%s node %d:%d" % (self.group_id, self.level, self.index)
+
+
+class BalanceCheckpoint(models.Model):
+    # balances of the users of a group after the first 'ledger_size' UOMes of its
+    # ledger were accepted, the last of them at 'accepted_at' (see services.checkpoints)
+    class Meta:
+        unique_together = ('group', 'ledger_size')
+
+    group = models.ForeignKey(Group, on_delete=models.CASCADE)
+    ledger_size = models.PositiveIntegerField()
+    accepted_at = models.DateTimeField(db_index=True)
+    balances = models.JSONField()  # {user key: balance}
+
+    def __str__(self):
+        return "%s after %d UOMes" % (self.group_id, self.ledger_size)
+
+
+class GroupLocation(models.Model):
+    # shard of a group that was moved away from the shard given by the shard map,
+    # kept in the default database (see main_server_app.sharding)
+    group_uuid = models.UUIDField(primary_key=True)
+    shard = models.CharField(max_length=80)
+
+    def __str__(self):
+        return "%s in %s" % (self.group_uuid, self.shard)
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from utils.server.sharding import current_shard
+
+
+class GroupShardRouter:
+    """
+    Routes the models of the main server app to the shard selected for the
+    current thread with utils.server.sharding.use_shard. Queries made without
+    a shard, and the models of the other apps, go to the default database.
+    The locations of the moved groups are always kept in the default database.
+    """
+
+    app_label = 'main_server_app'
+    directory_models = {'grouplocation'}
+
+    def _is_sharded(self, model) -> bool:
+        return model._meta.app_label == self.app_label and \
+               model._meta.model_name not in self.directory_models
+
+    def db_for_read(self, model, **hints):
+        if not self._is_sharded(model):
+            return DEFAULT_DB_ALIAS
+
+        # related objects are read from the shard of the object they came from
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+
+        return current_shard() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return self.db_for_read(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return obj1._state.db == obj2._state.db
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label != self.app_label or model_name in self.directory_models:
+            return db == DEFAULT_DB_ALIAS
+
+        return db in settings.SHARDS
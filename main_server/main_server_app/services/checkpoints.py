@@ -0,0 +1,78 @@
+"""
+Checkpoints of the balances of the groups.
+
+Every CHECKPOINT_INTERVAL UOMes appended to the ledger of a group (see
+services.ledger), the balances of its users are saved along with the size of
+the ledger. The balances after any prefix of the ledger, or at any point in
+time, are computed from the nearest checkpoint before it by replaying only
+the UOMes accepted after the checkpoint, instead of the whole history.
+
+Only the UOMes in the ledger are replayed: the balances of the groups with
+UOMes accepted before the ledger existed are only right from their first
+checkpoint on.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+
+from ..models import BalanceCheckpoint, Group, User, UOMe
+from . import simplify_debt
+
+
+def after_append(group: Group, ledger_size: int):
+    """
+    Takes a checkpoint of a group if the ledger reached a multiple of
+    CHECKPOINT_INTERVAL UOMes. Must run in the transaction that appended the
+    last UOMe, after its balances were updated.
+    """
+    if ledger_size % settings.CHECKPOINT_INTERVAL == 0:
+        take_checkpoint(group, ledger_size)
+
+
+def take_checkpoint(group: Group, ledger_size: int) -> BalanceCheckpoint:
+    """
+    Saves the current balances of the users of a group as the balances after
+    the first 'ledger_size' UOMes of its ledger.
+    """
+    last_uome = UOMe.objects.only('accepted_at').get(group=group, ledger_index=ledger_size - 1)
+
+    return BalanceCheckpoint.objects.create(
+        group=group,
+        ledger_size=ledger_size,
+        accepted_at=last_uome.accepted_at,
+        balances=dict(User.objects.filter(group=group).values_list('key', 'balance')),
+    )
+
+
+def balances_at(group: Group, ledger_size: int = None, when=None) -> dict:
+    """
+    Returns the balances of the users of a group after the first
+    'ledger_size' UOMes of its ledger and/or after the UOMes accepted until
+    'when'. Without limits returns the balances after the whole ledger.
+
+    :param ledger_size: number of UOMes of the ledger to include.
+    :param when:        datetime of the last accepted UOMe to include.
+    :return: dict mapping the key of each user to its balance.
+    """
+    checkpoints = BalanceCheckpoint.objects.filter(group=group)
+    uomes = UOMe.objects.filter(group=group, ledger_index__isnull=False)
+
+    if ledger_size is not None:
+        checkpoints = checkpoints.filter(ledger_size__lte=ledger_size)
+        uomes = uomes.filter(ledger_index__lt=ledger_size)
+
+    if when is not None:
+        checkpoints = checkpoints.filter(accepted_at__lte=when)
+        uomes = uomes.filter(accepted_at__lte=when)
+
+    balances = defaultdict(int)
+
+    checkpoint = checkpoints.order_by('-ledger_size').first()
+    if checkpoint:
+        balances.update(checkpoint.balances)
+        uomes = uomes.filter(ledger_index__gte=checkpoint.ledger_size)
+
+    # replays the tail of the ledger as [borrower, lender, value] triples
+    tail = uomes.order_by('ledger_index').values_list('borrower_id', 'lender_id', 'value')
+
+    return dict(simplify_debt.compute_totals(balances, tail.iterator()))
@@ -0,0 +1,210 @@
+"""
+Differential fuzzing and timing of the settlement engines (see
+simplify_debt.ENGINES).
+
+Random and adversarial balance vectors are settled by every engine. The
+settlement of each engine is checked to pay off every balance exactly, with
+positive integer debts from borrowers to lenders only and at most one debt
+less than the number of users with a balance. The number of debts of the
+engines is compared, and the time of each settlement is checked against the
+budget of the size of its vector.
+"""
+import random
+import string
+import time
+from collections import defaultdict
+
+from . import simplify_debt
+
+# seconds allowed to settle a vector of at most the given number of users
+TIME_BUDGETS = {10: 0.001, 100: 0.01, 1000: 0.25, 10000: 2.0}
+
+MAX_VALUE = 2 ** 31 - 1  # largest value of a user debt
+
+KINDS = ('random', 'sparse', 'one_lender', 'one_borrower', 'mirrored', 'extreme')
+
+
+def _keys(rng: random.Random, size: int) -> list:
+    # base 64 like keys, so that the engines sort them the way they sort real keys
+    alphabet = string.ascii_letters + string.digits + '+/'
+    return [''.join(rng.choice(alphabet) for _ in range(12)) + str(index)
+            for index in range(size)]
+
+
+def generate(rng: random.Random, size: int, kind: str) -> dict:
+    """
+    Returns a vector of 'size' balances that sum to zero, as a dict mapping
+    user keys to balances.
+
+    :param kind: one of KINDS:
+        'random':       uniform balances.
+        'sparse':       most balances are zero.
+        'one_lender':   a single lender for every other user.
+        'one_borrower': a single borrower for every other user.
+        'mirrored':     each balance has an opposite one, with many repeated values.
+        'extreme':      balances as large as a user debt can be.
+    """
+    if size < 2:
+        raise ValueError("a balance vector needs at least 2 users")
+
+    keys = _keys(rng, size)
+
+    if kind == 'random':
+        values = [rng.randint(-10 ** 6, 10 ** 6) for _ in range(size - 1)]
+    elif kind == 'sparse':
+        values = [rng.randint(-10 ** 6, 10 ** 6) if rng.random() < 0.1 else 0
+                  for _ in range(size - 1)]
+    elif kind in ('one_lender', 'one_borrower'):
+        sign = -1 if kind == 'one_lender' else 1
+        values = [sign * rng.randint(1, MAX_VALUE // size) for _ in range(size - 1)]
+    elif kind == 'mirrored':
+        half = [rng.choice((1, 2, 3, 100, 10 ** 6)) for _ in range(size // 2)]
+        values = half + [-value for value in half] + [0] * (size % 2)
+        rng.shuffle(values)
+        return dict(zip(keys, values))
+    elif kind == 'extreme':
+        # pairs of users so that no balance exceeds MAX_VALUE
+        values = []
+        for _ in range(size // 2):
+            value = rng.randint(MAX_VALUE - 1000, MAX_VALUE)
+            values += [value, -value]
+        values += [0] * (size % 2)
+        rng.shuffle(values)
+        return dict(zip(keys, values))
+    else:
+        raise ValueError("unknown kind of balance vector: %s" % kind)
+
+    values.append(-sum(values))
+    return dict(zip(keys, values))
+
+
+def check_settlement(balances: dict, debts: dict) -> list:
+    """
+    Checks that a settlement pays off a vector of balances exactly.
+
+    :param balances: dict mapping user keys to balances.
+    :param debts:    settlement, as returned by the engines.
+    :return: list of the problems found, empty if the settlement is right.
+    """
+    problems = []
+    net = defaultdict(int)
+    count = 0
+
+    for borrower, lenders in debts.items():
+        for lender, value in lenders.items():
+            count += 1
+            if not isinstance(value, int) or value <= 0:
+                problems.append("debt of %r from %s to %s" % (value, borrower, lender))
+            elif balances.get(borrower, 0) >= 0 or balances.get(lender, 0) <= 0:
+                problems.append("debt from %s to %s, who are not a borrower and a lender" % (
+                    borrower, lender))
+            else:
+                net[borrower] -= value
+                net[lender] += value
+
+    for user in set(balances) | set(net):
+        if net[user] != balances.get(user, 0):
+            problems.append("%s settles %d instead of %d" % (user, net[user], balances.get(user, 0)))
+
+    users = sum(1 for balance in balances.values() if balance)
+    if count > max(users - 1, 0):
+        problems.append("%d debts for %d users" % (count, users))
+
+    return problems
+
+
+def budget(size: int) -> float:
+    """ Returns the time budget of a vector of the given size """
+    for limit in sorted(TIME_BUDGETS):
+        if size <= limit:
+            return TIME_BUDGETS[limit]
+
+    return TIME_BUDGETS[max(TIME_BUDGETS)] * size / max(TIME_BUDGETS)
+
+
+class Report:
+    """ Results of a run of the harness """
+
+    def __init__(self, engines):
+        self.engines = list(engines)
+        self.vectors = 0
+        # [(engine, kind, size, seed, problem)]
+        self.failures = []
+        self.debts = dict.fromkeys(self.engines, 0)
+        # vectors settled with more debts than the best engine
+        self.more_debts = dict.fromkeys(self.engines, 0)
+        # {engine: {size: seconds}}
+        self.worst_times = {engine: {} for engine in self.engines}
+        # [(engine, kind, size, seed, seconds)]
+        self.over_budget = []
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures and not self.over_budget
+
+
+def run(engines=None, sizes=(2, 10, 100, 1000), kinds=KINDS, iterations=10, seed=0,
+        time_budgets=True) -> Report:
+    """
+    Settles random vectors of balances with the engines and checks them.
+
+    :param engines:      names of the engines, defaults to all the registered ones.
+    :param sizes:        numbers of users of the vectors.
+    :param kinds:        kinds of vectors, see 'generate'.
+    :param iterations:   number of vectors of each size and kind.
+    :param seed:         the vector of an iteration is generated from the seed
+                         plus the iteration, which reproduces it.
+    :param time_budgets: whether the engines must settle within TIME_BUDGETS.
+    :return: the report of the run.
+    """
+    engines = list(engines or simplify_debt.ENGINES)
+    report = Report(engines)
+
+    for iteration in range(iterations):
+        for size in sizes:
+            for kind in kinds:
+                vector_seed = seed + iteration
+                balances = generate(random.Random("%d-%d-%s" % (vector_seed, size, kind)),
+                                    size, kind)
+                report.vectors += 1
+
+                counts = {}
+                for engine in engines:
+                    counts[engine] = _run_engine(report, engine, balances, kind, size,
+                                                 vector_seed, time_budgets)
+
+                settled = [count for count in counts.values() if count is not None]
+                for engine, count in counts.items():
+                    if count is not None and count > min(settled):
+                        report.more_debts[engine] += 1
+
+    return report
+
+
+def _run_engine(report: Report, engine: str, balances: dict, kind: str, size: int, seed: int,
+                time_budgets: bool):
+    """ Settles a vector with an engine, returns its number of debts or None if it failed """
+    # the engines may modify their arguments
+    borrowers, lenders = simplify_debt.borrowers_and_lenders(balances)
+
+    start = time.perf_counter()
+    try:
+        debts = simplify_debt.ENGINES[engine](borrowers, lenders)
+    except Exception as error:
+        report.failures.append((engine, kind, size, seed, "raised %r" % error))
+        return None
+    elapsed = time.perf_counter() - start
+
+    worst = report.worst_times[engine]
+    worst[size] = max(worst.get(size, 0), elapsed)
+    if time_budgets and elapsed > budget(size):
+        report.over_budget.append((engine, kind, size, seed, elapsed))
+
+    problems = check_settlement(balances, debts)
+    report.failures.extend((engine, kind, size, seed, problem) for problem in problems)
+    if problems:
+        return None
+
+    count = sum(len(lenders) for lenders in debts.values())
+    report.debts[engine] += count
+    return count
@@ -0,0 +1,210 @@
+"""
+Export of the data of a group to a columnar file (see utils.columnar) and
+import of such a file, to move groups between environments or to analyse
+them without querying the database.
+
+The keys of the users are stored once, in the 'users' table, and the other
+tables refer to the users by their index in it. Dates are stored as days
+since 1970-01-01 and datetimes as microseconds since 1970-01-01 UTC, -1
+standing for a missing value. The file has these tables:
+
+    users:  key, balance
+    uomes:  uuid, borrower, lender, value, issuing_date, accepted_at,
+            ledger_index, description, issuer_signature, borrower_signature
+    debts:  borrower, lender, value
+    ledger: level, index, hash
+
+The ledger root signature is kept as it is: it is only valid where the main
+server uses the same key as the server that signed it.
+"""
+import array
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+from uuid import UUID
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from utils import columnar
+from utils.server.sharding import use_shard
+
+from ..models import Group, LedgerNode, User, UOMe, UserDebt
+from ..sharding import shard_of
+
+FORMAT_VERSION = 1
+NULL = -1
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_DAY = date(1970, 1, 1).toordinal()
+
+_GROUP_FIELDS = ('name', 'key', 'balance_version', 'settlement_version', 'ledger_size',
+                 'ledger_root', 'ledger_signature')
+
+
+def export_group(group: Group, path) -> int:
+    """
+    Exports the data of a group to a columnar file. Must run on the group's shard.
+
+    :return: number of UOMes exported.
+    """
+    users = list(User.objects.filter(group=group).order_by('key').values_list('key', 'balance'))
+    user_index = {key: index for index, (key, balance) in enumerate(users)}
+
+    uomes = defaultdict(lambda: array.array('q'))
+    texts = defaultdict(list)
+    uuids = []
+
+    # the accepted UOMes in the order of the ledger, then the pending ones
+    rows = UOMe.objects.filter(group=group) \
+        .order_by(F('ledger_index').asc(nulls_last=True), 'issuing_date').values_list(
+        'uuid', 'borrower_id', 'lender_id', 'value', 'issuing_date', 'accepted_at',
+        'ledger_index', 'description', 'issuer_signature', 'borrower_signature')
+
+    for (uuid, borrower, lender, value, issuing_date, accepted_at, ledger_index,
+         description, issuer_signature, borrower_signature) in rows.iterator():
+        uuids.append(uuid.bytes)
+        uomes['borrower'].append(user_index[borrower])
+        uomes['lender'].append(user_index[lender])
+        uomes['value'].append(value)
+        uomes['issuing_date'].append(issuing_date.toordinal() - _EPOCH_DAY)
+        uomes['accepted_at'].append(NULL if accepted_at is None else
+                                    (accepted_at - _EPOCH) // timedelta(microseconds=1))
+        uomes['ledger_index'].append(NULL if ledger_index is None else ledger_index)
+        texts['description'].append(description)
+        texts['issuer_signature'].append(issuer_signature)
+        texts['borrower_signature'].append(borrower_signature)
+
+    debts = list(UserDebt.objects.filter(group=group)
+                 .values_list('borrower_id', 'lender_id', 'value'))
+    nodes = list(LedgerNode.objects.filter(group=group).order_by('level', 'index')
+                 .values_list('level', 'index', 'hash'))
+
+    metadata = {
+        'format': FORMAT_VERSION,
+        'group': dict(uuid=str(group.uuid), **{name: getattr(group, name)
+                                               for name in _GROUP_FIELDS}),
+    }
+
+    columnar.write(path, metadata, {
+        'users': {
+            'key': ('str', [key for key, balance in users]),
+            'balance': ('q', [balance for key, balance in users]),
+        },
+        'uomes': {
+            'uuid': ('16s', uuids),
+            'borrower': ('I', uomes['borrower']),
+            'lender': ('I', uomes['lender']),
+            'value': ('I', uomes['value']),
+            'issuing_date': ('i', uomes['issuing_date']),
+            'accepted_at': ('q', uomes['accepted_at']),
+            'ledger_index': ('q', uomes['ledger_index']),
+            'description': ('str', texts['description']),
+            'issuer_signature': ('str', texts['issuer_signature']),
+            'borrower_signature': ('str', texts['borrower_signature']),
+        },
+        'debts': {
+            'borrower': ('I', [user_index[borrower] for borrower, lender, value in debts]),
+            'lender': ('I', [user_index[lender] for borrower, lender, value in debts]),
+            'value': ('I', [value for borrower, lender, value in debts]),
+        },
+        'ledger': {
+            'level': ('H', [level for level, index, value in nodes]),
+            'index': ('I', [index for level, index, value in nodes]),
+            'hash': ('32s', [bytes(value) for level, index, value in nodes]),
+        },
+    })
+
+    return len(uuids)
+
+
+def import_group(path, batch_size=1000) -> Group:
+    """
+    Imports a group exported with 'export_group' into its shard.
+
+    :return: the imported group.
+    :raise ValueError: if the file is not an export of a group, the group
+                       already exists or one of its users or UOMes already
+                       exists in another group.
+    """
+    with columnar.ColumnarFile(path) as file:
+        if file.metadata.get('format') != FORMAT_VERSION:
+            raise ValueError("%s is not a group export" % path)
+
+        group_uuid = file.metadata['group']['uuid']
+        shard = shard_of(group_uuid)
+
+        try:
+            with use_shard(shard), transaction.atomic(using=shard):
+                if Group.objects.filter(pk=group_uuid).exists():
+                    raise ValueError("group %s already exists" % group_uuid)
+
+                return _import(file, batch_size)
+        except IntegrityError as error:
+            # e.g. a UOMe that already exists in another group
+            raise ValueError("can not import group %s: %s" % (group_uuid, error))
+
+
+def _import(file: columnar.ColumnarFile, batch_size: int) -> Group:
+    metadata = file.metadata['group']
+    group = Group.objects.create(uuid=metadata['uuid'],
+                                 **{name: metadata[name] for name in _GROUP_FIELDS})
+
+    users = file['users']
+    keys = list(users['key'])
+    for start in range(0, len(keys), batch_size):
+        existing = User.objects.filter(pk__in=keys[start:start + batch_size]) \
+            .values_list('pk', flat=True).first()
+        if existing is not None:
+            raise ValueError("user %s already exists in another group" % existing)
+
+    User.objects.bulk_create((User(group=group, key=key, balance=balance)
+                              for key, balance in zip(keys, users['balance'])),
+                             batch_size=batch_size)
+
+    uomes = file['uomes']
+    columns = [uomes[name] for name in (
+        'uuid', 'borrower', 'lender', 'value', 'issuing_date', 'accepted_at', 'ledger_index',
+        'description', 'issuer_signature', 'borrower_signature')]
+
+    rows = zip(*columns)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+
+        issuing_dates = defaultdict(list)
+        objects = []
+        for (uuid, borrower, lender, value, issuing_date, accepted_at, ledger_index,
+             description, issuer_signature, borrower_signature) in batch:
+            uuid = UUID(bytes=uuid)
+            issuing_dates[date.fromordinal(issuing_date + _EPOCH_DAY)].append(uuid)
+            objects.append(UOMe(
+                group=group, uuid=uuid, borrower_id=keys[borrower], lender_id=keys[lender],
+                value=value, description=description,
+                issuer_signature=issuer_signature, borrower_signature=borrower_signature,
+                accepted_at=(None if accepted_at == NULL else
+                             _EPOCH + timedelta(microseconds=accepted_at)),
+                ledger_index=None if ledger_index == NULL else ledger_index,
+            ))
+
+        UOMe.objects.bulk_create(objects)
+
+        # the issuing date is set to the current date when the UOMe is created
+        for issuing_date, uuids in issuing_dates.items():
+            UOMe.objects.filter(pk__in=uuids).update(issuing_date=issuing_date)
+
+    debts = file['debts']
+    UserDebt.objects.bulk_create((UserDebt(group=group, borrower_id=keys[borrower],
+                                           lender_id=keys[lender], value=value)
+                                  for borrower, lender, value in
+                                  zip(debts['borrower'], debts['lender'], debts['value'])),
+                                 batch_size=batch_size)
+
+    ledger = file['ledger']
+    LedgerNode.objects.bulk_create((LedgerNode(group=group, level=level, index=index, hash=value)
+                                    for level, index, value in
+                                    zip(ledger['level'], ledger['index'], ledger['hash'])),
+                                   batch_size=batch_size)
+
+    return group
@@ -0,0 +1,83 @@
+"""
+Ledger of the groups: a Merkle tree over the UOMes accepted in each group, in
+the order they were accepted (see utils.crypto.merkle).
+
+After each UOMe is appended the main server signs the new root of the tree,
+along with its size. The signature is the only one needed for a client to
+check that a UOMe is in the ledger: the inclusion proof of a UOMe is
+computed from the nodes stored for the group and is checked against the
+signed root.
+"""
+from django.conf import settings
+from django.utils import timezone
+
+from utils.crypto import merkle
+from utils.messages import message_formats as msg
+from utils.messages.uome_tools import UOMeTools
+
+from ..models import Group, LedgerNode, UOMe
+from . import ledger_files
+
+
+def _nodes(group: Group, keys) -> dict:
+    """ Returns the hashes of the nodes of a group's tree, by (level, index) """
+    levels = {level for level, index in keys}
+    indexes = {index for level, index in keys}
+
+    nodes = LedgerNode.objects.filter(group=group, level__in=levels, index__in=indexes) \
+        .values_list('level', 'index', 'hash')
+
+    return {(level, index): bytes(value) for level, index, value in nodes}
+
+
+def append(group: Group, uome: UOMe) -> int:
+    """
+    Appends an accepted UOMe to the ledger of its group and signs the new
+    root. Must run in a transaction of the group's shard.
+
+    :return: the new size of the ledger.
+    """
+    group = Group.objects.select_for_update().only('ledger_size').get(pk=group.pk)
+    size = group.ledger_size
+
+    nodes = _nodes(group, merkle.peaks(size))
+    leaf = UOMeTools.leaf(str(group.uuid), uome.lender.key, uome.borrower.key, uome.value,
+                          uome.description, str(uome.uuid))
+
+    completed = merkle.append(size, leaf, lambda *key: nodes[key])
+    LedgerNode.objects.bulk_create(
+        LedgerNode(group=group, level=level, index=index, hash=value)
+        for level, index, value in completed
+    )
+
+    nodes.update(((level, index), value) for level, index, value in completed)
+    root = merkle.root(size + 1, lambda *key: nodes[key]).hex()
+
+    signature = msg.GetInclusionProof.sign(settings.PRIVATE_KEY, 'main',
+                                           group_uuid=str(group.uuid),
+                                           tree_size=size + 1, root=root)
+
+    # the group is locked: the UOMes are appended in the order they are accepted
+    accepted_at = timezone.now()
+    UOMe.objects.filter(pk=uome.pk).update(ledger_index=size, accepted_at=accepted_at)
+    Group.objects.filter(pk=group.pk).update(ledger_size=size + 1, ledger_root=root,
+                                             ledger_signature=signature)
+
+    ledger_files.record(group, uome, size, accepted_at)
+
+    return size + 1
+
+
+def inclusion_proof(group: Group, uome: UOMe) -> list:
+    """
+    Returns the inclusion proof of an accepted UOMe in the ledger of its group,
+    for the size of the ledger given by the group.
+
+    :return: list of hex hashes.
+    """
+    keys = merkle.proof_nodes(uome.ledger_index, group.ledger_size)
+    nodes = _nodes(group, keys)
+
+    return [value.hex() for value in
+            merkle.inclusion_proof(uome.ledger_index, group.ledger_size,
+                                   lambda *key: nodes[key])]
@@ -0,0 +1,180 @@
+"""
+Ledger files of the groups (see utils.ledger_file): when LEDGER_FILES_DIR is
+set, each UOMe appended to the ledger of a group is also appended to the
+group's file in that directory, once its transaction is committed.
+
+The files are the input of the recovery of a group: 'replay' reads a file
+through a memory map and rebuilds from it the balances of the users, the
+Merkle tree of the ledger, the balance checkpoints and the user debts, which
+is much faster than reading the UOMes from the database. The file must have
+been written since the creation of the group to be replayed.
+
+A crash between the commit of an accept and the write of its record leaves
+the UOMe out of the file, and a crash in the middle of a write leaves a torn
+record at its end: replaying refuses a file missing any UOMe of the ledger
+size stored for the group, including the newest ones, and 'truncate'
+removes the torn record.
+"""
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from django.conf import settings
+from django.db import router, transaction
+
+from utils import ledger_file, metrics
+from utils.crypto import merkle
+from utils.messages import message_formats as msg
+from utils.messages.uome_tools import UOMeTools
+
+from ..models import BalanceCheckpoint, Group, LedgerNode, User, UOMe
+from . import settlement
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+_write_errors = metrics.counter('ledger_file_write_errors',
+                                'Accepted UOMes that could not be written to a ledger file')
+
+_writers = {}  # directory -> LedgerWriter
+_writers_lock = threading.Lock()
+
+
+def _writer() -> ledger_file.LedgerWriter:
+    directory = settings.LEDGER_FILES_DIR
+
+    with _writers_lock:
+        writer = _writers.get(directory)
+        if writer is None:
+            os.makedirs(directory, exist_ok=True)
+            writer = _writers[directory] = ledger_file.LedgerWriter(
+                directory, settings.LEDGER_FSYNC_INTERVAL)
+
+    return writer
+
+
+def close():
+    """ Syncs and closes the ledger files written by this process """
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+
+    for writer in writers:
+        writer.close()
+
+
+def path(group: Group) -> str:
+    """ Returns the path of the ledger file of a group """
+    return os.path.join(settings.LEDGER_FILES_DIR, str(group.uuid) + '.ledger')
+
+
+def record(group: Group, uome: UOMe, ledger_index: int, accepted_at: datetime):
+    """
+    Appends an accepted UOMe to the ledger file of its group once the current
+    transaction is committed, if the ledger files are enabled. Must run in
+    the transaction that appended the UOMe to the ledger.
+    """
+    if not settings.LEDGER_FILES_DIR:
+        return
+
+    entry = ledger_file.Entry(ledger_index=ledger_index,
+                              accepted_at=(accepted_at - _EPOCH) // timedelta(microseconds=1),
+                              value=uome.value, uome_uuid=uome.uuid.bytes,
+                              lender=uome.lender.key, borrower=uome.borrower.key,
+                              description=uome.description)
+
+    def write():
+        # the UOMe is already accepted: the request must not fail because of the file
+        try:
+            _writer().append(str(group.uuid), entry)
+        except OSError:
+            _write_errors.inc()
+            logger.exception("could not write UOMe %s to the ledger file of group %s",
+                             uome.uuid, group.uuid)
+
+    transaction.on_commit(write, using=router.db_for_write(Group, instance=group))
+
+
+def replay(group: Group, file_path=None, batch_size=1000) -> int:
+    """
+    Rebuilds the balances, the ledger tree, the balance checkpoints and the
+    user debts of a group from its ledger file. The users missing from the
+    group are created. Must run on the group's shard.
+
+    :param file_path: path of the ledger file, defaults to the group's file.
+    :return: number of UOMes replayed.
+    :raise ValueError: if UOMes are missing from the file, e.g. the last ones
+                       of the ledger stored for the group.
+    """
+    entries = {}
+    for entry in ledger_file.LedgerReader(file_path or path(group)):
+        # a record written twice is only replayed once
+        entries.setdefault(entry.ledger_index, entry)
+
+    # the newest records are the ones lost if the server crashed before writing them
+    ledger_size = Group.objects.values_list('ledger_size', flat=True).get(pk=group.pk)
+    size = max(len(entries), ledger_size)
+    missing = set(range(size)).symmetric_difference(entries)
+    if missing:
+        raise ValueError("UOMe %d is missing from the ledger file of group %s" % (
+            min(missing), group.uuid))
+
+    balances = defaultdict(int)
+    nodes = {}
+    snapshots = []  # (ledger size, accepted at, balances) of the checkpoints
+    group_uuid = str(group.uuid)
+
+    for index in range(size):
+        entry = entries[index]
+        balances[entry.lender] += entry.value
+        balances[entry.borrower] -= entry.value
+
+        leaf = UOMeTools.leaf(group_uuid, entry.lender, entry.borrower, entry.value,
+                              entry.description, str(UUID(bytes=entry.uome_uuid)))
+        nodes.update(((level, node_index), value) for level, node_index, value in
+                     merkle.append(index, leaf, lambda *key: nodes[key]))
+
+        if (index + 1) % settings.CHECKPOINT_INTERVAL == 0:
+            snapshots.append((index + 1, _EPOCH + timedelta(microseconds=entry.accepted_at),
+                              dict(balances)))
+
+    root = merkle.root(size, lambda *key: nodes[key]).hex()
+    signature = msg.GetInclusionProof.sign(settings.PRIVATE_KEY, 'main', group_uuid=group_uuid,
+                                           tree_size=size, root=root)
+
+    with transaction.atomic(using=router.db_for_write(Group, instance=group)):
+        group = Group.objects.select_for_update().get(pk=group.pk)
+
+        existing = set(User.objects.filter(group=group).values_list('key', flat=True))
+        User.objects.bulk_create((User(group=group, key=key) for key in balances
+                                  if key not in existing), batch_size=batch_size)
+
+        users = list(User.objects.filter(group=group))
+        for user in users:
+            user.balance = balances.get(user.key, 0)
+        User.objects.bulk_update(users, ['balance'], batch_size=batch_size)
+
+        LedgerNode.objects.filter(group=group).delete()
+        LedgerNode.objects.bulk_create((LedgerNode(group=group, level=level, index=index,
+                                                   hash=value)
+                                        for (level, index), value in nodes.items()),
+                                       batch_size=batch_size)
+
+        BalanceCheckpoint.objects.filter(group=group).delete()
+        BalanceCheckpoint.objects.bulk_create((BalanceCheckpoint(group=group, ledger_size=ledger_size,
+                                                                 accepted_at=accepted_at,
+                                                                 balances=snapshot)
+                                               for ledger_size, accepted_at, snapshot in snapshots),
+                                              batch_size=batch_size)
+
+        Group.objects.filter(pk=group.pk).update(ledger_size=size, ledger_root=root,
+                                                 ledger_signature=signature,
+                                                 balance_version=size)
+
+        settlement.settle(group, mode='replay')
+
+    return size
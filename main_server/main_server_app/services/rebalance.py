@@ -0,0 +1,165 @@
+"""
+Full rebalance of the groups: the user debts of every group are recomputed
+from the balances of its users, e.g. after the settlement engine changed or
+the balances were repaired.
+
+The groups of each shard are read in chunks, their balances are simplified
+by a pool of processes and the user debts of each chunk are replaced in a
+single transaction. The next chunk is read and submitted to the pool while
+the debts of the current one are written.
+
+Accepts are not stopped meanwhile: a group whose balance version changed
+after its balances were read is settled again with 'settlement.settle'.
+"""
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from utils.server.sharding import use_shard
+
+from ..models import Group, User, UserDebt
+from . import settlement, simplify_debt
+
+
+def simplify_group(group_id, balances: list, engine: str) -> (object, list, float):
+    """
+    Simplifies the balances of a group. Runs in the workers of the pool, without
+    the database.
+
+    :param balances: list of (user key, balance).
+    :return: the group id, the list of (borrower, lender, value) debts and
+             the seconds it took.
+    """
+    start = time.perf_counter()
+    debts = simplify_debt.ENGINES[engine](*simplify_debt.borrowers_and_lenders(dict(balances)))
+
+    return group_id, [(borrower, lender, value) for borrower, lenders in debts.items()
+                      for lender, value in lenders.items()], time.perf_counter() - start
+
+
+def rebalance_groups(shards=None, workers=None, chunk_size=500, engine=None,
+                     on_group=None) -> dict:
+    """
+    Replaces the user debts of every group with the simplification of the
+    balances of its users.
+
+    :param shards:     shards to rebalance, defaults to all of them.
+    :param workers:    number of processes, defaults to the number of CPUs.
+                       With 0 the groups are simplified in this process.
+    :param chunk_size: number of groups read and written at once.
+    :param engine:     settlement engine, defaults to SETTLEMENT_ENGINE.
+    :param on_group:   function called with the id, the number of users, the
+                       number of debts and the simplification seconds of
+                       each rebalanced group.
+    :return: dict with the number of 'groups', of 'users', of 'debts', of
+             groups settled again because they changed ('retried') and
+             the total 'seconds'.
+    """
+    engine = engine or settings.SETTLEMENT_ENGINE
+    if engine not in simplify_debt.ENGINES:
+        raise ValueError("unknown settlement engine: %s" % engine)
+
+    summary = dict.fromkeys(('groups', 'users', 'debts', 'retried'), 0)
+    start = time.perf_counter()
+
+    executor = ProcessPoolExecutor(workers or os.cpu_count() or 1) if workers != 0 else None
+    try:
+        for shard in shards or settings.SHARDS:
+            with use_shard(shard):
+                _rebalance_shard(shard, executor, chunk_size, engine, on_group, summary)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def _rebalance_shard(shard, executor, chunk_size, engine, on_group, summary):
+    pending = None
+    for versions, balances in _chunks(chunk_size):
+        submitted = versions, balances, [_submit(executor, group_id, balances[group_id], engine)
+                                         for group_id in versions]
+        if pending:
+            _write(shard, *pending, engine, on_group, summary)
+        pending = submitted
+
+    if pending:
+        _write(shard, *pending, engine, on_group, summary)
+
+
+def _chunks(chunk_size: int):
+    """
+    Yields the groups of the current shard in chunks, as dicts of their
+    balance versions and dicts of the balances of their users, read after
+    the versions. The groups are paged by uuid, so that no cursor is left
+    open while the chunks are written.
+    """
+    groups = Group.objects.order_by('pk')
+    last = None
+
+    while True:
+        page = groups if last is None else groups.filter(pk__gt=last)
+        versions = dict(page.values_list('pk', 'balance_version')[:chunk_size])
+        if not versions:
+            return
+        last = max(versions)
+
+        balances = defaultdict(list)
+        users = User.objects.filter(group__in=list(versions)) \
+            .values_list('group_id', 'key', 'balance').iterator()
+        for group_id, key, balance in users:
+            balances[group_id].append((key, balance))
+
+        yield versions, balances
+
+
+def _submit(executor, *args) -> Future:
+    if executor is not None:
+        return executor.submit(simplify_group, *args)
+
+    future = Future()
+    future.set_result(simplify_group(*args))
+    return future
+
+
+def _write(shard, versions: dict, balances: dict, futures: list, engine, on_group,
+           summary: dict):
+    """ Replaces the user debts of a chunk of groups, in a single transaction """
+    results = [future.result() for future in futures]
+
+    with transaction.atomic(using=shard):
+        current = dict(Group.objects.select_for_update().filter(pk__in=list(versions))
+                       .values_list('pk', 'balance_version'))
+
+        # the groups that were deleted or accepted UOMes since they were read
+        fresh = [(group_id, debts, seconds) for group_id, debts, seconds in results
+                 if current.get(group_id) == versions[group_id]]
+        changed = [group_id for group_id in versions
+                   if group_id in current and current[group_id] != versions[group_id]]
+        fresh_ids = [group_id for group_id, debts, seconds in fresh]
+
+        UserDebt.objects.filter(group__in=fresh_ids).delete()
+        UserDebt.objects.bulk_create((UserDebt(group_id=group_id, borrower_id=borrower,
+                                               lender_id=lender, value=value)
+                                      for group_id, debts, seconds in fresh
+                                      for borrower, lender, value in debts),
+                                     batch_size=1000)
+        Group.objects.filter(pk__in=fresh_ids).update(settlement_version=F('balance_version'),
+                                                      dirty_since=None)
+
+    for group_id, debts, seconds in fresh:
+        summary['groups'] += 1
+        summary['users'] += len(balances[group_id])
+        summary['debts'] += len(debts)
+        if on_group:
+            on_group(group_id, len(balances[group_id]), len(debts), seconds)
+
+    for group_id in changed:
+        settlement.settle(Group.objects.get(pk=group_id), mode='rebalance', engine=engine)
+        summary['retried'] += 1
@@ -0,0 +1,108 @@
+"""
+Settlement of the groups: the user debts of a group are the simplification of
+its users' balances (see simplify_debt).
+
+Accepting a UOMe only updates the balances of its lender and borrower and marks
+the group as dirty. In the 'immediate' settlement mode the group is then
+settled by the request itself. In the 'deferred' mode a background worker
+(the 'run_settlement_worker' command) settles each dirty group once its
+oldest unsettled accept is SETTLEMENT_INTERVAL seconds old, so a burst of
+accepts in a group is settled only once.
+
+The versions of a group tell which balances its user debts were computed
+from: 'balance_version' counts the accepted UOMes and 'settlement_version' is
+the balance version of the last settlement.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from utils import metrics
+from utils.server.sharding import use_shard
+
+from ..models import Group, User, UserDebt
+from . import simplify_debt
+
+_group_size = metrics.histogram('group_size_users', 'Number of users of the settled groups',
+                                buckets=(2, 5, 10, 20, 50, 100, 200, 500, 1000))
+_settlements = metrics.counter('group_settlements', 'Settlements of the user debts of groups',
+                               labels=('mode',))
+_settlement_lag = metrics.histogram('settlement_lag_seconds',
+                                    'Time from the first unsettled accept to the settlement')
+
+
+def record_accept(group: Group, lender: User, borrower: User, value: int):
+    """
+    Updates the balances of the lender and the borrower of an accepted UOMe
+    and marks the group as dirty. Must run in a transaction of the group's shard.
+    """
+    User.objects.filter(pk=lender.pk).update(balance=F('balance') + value)
+    User.objects.filter(pk=borrower.pk).update(balance=F('balance') - value)
+
+    Group.objects.filter(pk=group.pk).update(balance_version=F('balance_version') + 1)
+    Group.objects.filter(pk=group.pk, dirty_since__isnull=True).update(dirty_since=timezone.now())
+
+
+def settle(group: Group, mode='immediate', engine=None) -> int:
+    """
+    Replaces the user debts of a group with the simplification of the current
+    balances of its users.
+
+    :param mode:   settlement mode, only used to label the metrics.
+    :param engine: settlement engine, defaults to SETTLEMENT_ENGINE.
+    :return: the new settlement version of the group.
+    """
+    with transaction.atomic(using=router.db_for_write(Group, instance=group)):
+        group = Group.objects.select_for_update().get(pk=group.pk)
+        users = list(User.objects.filter(group=group))
+
+        _group_size.observe(len(users))
+        if group.dirty_since is not None:
+            _settlement_lag.observe((timezone.now() - group.dirty_since).total_seconds())
+
+        totals = {user.key: user.balance for user in users}
+        _, simplified_debt = simplify_debt.update_total_debt(
+            totals, [], engine or settings.SETTLEMENT_ENGINE)
+
+        # the previous user debts of the group are now useless
+        UserDebt.objects.filter(group=group).delete()
+        UserDebt.objects.bulk_create(
+            UserDebt(group=group, borrower_id=borrower, lender_id=lender, value=value)
+            # debts is a dict of users this borrower owes to, like {'user1': 3, 'user2':8}
+            for borrower, debts in simplified_debt.items()
+            for lender, value in debts.items()
+        )
+
+        Group.objects.filter(pk=group.pk).update(settlement_version=group.balance_version,
+                                                 dirty_since=None)
+
+    _settlements.inc(mode=mode)
+    return group.balance_version
+
+
+def settle_due_groups(interval: float = None, limit=100) -> int:
+    """
+    Settles the dirty groups of every shard whose oldest unsettled accept is
+    at least 'interval' seconds old.
+
+    :param interval: seconds, defaults to settings.SETTLEMENT_INTERVAL.
+    :param limit:    maximum number of groups settled per shard.
+    :return: number of groups that were settled.
+    """
+    if interval is None:
+        interval = settings.SETTLEMENT_INTERVAL
+
+    due = timezone.now() - timedelta(seconds=interval)
+
+    settled = 0
+    for shard in settings.SHARDS:
+        with use_shard(shard):
+            groups = Group.objects.filter(dirty_since__lte=due).order_by('dirty_since')
+            for group in list(groups[:limit]):
+                settle(group, mode='deferred')
+                settled += 1
+
+    return settled
@@ -1,5 +1,24 @@
 from collections import defaultdict
 
+from utils import metrics, timing
+
+_simplification_time = metrics.histogram('debt_simplification_seconds',
+                                         'Time spent simplifying the debt of a group')
+
+# settlement engines by name: functions with the signature of debt_simplification,
+# selected with the SETTLEMENT_ENGINE setting and checked against each other by
+# the fuzz_settlement_engines command (see services.engine_harness)
+ENGINES = {}
+
+
+def register_engine(name: str):
+    """ Decorator registering a settlement engine under the given name """
+    def register(function):
+        ENGINES[name] = function
+        return function
+
+    return register
+
 
 def compute_totals(totals: defaultdict(int), uomes: list) -> defaultdict(int):
     """
@@ -34,6 +53,7 @@ def borrowers_and_lenders(totals_dict: dict) -> (dict, dict):
     return borrowers, lenders
 
 
+@register_engine('greedy')
 def debt_simplification(borrowers: dict, lenders: dict) -> dict:
     """
     Inputs are two dictionaries containing borrowers and lenders.
@@ -59,12 +79,43 @@ def debt_simplification(borrowers: dict, lenders: dict) -> dict:
     return dict(simplified_debt)
 
 
-def update_total_debt(current_totals: defaultdict(int), new_uomes: list) -> (defaultdict(int), dict):
+@register_engine('sweep')
+def sweep_simplification(borrowers: dict, lenders: dict) -> dict:
+    """
+    Same simplified UOMe as debt_simplification, in linear time after the
+    sorting: the lenders are paid in order by the borrowers in order, a
+    borrower that is not paid off moving on to the next lender.
+    """
+
+    simplified_debt = defaultdict(dict)
+    debits = iter(sorted((borrower, debit) for borrower, debit in borrowers.items() if debit))
+    borrower, debit = next(debits, (None, 0))
+
+    for lender in sorted(lenders):
+        credit = lenders[lender]
+
+        while credit and borrower is not None:
+            transaction_value = min(credit, debit)
+            simplified_debt[borrower][lender] = transaction_value
+            credit -= transaction_value
+            debit -= transaction_value
+
+            if debit == 0:
+                borrower, debit = next(debits, (None, 0))
+
+    return dict(simplified_debt)
+
+
+@timing.timed('simplify')
+def update_total_debt(current_totals: defaultdict(int), new_uomes: list,
+                      engine='greedy') -> (defaultdict(int), dict):
     """
-    Get the new state of the user graph when given a list of new UOMe's
+    Get the new state of the user graph when given a list of new UOMe's,
+    simplified with the given settlement engine
     """
 
-    new_totals = compute_totals(current_totals, new_uomes)
-    new_user_debt = debt_simplification(*borrowers_and_lenders(new_totals))
+    with _simplification_time.time():
+        new_totals = compute_totals(current_totals, new_uomes)
+        new_user_debt = ENGINES[engine](*borrowers_and_lenders(new_totals))
 
     return new_totals, new_user_debt
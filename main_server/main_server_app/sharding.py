@@ -0,0 +1,154 @@
+"""
+Sharding of the main server: the data of each group is kept in one of the
+databases listed in settings.SHARDS (see utils.server.sharding).
+
+The shard of a group is given by the shard map unless the group was moved to
+another shard with 'move_group', in which case its location is recorded in
+the default database. Views that receive a group_uuid are decorated with
+'routed_by_group', which routes all their queries to the group's shard.
+"""
+import asyncio
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+
+from utils import metrics
+from utils.server.sharding import shard_for, use_shard
+
+from .models import BalanceCheckpoint, Group, GroupLocation, LedgerNode, User, UOMe, \
+    UserDebt
+
+_shard_requests = metrics.counter('shard_requests', 'Requests routed to each shard',
+                                  labels=('shard',))
+
+
+def shard_of(group_uuid) -> str:
+    """
+    Returns the shard holding the data of a group.
+
+    :raise ValueError: if the uuid is not valid.
+    """
+    shards = settings.SHARDS
+    if len(shards) == 1:
+        return shards[0]
+
+    location = GroupLocation.objects.using(DEFAULT_DB_ALIAS) \
+        .filter(group_uuid=group_uuid).values_list('shard', flat=True).first()
+
+    return location or shard_for(group_uuid, shards)
+
+
+def routed_by_group(view=None, atomic=False):
+    """
+    Decorator of views whose request message has a group_uuid parameter. The
+    queries of the view are routed to the shard of that group. Requests
+    without a valid group_uuid are left for the view to reject.
+
+    Async views are supported, except in atomic mode.
+
+    :param atomic: run the view in a transaction of the group's shard.
+    """
+    if view is None:
+        return functools.partial(routed_by_group, atomic=atomic)
+
+    if asyncio.iscoroutinefunction(view):
+        if atomic:
+            raise TypeError("async views can not run in a transaction")
+
+        return _routed_by_group_async(view)
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            shard = shard_of(json.loads(request.POST['data'])['group_uuid'])
+        except (KeyError, ValueError, TypeError):
+            return view(request, *args, **kwargs)
+
+        _shard_requests.inc(shard=shard)
+        with use_shard(shard):
+            if atomic:
+                with transaction.atomic(using=shard):
+                    return view(request, *args, **kwargs)
+
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _routed_by_group_async(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            group_uuid = json.loads(request.POST['data'])['group_uuid']
+            # with several shards the location of the group is queried
+            if len(settings.SHARDS) == 1:
+                shard = shard_of(group_uuid)
+            else:
+                shard = await sync_to_async(shard_of)(group_uuid)
+        except (KeyError, ValueError, TypeError):
+            return await view(request, *args, **kwargs)
+
+        _shard_requests.inc(shard=shard)
+        with use_shard(shard):
+            return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def move_group(group_uuid, target: str) -> int:
+    """
+    Moves the data of a group to another shard. The group must not receive
+    requests while it is moved, requests handled during the move may be lost.
+
+    :param group_uuid: uuid of the group to move.
+    :param target:     shard to move the group to.
+    :return: number of objects moved.
+    :raise ValueError: if the target is not a shard.
+    :raise Group.DoesNotExist: if the group does not exist.
+    """
+    if target not in settings.SHARDS:
+        raise ValueError("unknown shard: %s" % target)
+
+    source = shard_of(group_uuid)
+    group = Group.objects.using(source).get(pk=group_uuid)
+
+    if source == target:
+        return 0
+
+    # users are copied before the UOMes and debts that refer to them
+    querysets = [
+        Group.objects.filter(pk=group.uuid),
+        User.objects.filter(group=group),
+        UOMe.objects.filter(group=group),
+        UserDebt.objects.filter(group=group),
+        LedgerNode.objects.filter(group=group),
+        BalanceCheckpoint.objects.filter(group=group),
+    ]
+
+    moved = 0
+    with transaction.atomic(using=target):
+        for queryset in querysets:
+            objects = list(queryset.using(source))
+            # auto-increment ids are only unique within a shard, new ones are
+            # given by the target
+            if isinstance(queryset.model._meta.pk, models.AutoField):
+                for obj in objects:
+                    obj.pk = None
+            queryset.model.objects.using(target).bulk_create(objects)
+            moved += len(objects)
+
+    # from now on the group is read from the target
+    if target == shard_for(group.uuid, settings.SHARDS):
+        GroupLocation.objects.using(DEFAULT_DB_ALIAS).filter(group_uuid=group.uuid).delete()
+    else:
+        GroupLocation.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+            group_uuid=group.uuid, defaults={'shard': target})
+
+    with transaction.atomic(using=source):
+        for queryset in reversed(querysets):
+            queryset.using(source).delete()
+
+    return moved
@@ -0,0 +1,51 @@
+import os
+import tempfile
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import TestCase
+
+from .models import Group
+
+# The suite runs against the database selected by the environment (see
+# utils.server.database), run it with DATABASE_ENGINE=postgresql to test
+# against PostgreSQL.
+
+
+class DatabaseTests(TestCase):
+    def test_models_are_stored_and_loaded(self):
+        group = Group.objects.create(name='test', key='key')
+
+        assert Group.objects.get(pk=group.uuid).name == 'test'
+
+    @skipUnless(connection.vendor == 'postgresql', 'requires PostgreSQL')
+    def test_postgresql_connections_are_persistent(self):
+        assert connection.settings_dict['CONN_MAX_AGE'] > 0
+
+    @skipUnless(connection.vendor == 'sqlite', 'requires SQLite')
+    def test_sqlite_connections_are_tuned_for_concurrency(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            assert cursor.fetchone()[0] == 1  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            assert cursor.fetchone()[0] == 5000
+
+    def test_sqlite_file_databases_use_wal(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = DatabaseWrapper({
+                'NAME': os.path.join(directory, 'db.sqlite3'),
+                'OPTIONS': {'timeout': 2},
+                'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False, 'CONN_MAX_AGE': 0,
+                'TIME_ZONE': None, 'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': '',
+                'TEST': {},
+            }, alias='wal_test')
+
+            try:
+                with database.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    assert cursor.fetchone()[0] == 'wal'
+                    cursor.execute('PRAGMA busy_timeout')
+                    assert cursor.fetchone()[0] == 2000
+            finally:
+                database.close()
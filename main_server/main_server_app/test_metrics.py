@@ -0,0 +1,58 @@
+import gzip
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from utils.crypto import example_keys
+from utils.messages import message_formats as msg
+
+
+class MetricsTests(TestCase):
+    def test_requests_and_signature_failures_are_counted(self):
+        signature = 'invalidsignature'
+        request = msg.RegisterGroup.make_request(group_name='test_name',
+                                                 group_key=example_keys.G1_pub,
+                                                 group_signature=signature)
+
+        self.client.post(reverse('main_server_app:register_group'),
+                         {'data': request.dumps()})
+
+        raw_response = self.client.get(reverse('metrics'))
+        assert raw_response.status_code == 200
+
+        content = raw_response.content.decode()
+        assert 'http_requests_total{view="main_server_app:register_group",status="401"}' \
+               in content
+        assert 'signature_failures_total{message="RegisterGroup",signature="group"}' \
+               in content
+
+    def test_metrics_are_not_served_to_other_addresses(self):
+        raw_response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1')
+
+        assert raw_response.status_code == 403
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionTests(TestCase):
+    def test_large_responses_are_compressed_for_clients_that_accept_it(self):
+        raw_response = self.client.get(reverse('metrics'), HTTP_ACCEPT_ENCODING='gzip')
+
+        assert raw_response['Content-Encoding'] == 'gzip'
+        assert raw_response['Vary'] == 'Accept-Encoding'
+        assert int(raw_response['Content-Length']) == len(raw_response.content)
+        assert '# TYPE http_requests counter' in gzip.decompress(raw_response.content).decode()
+
+        # the savings of the previous response are in the metrics
+        content = self.client.get(reverse('metrics')).content.decode()
+        assert 'http_compression_saved_bytes_total{encoding="gzip"}' in content
+
+    def test_responses_are_not_compressed_without_accept_encoding(self):
+        raw_response = self.client.get(reverse('metrics'))
+
+        assert not raw_response.has_header('Content-Encoding')
+
+    @override_settings(COMPRESSION_MIN_SIZE=10 ** 9)
+    def test_small_responses_are_not_compressed(self):
+        raw_response = self.client.get(reverse('metrics'), HTTP_ACCEPT_ENCODING='gzip')
+
+        assert not raw_response.has_header('Content-Encoding')
@@ -1,6 +1,25 @@
+import os
+import random
+import tempfile
 from collections import defaultdict
+from io import StringIO
+from unittest.mock import patch
 
-from .services import simplify_debt
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from .models import BalanceCheckpoint, Group, LedgerNode, User, UOMe, UserDebt
+from .services import (checkpoints, engine_harness, export, ledger_files, rebalance,
+                       simplify_debt)
+from .test_views import accept
+
+from utils import columnar, ledger_file
+from utils.crypto import example_keys
+from utils.messages import message_formats as msg
 
 
 # TODO: add WAY more tests here
@@ -14,3 +33,347 @@ class TestSimplifyDebt:
 
         assert new_totals == {'B': 2, 'A': 1, 'C': -3}
         assert simplified_debt == {'C': {'B': 2, 'A': 1}}
+
+
+def lopsided_engine(borrowers: dict, lenders: dict) -> dict:
+    """ Settles everything with the first lender, whatever its credit """
+    lender = min(lenders)
+    return {borrower: {lender: debit} for borrower, debit in borrowers.items()}
+
+
+class EngineHarnessTests(TestCase):
+    def test_the_sweep_engine_settles_like_the_greedy_one(self):
+        rng = random.Random(0)
+        for kind in engine_harness.KINDS:
+            balances = engine_harness.generate(rng, 50, kind)
+            sweep = simplify_debt.sweep_simplification(*simplify_debt.borrowers_and_lenders(balances))
+            greedy = simplify_debt.debt_simplification(*simplify_debt.borrowers_and_lenders(balances))
+
+            assert sweep == greedy
+
+    def test_registered_engines_pass_the_harness(self):
+        report = engine_harness.run(sizes=(2, 3, 10, 100), iterations=3, time_budgets=False)
+
+        assert report.failures == []
+        assert report.vectors == 4 * 3 * len(engine_harness.KINDS)
+        assert report.debts['greedy'] == report.debts['sweep']
+
+    def test_wrong_settlements_are_reported(self):
+        assert engine_harness.check_settlement({'A': -5, 'B': 3, 'C': 2},
+                                               {'A': {'B': 3, 'C': 2}}) == []
+        assert engine_harness.check_settlement({'A': -5, 'B': 5}, {'A': {'B': 4}}) != []
+        assert engine_harness.check_settlement({'A': -5, 'B': 5}, {'B': {'A': -5}}) != []
+
+        with patch.dict(simplify_debt.ENGINES, lopsided=lopsided_engine):
+            report = engine_harness.run(['greedy', 'lopsided'], sizes=(10,), iterations=2,
+                                        time_budgets=False)
+
+            with self.assertRaises(CommandError):
+                call_command('fuzz_settlement_engines', '--engine', 'lopsided', '--sizes', '10',
+                             '--iterations', '1', stdout=StringIO(), stderr=StringIO())
+
+        assert {engine for engine, kind, size, seed, problem in report.failures} == {'lopsided'}
+        assert report.more_debts['greedy'] == 0
+
+    @override_settings(SETTLEMENT_ENGINE='unknown')
+    def test_unknown_settlement_engine_is_refused_at_startup(self):
+        with self.assertRaises(ImproperlyConfigured):
+            apps.get_app_config('main_server_app').ready()
+
+
+@override_settings(CHECKPOINT_INTERVAL=2)
+class CheckpointTests(TestCase):
+    def setUp(self):
+        self.private_key, self.key = example_keys.C1_priv, example_keys.C1_pub
+        self.group = Group.objects.create(name='test', key=example_keys.G1_pub)
+        self.user = User.objects.create(group=self.group, key=self.key)
+        self.lender = User.objects.create(group=self.group, key=example_keys.C2_pub)
+
+        self.uomes = [accept(self, value) for value in (1, 2, 4, 8, 16)]
+
+    def test_a_checkpoint_is_taken_every_interval(self):
+        saved = BalanceCheckpoint.objects.filter(group=self.group).order_by('ledger_size')
+
+        assert [checkpoint.ledger_size for checkpoint in saved] == [2, 4]
+        assert saved[1].balances == {self.user.key: -15, self.lender.key: 15}
+
+    def test_balances_after_a_prefix_of_the_ledger(self):
+        assert checkpoints.balances_at(self.group, ledger_size=0) == {}
+        assert checkpoints.balances_at(self.group, ledger_size=3) == \
+            {self.user.key: -7, self.lender.key: 7}
+        assert checkpoints.balances_at(self.group) == {self.user.key: -31, self.lender.key: 31}
+
+    def test_balances_at_a_point_in_time(self):
+        when = UOMe.objects.get(pk=self.uomes[2].pk).accepted_at
+
+        assert checkpoints.balances_at(self.group, when=when) == \
+            {self.user.key: -7, self.lender.key: 7}
+
+    def test_only_the_uomes_after_the_nearest_checkpoint_are_replayed(self):
+        # a wrong checkpoint shows up in the balances replayed from it
+        BalanceCheckpoint.objects.filter(group=self.group, ledger_size=4) \
+            .update(balances={self.user.key: -100, self.lender.key: 100})
+
+        assert checkpoints.balances_at(self.group, ledger_size=5) == \
+            {self.user.key: -116, self.lender.key: 116}
+        assert checkpoints.balances_at(self.group, ledger_size=3) == \
+            {self.user.key: -7, self.lender.key: 7}
+
+    def test_group_balances_command(self):
+        output = StringIO()
+
+        call_command('group_balances', str(self.group.uuid), '--ledger-size', '1', stdout=output)
+
+        assert output.getvalue().splitlines() == sorted(["%s 1" % self.lender.key,
+                                                         "%s -1" % self.user.key])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.private_key, self.key = example_keys.C1_priv, example_keys.C1_pub
+        self.group = Group.objects.create(name='test', key=example_keys.G1_pub)
+        self.user = User.objects.create(group=self.group, key=self.key)
+        self.lender = User.objects.create(group=self.group, key=example_keys.C2_pub)
+
+        self.accepted = [accept(self, value) for value in (10, 20, 30)]
+        self.pending = UOMe.objects.create(group=self.group, lender=self.user,
+                                           borrower=self.lender, value=5,
+                                           description='pending', issuer_signature='sig')
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'group.cols')
+
+    def snapshot(self) -> dict:
+        group = Group.objects.filter(pk=self.group.pk)
+        return {
+            'group': list(group.values()),
+            'users': list(User.objects.filter(group=self.group).order_by('key').values()),
+            'uomes': list(UOMe.objects.filter(group=self.group).order_by('uuid').values()),
+            'debts': sorted(UserDebt.objects.filter(group=self.group)
+                            .values_list('borrower', 'lender', 'value')),
+            'ledger': sorted((level, index, bytes(value)) for level, index, value in
+                             LedgerNode.objects.filter(group=self.group)
+                             .values_list('level', 'index', 'hash')),
+        }
+
+    def test_exported_file_is_readable_without_the_database(self):
+        call_command('export_group', str(self.group.uuid), self.path, stdout=StringIO())
+
+        with columnar.ColumnarFile(self.path) as file:
+            uomes = file['uomes']
+            keys = list(file['users']['key'])
+
+            assert file.metadata['group']['ledger_size'] == 3
+            assert sum(uomes['value']) == 65
+            assert [keys[index] for index in uomes['lender']] == [self.lender.key] * 3 + \
+                [self.user.key]
+            assert list(uomes['ledger_index']) == [0, 1, 2, -1]
+            assert uomes['description'][3] == 'pending'
+
+    def test_imported_group_is_identical_to_the_exported_one(self):
+        UOMe.objects.filter(pk=self.pending.pk).update(issuing_date='2017-05-01')
+        before = self.snapshot()
+
+        call_command('export_group', str(self.group.uuid), self.path, stdout=StringIO())
+        for model in (LedgerNode, BalanceCheckpoint, UserDebt, UOMe, User):
+            model.objects.filter(group=self.group).delete()
+        Group.objects.filter(pk=self.group.pk).delete()
+        call_command('import_group', self.path, '--batch', '2', stdout=StringIO())
+
+        assert self.snapshot() == before
+
+    def test_importing_an_existing_group_fails(self):
+        call_command('export_group', str(self.group.uuid), self.path, stdout=StringIO())
+
+        with self.assertRaises(CommandError):
+            call_command('import_group', self.path, stdout=StringIO())
+
+    def test_importing_a_user_of_another_group_fails(self):
+        call_command('export_group', str(self.group.uuid), self.path, stdout=StringIO())
+        for model in (LedgerNode, BalanceCheckpoint, UserDebt, UOMe, User):
+            model.objects.filter(group=self.group).delete()
+        Group.objects.filter(pk=self.group.pk).delete()
+
+        other_group = Group.objects.create(name='other', key=example_keys.G2_pub)
+        User.objects.create(group=other_group, key=self.lender.key)
+
+        with self.assertRaisesMessage(ValueError, self.lender.key):
+            export.import_group(self.path)
+
+        assert not Group.objects.filter(pk=self.group.pk).exists()
+
+
+_GROUP_FIELDS = ('balance_version', 'settlement_version', 'dirty_since', 'ledger_size',
+                 'ledger_root')
+
+
+@override_settings(CHECKPOINT_INTERVAL=2, LEDGER_FSYNC_INTERVAL=0)
+class LedgerFileTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(ledger_files.close)
+
+        files_settings = override_settings(LEDGER_FILES_DIR=directory.name)
+        files_settings.enable()
+        self.addCleanup(files_settings.disable)
+
+        self.private_key, self.key = example_keys.C1_priv, example_keys.C1_pub
+        self.group = Group.objects.create(name='test', key=example_keys.G1_pub)
+        self.user = User.objects.create(group=self.group, key=self.key)
+        self.lender = User.objects.create(group=self.group, key=example_keys.C2_pub)
+
+        # the records are written once the accepts are committed
+        with self.captureOnCommitCallbacks(execute=True):
+            self.uomes = [accept(self, value) for value in (1, 2, 4, 8, 16)]
+
+    def snapshot(self) -> dict:
+        return {
+            # the signatures of the root are randomized
+            'group': list(Group.objects.filter(pk=self.group.pk).values(*_GROUP_FIELDS)),
+            'users': sorted(User.objects.filter(group=self.group).values_list('key', 'balance')),
+            'debts': sorted(UserDebt.objects.filter(group=self.group)
+                            .values_list('borrower', 'lender', 'value')),
+            'ledger': sorted((level, index, bytes(value)) for level, index, value in
+                             LedgerNode.objects.filter(group=self.group)
+                             .values_list('level', 'index', 'hash')),
+            'checkpoints': list(BalanceCheckpoint.objects.filter(group=self.group)
+                                .order_by('ledger_size')
+                                .values_list('ledger_size', 'accepted_at', 'balances')),
+        }
+
+    def test_accepted_uomes_are_appended_to_the_group_file(self):
+        entries = list(ledger_file.LedgerReader(ledger_files.path(self.group)))
+
+        assert [entry.ledger_index for entry in entries] == [0, 1, 2, 3, 4]
+        assert [entry.uome_uuid for entry in entries] == [uome.uuid.bytes for uome in self.uomes]
+        assert {(entry.lender, entry.borrower) for entry in entries} == \
+            {(self.lender.key, self.user.key)}
+
+    def test_replay_rebuilds_the_state_of_the_group(self):
+        before = self.snapshot()
+
+        # the state lost in a crash, or never written to a new shard
+        User.objects.filter(group=self.group).update(balance=0)
+        for model in (LedgerNode, BalanceCheckpoint, UserDebt):
+            model.objects.filter(group=self.group).delete()
+        Group.objects.filter(pk=self.group.pk).update(ledger_size=0, ledger_root='',
+                                                      ledger_signature='')
+
+        output = StringIO()
+        call_command('replay_ledger', str(self.group.uuid), stdout=output)
+
+        assert self.snapshot() == before
+
+        group = Group.objects.get(pk=self.group.pk)
+        msg.GetInclusionProof.verify(settings.PUBLIC_KEY, 'main', group.ledger_signature,
+                                     group_uuid=str(group.uuid), tree_size=5,
+                                     root=group.ledger_root)
+        assert output.getvalue().startswith("replayed 5 UOMes")
+
+    def test_torn_records_are_truncated_and_missing_ones_detected(self):
+        path = ledger_files.path(self.group)
+        entries = list(ledger_file.LedgerReader(path))
+        with open(path, 'wb') as file:
+            file.write(b''.join(ledger_file.encode(entry) for entry in entries[:2] + entries[3:]))
+            file.write(ledger_file.encode(entries[4])[:-1])
+
+        with self.assertRaises(CommandError):
+            call_command('replay_ledger', str(self.group.uuid), '--truncate', stdout=StringIO())
+
+        assert len(list(ledger_file.LedgerReader(path))) == 4
+
+    def test_missing_newest_records_are_detected(self):
+        path = ledger_files.path(self.group)
+        entries = list(ledger_file.LedgerReader(path))
+        with open(path, 'wb') as file:
+            file.write(b''.join(ledger_file.encode(entry) for entry in entries[:-1]))
+
+        with self.assertRaises(CommandError):
+            call_command('replay_ledger', str(self.group.uuid), stdout=StringIO())
+
+        assert Group.objects.get(pk=self.group.pk).ledger_size == 5
+
+    def test_accepts_after_a_crash_in_a_write_are_replayed(self):
+        path = ledger_files.path(self.group)
+        ledger_files.close()
+        with open(path, 'ab') as file:
+            file.write(ledger_file.encode(next(iter(ledger_file.LedgerReader(path))))[:-3])
+
+        # the restarted server appends to the file again
+        with self.captureOnCommitCallbacks(execute=True):
+            accept(self, 32)
+        before = self.snapshot()
+
+        output = StringIO()
+        call_command('replay_ledger', str(self.group.uuid), stdout=output)
+
+        assert self.snapshot() == before
+        assert output.getvalue().startswith("replayed 6 UOMes")
+
+
+class RebalanceTests(TestCase):
+    def setUp(self):
+        self.groups = []
+        for index, values in enumerate(([-5, 2, 3], [7, -7], [1, 1, -2, 0])):
+            group = Group.objects.create(name='test %d' % index, key='key %d' % index,
+                                         balance_version=len(values))
+            users = [User.objects.create(group=group, key='%d-%d' % (index, user), balance=value)
+                     for user, value in enumerate(values)]
+            # outdated debts
+            UserDebt.objects.create(group=group, borrower=users[0], lender=users[1], value=100)
+            self.groups.append(group)
+
+    def debts(self, group) -> dict:
+        debts = defaultdict(dict)
+        for borrower, lender, value in UserDebt.objects.filter(group=group) \
+                .values_list('borrower', 'lender', 'value'):
+            debts[borrower][lender] = value
+        return dict(debts)
+
+    def expected_debts(self, group) -> dict:
+        balances = dict(User.objects.filter(group=group).values_list('key', 'balance'))
+        return simplify_debt.debt_simplification(*simplify_debt.borrowers_and_lenders(balances))
+
+    def test_every_group_is_rebalanced_in_chunks(self):
+        timed = []
+        summary = rebalance.rebalance_groups(workers=0, chunk_size=2,
+                                             on_group=lambda *args: timed.append(args))
+
+        assert (summary['groups'], summary['users'], summary['retried']) == (3, 9, 0)
+        assert sorted(group_id for group_id, users, debts, seconds in timed) == \
+            sorted(group.pk for group in self.groups)
+        for group in self.groups:
+            assert self.debts(group) == self.expected_debts(group)
+            group.refresh_from_db()
+            assert group.settlement_version == group.balance_version
+
+    def test_groups_that_accepted_uomes_meanwhile_are_settled_again(self):
+        changed = self.groups[1]
+        simplify_group = rebalance.simplify_group
+
+        def accept_while_simplifying(group_id, balances, engine):
+            if group_id == changed.pk:
+                Group.objects.filter(pk=changed.pk).update(balance_version=F('balance_version') + 1)
+                User.objects.filter(pk='1-0').update(balance=10)
+                User.objects.filter(pk='1-1').update(balance=-10)
+            return simplify_group(group_id, balances, engine)
+
+        with patch.object(rebalance, 'simplify_group', accept_while_simplifying):
+            summary = rebalance.rebalance_groups(workers=0)
+
+        assert (summary['groups'], summary['retried']) == (2, 1)
+        assert self.debts(changed) == {'1-1': {'1-0': 10}}
+
+    def test_rebalance_groups_command_uses_a_process_pool(self):
+        output = StringIO()
+
+        call_command('rebalance_groups', '--workers', '2', '--engine', 'sweep', '--slowest', '1',
+                     stdout=output)
+
+        lines = output.getvalue().splitlines()
+        assert lines[0].startswith("rebalanced 3 groups (9 users, 5 debts)")
+        assert len(lines) == 2
+        for group in self.groups:
+            assert self.debts(group) == self.expected_debts(group)
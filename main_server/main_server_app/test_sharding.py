@@ -0,0 +1,180 @@
+import os
+import tempfile
+from io import StringIO
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import BalanceCheckpoint, Group, GroupLocation, LedgerNode, User, UOMe, \
+    UserDebt
+from .sharding import move_group, shard_of
+
+from utils.crypto import example_keys
+from utils.messages import message_formats as msg
+from utils.server.sharding import shard_for, use_shard
+
+SHARDS = [DEFAULT_DB_ALIAS, 'shard_a', 'shard_b']
+
+
+def group_uuid_in(shard: str):
+    """ Returns a new group uuid that the shard map assigns to the given shard """
+    while True:
+        group_uuid = uuid4()
+        if shard_for(group_uuid, SHARDS) == shard:
+            return group_uuid
+
+
+class ShardingTests(TransactionTestCase):
+    """
+    Spreads the groups across the default database and two SQLite files,
+    which are added to the connections while the tests run.
+    """
+
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+
+        for alias in SHARDS[1:]:
+            connections.databases[alias] = dict(
+                settings.DATABASES[DEFAULT_DB_ALIAS],
+                NAME=os.path.join(cls.directory.name, alias + '.sqlite3'),
+                TEST={},
+            )
+
+        cls.shards = override_settings(SHARDS=SHARDS)
+        cls.shards.enable()
+
+        for alias in SHARDS[1:]:
+            call_command('migrate', database=alias, verbosity=0)
+
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.shards.disable()
+
+        for alias in SHARDS[1:]:
+            connections[alias].close()
+            del connections[alias]
+            del connections.databases[alias]
+
+        cls.directory.cleanup()
+
+    def create_group(self, shard: str) -> Group:
+        group_uuid = group_uuid_in(shard)
+
+        with use_shard(shard_of(group_uuid)):
+            group = Group.objects.create(uuid=group_uuid, name='test', key=example_keys.G1_pub)
+            user1 = User.objects.create(group=group, key=example_keys.C1_pub, balance=1000)
+            user2 = User.objects.create(group=group, key=example_keys.C2_pub, balance=-1000)
+            UOMe.objects.create(group=group, lender=user1, borrower=user2, value=1000,
+                                description='test', issuer_signature='sig')
+            UserDebt.objects.create(group=group, lender=user1, borrower=user2, value=1000)
+
+        return group
+
+    def get_totals(self, group: Group):
+        signature = msg.CheckTotals.sign(example_keys.C1_priv, 'user',
+                                         group_uuid=str(group.uuid),
+                                         user=example_keys.C1_pub)
+        request = msg.CheckTotals.make_request(group_uuid=str(group.uuid),
+                                               user=example_keys.C1_pub,
+                                               user_signature=signature)
+
+        return self.client.post(reverse('main_server_app:get_totals'),
+                                {'data': request.dumps()})
+
+    def test_new_groups_are_stored_in_the_shard_given_by_the_map(self):
+        signature = msg.RegisterGroup.sign(example_keys.G1_priv, 'group', group_name='test',
+                                           group_key=example_keys.G1_pub)
+        request = msg.RegisterGroup.make_request(group_name='test',
+                                                 group_key=example_keys.G1_pub,
+                                                 group_signature=signature)
+
+        raw_response = self.client.post(reverse('main_server_app:register_group'),
+                                        {'data': request.dumps()})
+
+        assert raw_response.status_code == 201
+        group_uuid = msg.RegisterGroup.load_response(raw_response.content.decode()).group_uuid
+        for shard in SHARDS:
+            stored = Group.objects.using(shard).filter(pk=group_uuid).exists()
+            assert stored == (shard == shard_for(group_uuid, SHARDS))
+
+    def test_requests_are_served_from_the_shard_of_the_group(self):
+        groups = [self.create_group(shard) for shard in SHARDS]
+
+        for group in groups:
+            raw_response = self.get_totals(group)
+
+            assert raw_response.status_code == 200
+            response = msg.CheckTotals.load_response(raw_response.content.decode())
+            assert response.user_balance == 1000
+            assert response.suggested_transactions == {example_keys.C2_pub: 1000}
+
+    def test_moving_a_group_copies_all_its_data_to_the_target(self):
+        group = self.create_group('shard_a')
+
+        assert move_group(group.uuid, 'shard_b') == 5
+
+        assert shard_of(group.uuid) == 'shard_b'
+        assert GroupLocation.objects.get(pk=group.uuid).shard == 'shard_b'
+        assert not Group.objects.using('shard_a').filter(pk=group.uuid).exists()
+        assert User.objects.using('shard_b').filter(group=group).count() == 2
+        assert self.get_totals(group).status_code == 200
+
+    def test_moving_a_group_to_a_shard_with_data_gives_new_ids(self):
+        # rows with auto-increment ids already stored in the target
+        with use_shard('shard_b'):
+            other = Group.objects.create(uuid=group_uuid_in('shard_b'), name='other',
+                                         key=example_keys.G2_pub)
+            user3 = User.objects.create(group=other, key=example_keys.C3_pub)
+            user4 = User.objects.create(group=other, key=example_keys.C4_pub)
+            UserDebt.objects.create(group=other, lender=user3, borrower=user4, value=5)
+            LedgerNode.objects.create(group=other, level=0, index=0, hash=bytes(32))
+            BalanceCheckpoint.objects.create(group=other, ledger_size=1, accepted_at=timezone.now(),
+                                             balances={})
+
+        group = self.create_group('shard_a')
+        with use_shard('shard_a'):
+            LedgerNode.objects.create(group=group, level=0, index=0, hash=bytes(32))
+            BalanceCheckpoint.objects.create(group=group, ledger_size=1,
+                                             accepted_at=timezone.now(), balances={})
+
+        assert move_group(group.uuid, 'shard_b') == 7
+
+        for model in (UserDebt, LedgerNode, BalanceCheckpoint):
+            assert model.objects.using('shard_b').filter(group=group).count() == 1
+            assert model.objects.using('shard_b').filter(group=other).count() == 1
+
+    def test_moving_a_group_back_forgets_its_location(self):
+        group = self.create_group('shard_a')
+
+        move_group(group.uuid, 'shard_b')
+        move_group(group.uuid, 'shard_a')
+
+        assert shard_of(group.uuid) == 'shard_a'
+        assert not GroupLocation.objects.filter(pk=group.uuid).exists()
+        assert UOMe.objects.using('shard_a').filter(group=group).count() == 1
+
+    def test_moving_a_group_to_an_unknown_shard_raises_value_error(self):
+        group = self.create_group('shard_a')
+
+        with self.assertRaises(ValueError):
+            move_group(group.uuid, 'shard_z')
+
+    def test_move_group_command(self):
+        group = self.create_group('shard_a')
+        output = StringIO()
+
+        call_command('move_group', str(group.uuid), 'shard_b', stdout=output)
+
+        assert output.getvalue().strip() == "moved 5 objects from shard_a to shard_b"
+        assert shard_of(group.uuid) == 'shard_b'
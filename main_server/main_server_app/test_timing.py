@@ -0,0 +1,61 @@
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase
+from django.urls import reverse
+
+from .models import Group, User
+
+from utils import timing
+from utils.crypto import example_keys
+from utils.crypto.rsa import sign
+from utils.messages import message_formats as msg
+
+
+class TimingTests(TestCase):
+    def setUp(self):
+        timing.reset()
+
+    def test_request_is_recorded_per_endpoint(self):
+        signature = sign(example_keys.G1_priv, 'test_name', example_keys.G1_pub)
+        request = msg.RegisterGroup.make_request(group_name='test_name',
+                                                 group_key=example_keys.G1_pub,
+                                                 group_signature=signature)
+
+        self.client.post(reverse('main_server_app:register_group'),
+                         {'data': request.dumps()})
+
+        raw_response = self.client.get(reverse('timing'))
+        assert raw_response.status_code == 200
+
+        stats = raw_response.json()['main_server_app:register_group']
+        assert stats['requests'] == 1
+        assert stats['avg_queries'] >= 1
+        for phase in ('decode', 'verify', 'sign', 'db'):
+            assert phase in stats['avg_phases']
+
+    def test_stats_are_not_served_to_remote_addresses(self):
+        raw_response = self.client.get(reverse('timing'), REMOTE_ADDR='10.0.0.1')
+
+        assert raw_response.status_code == 403
+
+    async def test_async_request_is_recorded_with_its_executor_phases(self):
+        group = await sync_to_async(Group.objects.create)(name='test', key=example_keys.G1_pub)
+        await sync_to_async(User.objects.create)(group=group, key=example_keys.C1_pub)
+
+        signature = msg.CheckTotals.sign(example_keys.C1_priv, 'user',
+                                         group_uuid=str(group.uuid), user=example_keys.C1_pub)
+        request = msg.CheckTotals.make_request(group_uuid=str(group.uuid),
+                                               user=example_keys.C1_pub,
+                                               user_signature=signature)
+        timing.reset()
+
+        raw_response = await self.async_client.post(
+            reverse('main_server_app:get_totals'), urlencode({'data': request.dumps()}),
+            content_type='application/x-www-form-urlencoded')
+
+        assert raw_response.status_code == 200
+        stats = timing.snapshot()['main_server_app:get_totals']
+        assert stats['avg_queries'] >= 2
+        for phase in ('decode', 'verify', 'db'):
+            assert phase in stats['avg_phases']
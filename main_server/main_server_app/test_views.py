@@ -1,4 +1,4 @@
-from django.test import TestCase  # TODO: check out pytest
+from django.test import TestCase, override_settings  # TODO: check out pytest
 from django.urls import reverse
 from django.core import serializers
 from django.conf import settings
@@ -8,9 +8,11 @@ from uuid import uuid4
 from collections import defaultdict
 
 from .models import Group, User, UOMe, UserDebt
+from .services import settlement
 
-from utils.crypto.rsa import generate_keys, sign, verify
-from utils.crypto import example_keys
+from utils.crypto.key_pool import get_keys
+from utils.crypto.rsa import sign, verify
+from utils.crypto import example_keys, merkle, pool
 from utils.messages import message_formats as msg
 from utils.messages.uome_tools import UOMeTools
 
@@ -79,7 +81,7 @@ class RegisterGroupTests(TestCase):
 class JoinGroupTests(TestCase):
     def setUp(self):
         self.message_class = msg.MainServerJoin
-        self.private_key, self.key = generate_keys()
+        self.private_key, self.key = get_keys(7)
         self.group = Group.objects.create(name='test', key=example_keys.G1_pub)
 
     def test_new_user_invalid_group_uuid(self):
@@ -137,6 +139,26 @@ class JoinGroupTests(TestCase):
                                   group_uuid=self.group.uuid,
                                   user=user_pub)
 
+    def test_join_sent_again_after_a_lost_response_succeeds(self):
+        user_pub = example_keys.C1_pub
+
+        group_sig = self.message_class.sign(example_keys.G1_priv, 'group', user=user_pub,
+                                            group_uuid=self.group.uuid)
+        request = self.message_class.make_request(group_uuid=str(self.group.uuid),
+                                                  user=user_pub,
+                                                  group_signature=group_sig)
+
+        for _ in range(2):
+            raw_response = self.client.post(reverse('main_server_app:join-group'),
+                                            {'data': request.dumps()})
+            assert raw_response.status_code == 201
+
+        response = self.message_class.load_response(raw_response.content.decode())
+        self.message_class.verify(settings.PUBLIC_KEY, 'main', response.main_signature,
+                                  group_uuid=self.group.uuid,
+                                  user=user_pub)
+        assert User.objects.filter(group=self.group, key=user_pub).count() == 1
+
 
 class IssueUOMeTests(TestCase):
     def setUp(self):
@@ -357,6 +379,31 @@ class GetPendingUOMesTests(TestCase):
                              uome_uuid=uome[6])
 
 
+def accept(test, value: int) -> UOMe:
+    """ Issues a UOMe from test.lender to test.user and accepts it """
+    uome = UOMe.objects.create(group=test.group, lender=test.lender, borrower=test.user,
+                               value=value, description='test', issuer_signature='sig')
+
+    signature = UOMeTools.sign(test.private_key,
+                               group_uuid=str(test.group.uuid),
+                               issuer=test.lender.key,
+                               borrower=test.user.key,
+                               value=value,
+                               description='test',
+                               uome_uuid=str(uome.uuid))
+
+    request = msg.AcceptUOMe.make_request(group_uuid=str(test.group.uuid),
+                                          user=test.user.key,
+                                          uome_uuid=str(uome.uuid),
+                                          user_signature=signature)
+
+    raw_response = test.client.post(reverse('main_server_app:accept_uome'),
+                                    {'data': request.dumps()})
+
+    assert raw_response.status_code == 200
+    return uome
+
+
 class AcceptTests(TestCase):
     def setUp(self):
         self.message_class = msg.AcceptUOMe
@@ -427,6 +474,86 @@ class AcceptTests(TestCase):
 
         assert simplified_debt == {self.user: {self.lender: uome.value}}
 
+    def test_immediate_mode_settles_every_accept(self):
+        accept(self, 10)
+        accept(self, 5)
+
+        group = Group.objects.get(pk=self.group.pk)
+        assert (group.balance_version, group.settlement_version) == (2, 2)
+        assert group.dirty_since is None
+        assert UserDebt.objects.get(group=self.group, borrower=self.user).value == 15
+
+    @override_settings(SETTLEMENT_MODE='deferred')
+    def test_deferred_mode_leaves_the_settlement_to_the_worker(self):
+        accept(self, 10)
+        accept(self, 5)
+
+        group = Group.objects.get(pk=self.group.pk)
+        assert User.objects.get(pk=self.user.pk).balance == -15
+        assert User.objects.get(pk=self.lender.pk).balance == 15
+        assert (group.balance_version, group.settlement_version) == (2, 0)
+        assert group.dirty_since is not None
+        assert not UserDebt.objects.filter(group=self.group).exists()
+
+        # the burst is not settled before the interval has passed
+        assert settlement.settle_due_groups(interval=60) == 0
+        assert settlement.settle_due_groups(interval=0) == 1
+
+        group = Group.objects.get(pk=self.group.pk)
+        assert (group.balance_version, group.settlement_version) == (2, 2)
+        assert group.dirty_since is None
+        assert UserDebt.objects.get(group=self.group, borrower=self.user).value == 15
+        assert settlement.settle_due_groups(interval=0) == 0
+
+
+class GetInclusionProofTests(TestCase):
+    def setUp(self):
+        self.message_class = msg.GetInclusionProof
+        self.private_key, self.key = example_keys.C1_priv, example_keys.C1_pub
+        self.group = Group.objects.create(name='test', key=example_keys.G1_pub)
+        self.user = User.objects.create(group=self.group, key=self.key)
+        self.lender = User.objects.create(group=self.group, key=example_keys.C2_pub)
+
+    def get_proof(self, uome: UOMe):
+        signature = self.message_class.sign(self.private_key, 'user',
+                                            group_uuid=str(self.group.uuid),
+                                            user=self.user.key,
+                                            uome_uuid=str(uome.uuid))
+
+        request = self.message_class.make_request(group_uuid=str(self.group.uuid),
+                                                  user=self.user.key,
+                                                  uome_uuid=str(uome.uuid),
+                                                  user_signature=signature)
+
+        return self.client.post(reverse('main_server_app:get_inclusion_proof'),
+                                {'data': request.dumps()})
+
+    def test_every_accepted_uome_is_proven_against_the_signed_root(self):
+        uomes = [accept(self, value) for value in (10, 20, 30)]
+
+        for index, uome in enumerate(uomes):
+            raw_response = self.get_proof(uome)
+
+            assert raw_response.status_code == 200
+            response = self.message_class.load_response(raw_response.content.decode())
+
+            assert (response.leaf_index, response.tree_size) == (index, 3)
+            self.message_class.verify(settings.PUBLIC_KEY, 'main', response.main_signature,
+                                      group_uuid=str(self.group.uuid),
+                                      tree_size=response.tree_size, root=response.root)
+
+            leaf = UOMeTools.leaf(str(self.group.uuid), self.lender.key, self.user.key,
+                                  uome.value, 'test', str(uome.uuid))
+            assert merkle.verify_inclusion(leaf, response.leaf_index, response.tree_size,
+                                           [bytes.fromhex(node) for node in response.proof],
+                                           bytes.fromhex(response.root))
+
+    def test_pending_uome_is_not_in_the_ledger(self):
+        uome = UOMe.objects.create(group=self.group, lender=self.lender, borrower=self.user,
+                                   value=10, description='test', issuer_signature='sig')
+
+        assert self.get_proof(uome).status_code == 404
+
 
 class GetTotalsTests(TestCase):
     def setUp(self):
@@ -455,6 +582,7 @@ class GetTotalsTests(TestCase):
 
         assert response.user_balance == 0
         assert response.suggested_transactions == {}
+        assert response.settlement_version == 0
 
     def test_get_totals_one_unconfirmed_uome(self):
         UOMe.objects.create(group=self.group, lender=self.user2, borrower=self.user1,
@@ -504,3 +632,19 @@ class GetTotalsTests(TestCase):
 
         assert response.user_balance == -uome.value
         assert response.suggested_transactions == {self.user1.key: uome.value}
+
+    def test_get_totals_verifies_in_the_crypto_pool(self):
+        pool.configure(workers=2)
+        self.addCleanup(pool.configure, 0)
+
+        request = self.message_class.make_request(group_uuid=str(self.group.uuid),
+                                                  user=self.user1.key,
+                                                  user_signature='invalidsignature')
+
+        raw_response = self.client.post(reverse('main_server_app:get_totals'),
+                                        {'data': request.dumps()})
+
+        assert raw_response.status_code == 401
+        assert pool.stats()['failed'] == 1
+        assert 'signature_failures_total{message="CheckTotals",signature="user"}' in \
+            self.client.get(reverse('metrics')).content.decode()
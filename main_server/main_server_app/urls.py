@@ -8,6 +8,7 @@ urlpatterns = [
     url(r'^cancel-uome$', views.cancel_uome, name='cancel_uome'),
     url(r'^get-pending-uomes$', views.get_pending_uomes, name='get_pending_uomes'),
     url(r'^accept-uome$', views.accept_uome, name='accept_uome'),
+    url(r'^get-inclusion-proof$', views.get_inclusion_proof, name='get_inclusion_proof'),
     url(r'^get-totals$', views.get_totals, name='get_totals'),
     url(r'^register-group$', views.register_group, name='register_group'),
     url(r'^join-group$', views.join_group, name='join-group'),
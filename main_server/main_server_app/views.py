@@ -2,20 +2,25 @@ from django.core.serializers import serialize
 from django.core.exceptions import ObjectDoesNotExist
 from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, \
     Http404
-from django.db import transaction
 from django.conf import settings
 from django.views.decorators.http import require_POST, require_GET
-from collections import defaultdict
 import json
+import uuid
 
 from .models import Group, User, UOMe, UserDebt
-from .services import simplify_debt
+from .services import checkpoints, ledger, settlement
+from .sharding import routed_by_group, shard_of
 
-from utils.crypto.rsa import sign, verify, InvalidSignature
+from utils import metrics
+from utils.crypto.rsa import InvalidSignature
 from utils.messages import message_formats as msg
 from utils.messages.message import DecodeError
 from utils.messages.uome_tools import UOMeTools
+from utils.server import async_views
+from utils.server.sharding import use_shard
 
+_group_accepts = metrics.counter('group_accepted_uomes', 'Accepted UOMes per group',
+                                 labels=('group',), max_series=1000)
 
 # Create your views here.
 # TODO: crypto stuff!
@@ -38,9 +43,12 @@ def register_group(request):
     except InvalidSignature:
         return HttpResponse('401 Unauthorized', status=401)  # There's no class for it
 
-    # signature is correct, create the group
+    # signature is correct, create the group in its shard
     # TODO: limit the length of the group name?
-    group = Group.objects.create(name=request.group_name, key=request.group_key)
+    group_uuid = uuid.uuid4()
+    with use_shard(shard_of(group_uuid)):
+        group = Group.objects.create(uuid=group_uuid, name=request.group_name,
+                                     key=request.group_key)
 
     # group created, create the response object
     signature = msg.RegisterGroup.sign(settings.PRIVATE_KEY, 'main',
@@ -56,6 +64,7 @@ def register_group(request):
 
 
 @require_POST
+@routed_by_group
 def join_group(request):
     message_class = msg.MainServerJoin
 
@@ -76,7 +85,9 @@ def join_group(request):
     except InvalidSignature:
         return HttpResponse('401 Unauthorized', status=401)
 
-    user = User.objects.create(group=group, key=request.user)
+    # the group server sends the request again when it did not get the
+    # response, the user may already have joined
+    user, created = User.objects.get_or_create(group=group, key=request.user)
 
     # create the signature
     signature = message_class.sign(settings.PRIVATE_KEY, 'main', group_uuid=group.uuid,
@@ -91,6 +102,7 @@ def join_group(request):
 
 
 @require_POST
+@routed_by_group
 def issue_uome(request):
     message_class = msg.IssueUOMe
 
@@ -139,6 +151,7 @@ def issue_uome(request):
 
 
 @require_POST
+@routed_by_group
 def confirm_uome(request):
     message_class = msg.ConfirmUOMe
 
@@ -177,6 +190,7 @@ def confirm_uome(request):
 
 
 @require_POST
+@routed_by_group
 def cancel_uome(request):
     message_class = msg.CancelUOMe
 
@@ -222,8 +236,9 @@ def cancel_uome(request):
 
 
 @require_POST
-def get_pending_uomes(request):
-    message_class = msg.GetPendingUOMes
+@routed_by_group
+def get_inclusion_proof(request):
+    message_class = msg.GetInclusionProof
 
     try:  # convert the message into the request object
         request = message_class.load_request(request.POST['data'])
@@ -233,32 +248,91 @@ def get_pending_uomes(request):
     try:  # check that the group exists and get it
         group = Group.objects.get(pk=request.group_uuid)
         user = User.objects.get(group=group, key=request.user)
+        uome = UOMe.objects.get(group=group, uuid=request.uome_uuid)
     except (ValueError, ObjectDoesNotExist):  # ValueError if the uuid is not valid
         return HttpResponseBadRequest()
 
     try:  # verify the signatures
         message_class.verify(user.key, 'user', request.user_signature,
-                             group_uuid=str(group.uuid), user=user.key, )
+                             group_uuid=str(group.uuid),
+                             user=user.key,
+                             uome_uuid=str(uome.uuid))
     except InvalidSignature:
         return HttpResponse('401 Unauthorized', status=401)
 
+    # only accepted UOMes are in the ledger, and always in the one the group was read with
+    if uome.ledger_index is None or uome.ledger_index >= group.ledger_size:
+        return HttpResponse('404 Not Found', status=404)
+
+    # the root was signed when the last UOMe was appended
+    response = message_class.make_response(leaf_index=uome.ledger_index,
+                                           tree_size=group.ledger_size,
+                                           root=group.ledger_root,
+                                           proof=ledger.inclusion_proof(group, uome),
+                                           main_signature=group.ledger_signature)
+
+    return HttpResponse(response.dumps(), status=200)
+
+
+def _group_and_user(group_uuid, user_key) -> (Group, User):
+    group = Group.objects.get(pk=group_uuid)
+    return group, User.objects.get(group=group, key=user_key)
+
+
+def _pending_uomes(group, user) -> (list, list):
     # TODO: add a test for uome's without issuer signatures
     uomes_by_user = UOMe.objects.filter(group=group, borrower_signature='',
                                         lender=user).exclude(issuer_signature='')
     uomes_for_user = UOMe.objects.filter(group=group, borrower_signature='',
                                          borrower=user).exclude(issuer_signature='')
     issued_by_user = []
-    for uome in uomes_by_user:
+    for uome in uomes_by_user.select_related('group', 'lender', 'borrower'):
         issued_by_user.append(uome.to_array_unconfirmed())
     waiting_for_user = []
-    for uome in uomes_for_user:
+    for uome in uomes_for_user.select_related('group', 'lender', 'borrower'):
         waiting_for_user.append(uome.to_array_unconfirmed())
 
-    signature = message_class.sign(settings.PRIVATE_KEY, 'main',
-                                   group_uuid=str(group.uuid),
-                                   user=user.key,
-                                   issued_by_user=json.dumps(issued_by_user),
-                                   waiting_for_user=json.dumps(waiting_for_user))
+    return issued_by_user, waiting_for_user
+
+
+# The read-heavy views are async: under ASGI they wait for the database and
+# the crypto without holding a worker (see utils.server.async_views)
+
+@async_views.require_POST
+@routed_by_group
+async def get_pending_uomes(request):
+    message_class = msg.GetPendingUOMes
+
+    try:  # convert the message into the request object
+        request = message_class.load_request(request.POST['data'])
+    except DecodeError:
+        return HttpResponseBadRequest()
+
+    try:  # check that the group exists and get it
+        group, user = await async_views.database(_group_and_user)(request.group_uuid,
+                                                                  request.user)
+    except (ValueError, ObjectDoesNotExist):  # ValueError if the uuid is not valid
+        return HttpResponseBadRequest()
+
+    try:  # verify the signatures
+        await async_views.crypto('verify', message_class.submit_verify,
+                                 user.key, 'user', request.user_signature,
+                                 group_uuid=str(group.uuid), user=user.key)
+    except InvalidSignature:
+        return HttpResponse('401 Unauthorized', status=401)
+
+    issued_by_user, waiting_for_user = \
+        await async_views.database(_pending_uomes)(group, user)
+
+    # the lists are hashed as they are encoded, for large lists this avoids
+    # building their whole JSON representation just to sign it
+    encoder = json.JSONEncoder()
+    signature = await async_views.crypto(
+        'sign', message_class.submit_sign, settings.PRIVATE_KEY, 'main',
+        group_uuid=str(group.uuid),
+        user=user.key,
+        issued_by_user=encoder.iterencode(issued_by_user),
+        waiting_for_user=encoder.iterencode(waiting_for_user))
 
     response = message_class.make_response(group_uuid=str(group.uuid),
                                            user=user.key,
@@ -270,8 +344,8 @@ def get_pending_uomes(request):
 
 
 # TODO: Think about data races a lot more
-@transaction.atomic
 @require_POST
+@routed_by_group(atomic=True)
 def accept_uome(request):
     message_class = msg.AcceptUOMe
 
@@ -319,36 +393,39 @@ def accept_uome(request):
     # create the response object
     response = message_class.make_response(uome_uuid=str(uome.uuid), main_signature=sig)
 
-    # update the balances and suggestions of users
-    group_users = User.objects.filter(group=group)
+    # update the balances of the lender and the borrower, the suggestions of
+    # the users are updated when the group is settled
+    _group_accepts.inc(group=group.uuid)
+    settlement.record_accept(group, lender, user, uome.value)
+    checkpoints.after_append(group, ledger.append(group, uome))
 
-    totals = defaultdict(int)
-    for user in group_users:
-        totals[user.key] = user.balance
+    if settings.SETTLEMENT_MODE == 'immediate':
+        settlement.settle(group)
 
-    new_uome = [uome.borrower.key, uome.lender.key, uome.value]
-    new_totals, new_simplified_debt = simplify_debt.update_total_debt(totals, [new_uome])
+    # send the response, the status for success is 200 OK
+    return HttpResponse(response.dumps(), status=200)
 
-    for user in group_users:
-        user.balance = new_totals[user.key]
-        user.save()
 
-    # drop the previous user debt for this group, since it's now useless
-    UserDebt.objects.filter(group=group).delete()
+def _suggested_transactions(group, user) -> dict:
+    # example: {'user1': val1, 'user2': val2}
+    suggested_transactions = {}
 
-    for borrower, user_debts in new_simplified_debt.items():
-        # debts is a dict of users this borrower owes to, like {'user1': 3, 'user2':8}
-        for lender, value in user_debts.items():
-            UserDebt.objects.create(group=group, value=value,
-                                    borrower=User.objects.get(key=borrower),
-                                    lender=User.objects.get(key=lender))
+    if user.balance < 0:  # filter by borrower
+        debts = UserDebt.objects.filter(group=group, borrower=user).select_related('lender')
+        for debt in debts:
+            suggested_transactions[debt.lender.key] = debt.value
 
-    # send the response, the status for success is 200 OK
-    return HttpResponse(response.dumps(), status=200)
+    elif user.balance > 0:  # filter by lender
+        debts = UserDebt.objects.filter(group=group, lender=user).select_related('borrower')
+        for debt in debts:
+            suggested_transactions[debt.borrower.key] = debt.value
 
+    return suggested_transactions
 
-@require_POST
-def get_totals(request):
+
+@async_views.require_POST
+@routed_by_group
+async def get_totals(request):
     message_class = msg.CheckTotals
 
     try:  # convert the message into the request object
@@ -357,31 +434,24 @@ def get_totals(request):
         return HttpResponseBadRequest()
 
     try:  # check that the group exists and get it
-        group = Group.objects.get(pk=request.group_uuid)
-        user = User.objects.get(group=group, key=request.user)
+        group, user = await async_views.database(_group_and_user)(request.group_uuid,
+                                                                  request.user)
     except (ValueError, ObjectDoesNotExist):  # ValueError if the uuid is not valid
         return HttpResponseBadRequest()
 
     try:  # verify the signatures
-        message_class.verify(user.key, 'user', request.user_signature,
-                             group_uuid=str(group.uuid), user=user.key, )
+        await async_views.crypto('verify', message_class.submit_verify,
+                                 user.key, 'user', request.user_signature,
+                                 group_uuid=str(group.uuid), user=user.key)
     except InvalidSignature:
         return HttpResponse('401 Unauthorized', status=401)
 
-    # example: {'user1': val1, 'user2': val2}
-    suggested_transactions = {}
-
-    if user.balance < 0:  # filter by borrower
-        for debt in UserDebt.objects.filter(group=group, borrower=user):
-            suggested_transactions[debt.lender.key] = debt.value
-
-    elif user.balance > 0:  # filter by lender
-        for debt in UserDebt.objects.filter(group=group, lender=user):
-            suggested_transactions[debt.borrower.key] = debt.value
+    suggested_transactions = await async_views.database(_suggested_transactions)(group, user)
 
     response = message_class.make_response(group_uuid=str(group.uuid),
                                            user=user.key,
                                            user_balance=user.balance,
-                                           suggested_transactions=suggested_transactions)
+                                           suggested_transactions=suggested_transactions,
+                                           settlement_version=group.settlement_version)
 
     return HttpResponse(response.dumps(), status=200)
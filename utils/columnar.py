@@ -0,0 +1,267 @@
+"""
+Compact columnar files: tables stored column by column, which can be read
+through a memory map without loading or parsing the whole file.
+
+A file starts with a magic string, the length of a JSON header and the header
+itself. The header holds free metadata and, for each table, its number of
+rows and the position of each of its columns in the file. Columns are stored
+8-byte aligned after the header, in one of these formats:
+
+    'b', 'h', 'i', 'q', 'B', 'H', 'I', 'Q': fixed-width integers, as in the
+        'array' module, in the byte order of the machine that wrote the file.
+    '<n>s': byte strings of exactly n bytes, e.g. '16s' for UUIDs.
+    'str': variable length strings, stored as the UTF-8 encoding of all the
+        strings followed by an array of len(rows) + 1 offsets ('Q').
+
+Integer columns are read as memoryviews over the mapped file, so that e.g.
+sum(table['value']) is computed without copying the column.
+"""
+import array
+import json
+import mmap
+import struct
+import sys
+
+MAGIC = b'GBCOLS01'
+_HEADER_LENGTH = struct.Struct('<Q')
+_ALIGNMENT = 8
+
+INTEGER_FORMATS = 'bhiqBHIQ'
+
+
+class FormatError(Exception):
+    """ Raised when a file is not a valid columnar file """
+
+
+def write(path, metadata: dict, tables: dict):
+    """
+    Writes a columnar file.
+
+    :param path:     path of the file to write.
+    :param metadata: JSON serializable metadata stored in the header.
+    :param tables:   dict mapping each table name to a dict that maps each
+                     column name to a (format, values) tuple. Integer values
+                     may be given as an array.array of the column's format.
+    :raise ValueError: if the columns of a table have different lengths or a
+                       format is not supported.
+    """
+    # the positions of the columns are relative to the end of the header, so
+    # that they are known before the header is encoded
+    header = {'metadata': metadata, 'byteorder': sys.byteorder, 'tables': {}}
+    blocks = []
+    position = 0
+
+    for table_name, columns in tables.items():
+        rows = None
+        table_header = header['tables'][table_name] = {'columns': {}}
+
+        for column_name, (column_format, values) in columns.items():
+            data, offsets, length = _encode(column_format, values)
+
+            if rows is not None and length != rows:
+                raise ValueError("column %s.%s has %d rows instead of %d" % (
+                    table_name, column_name, length, rows))
+            rows = length
+
+            column = {'format': column_format, 'data': [position, len(data)]}
+            blocks.append(data)
+            position += _padded(len(data))
+
+            if offsets is not None:
+                column['offsets'] = [position, len(offsets)]
+                blocks.append(offsets)
+                position += _padded(len(offsets))
+
+            table_header['columns'][column_name] = column
+
+        table_header['rows'] = rows or 0
+
+    encoded_header = json.dumps(header).encode()
+    start = _padded(len(MAGIC) + _HEADER_LENGTH.size + len(encoded_header))
+
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(_HEADER_LENGTH.pack(len(encoded_header)))
+        file.write(encoded_header)
+        file.write(bytes(start - file.tell()))
+
+        for block in blocks:
+            file.write(block)
+            file.write(bytes(_padded(len(block)) - len(block)))
+
+
+class ColumnarFile:
+    """
+    Columnar file opened through a memory map. The tables are accessed by
+    name and their columns by name, e.g. file['uomes']['value'].
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            try:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise FormatError("%s is empty" % path)
+
+        try:
+            self._view = memoryview(self._map)
+            self._load_header(path)
+        except BaseException:
+            self.close()
+            raise
+
+    def _load_header(self, path):
+        if self._view[:len(MAGIC)] != MAGIC:
+            raise FormatError("%s is not a columnar file" % path)
+
+        header_start = len(MAGIC) + _HEADER_LENGTH.size
+        if len(self._view) < header_start:
+            raise FormatError("%s is truncated" % path)
+
+        header_length, = _HEADER_LENGTH.unpack_from(self._view, len(MAGIC))
+        if len(self._view) < header_start + header_length:
+            raise FormatError("%s is truncated" % path)
+
+        try:
+            header = json.loads(bytes(self._view[header_start:header_start + header_length]))
+        except ValueError as error:
+            raise FormatError("invalid header: %s" % error)
+
+        if header['byteorder'] != sys.byteorder:
+            raise FormatError("%s was written on a %s-endian machine" % (path, header['byteorder']))
+
+        self.metadata = header['metadata']
+        self._start = _padded(header_start + header_length)
+        self._tables = header['tables']
+
+    def __getitem__(self, table_name) -> 'Table':
+        return Table(self, self._tables[table_name])
+
+    def __contains__(self, table_name):
+        return table_name in self._tables
+
+    def close(self):
+        """
+        Closes the file. Columns obtained from it can not be used afterwards.
+        If some of them are still referenced the map is only closed when they
+        are garbage collected.
+        """
+        if self._map is not None:
+            try:
+                self._view.release()
+                self._map.close()
+            except BufferError:
+                pass
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _block(self, position) -> memoryview:
+        start, length = position
+        if self._start + start + length > len(self._view):
+            raise FormatError("the file is truncated")
+
+        return self._view[self._start + start:self._start + start + length]
+
+
+class Table:
+    """ Table of a columnar file """
+
+    def __init__(self, file: ColumnarFile, header: dict):
+        self._file = file
+        self._columns = header['columns']
+        self.rows = header['rows']
+
+    def __len__(self):
+        return self.rows
+
+    def columns(self) -> list:
+        return list(self._columns)
+
+    def __getitem__(self, column_name):
+        """
+        Returns a column: a memoryview of integers, a sequence of byte strings
+        or a sequence of strings, according to the format of the column.
+        """
+        column = self._columns[column_name]
+        column_format = column['format']
+        data = self._file._block(column['data'])
+
+        if column_format in INTEGER_FORMATS:
+            return data.cast(column_format)
+
+        if column_format == 'str':
+            return StringColumn(data, self._file._block(column['offsets']).cast('Q'))
+
+        return BytesColumn(data, int(column_format[:-1]))
+
+
+class BytesColumn:
+    """ Sequence of the fixed-width byte strings of a column """
+
+    def __init__(self, data: memoryview, width: int):
+        self._data = data
+        self._width = width
+
+    def __len__(self):
+        return len(self._data) // self._width
+
+    def __getitem__(self, index) -> bytes:
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+
+        start = (index % len(self)) * self._width
+        return bytes(self._data[start:start + self._width])
+
+
+class StringColumn:
+    """ Sequence of the variable length strings of a column """
+
+    def __init__(self, data: memoryview, offsets: memoryview):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index) -> str:
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+
+        index %= len(self)
+        return str(self._data[self._offsets[index]:self._offsets[index + 1]], 'utf-8')
+
+
+def _encode(column_format, values) -> (bytes, bytes, int):
+    """ Returns the data, the offsets (or None) and the number of rows of a column """
+    if column_format in INTEGER_FORMATS:
+        if not isinstance(values, array.array) or values.typecode != column_format:
+            values = array.array(column_format, values)
+        return values.tobytes(), None, len(values)
+
+    if column_format == 'str':
+        data = bytearray()
+        offsets = array.array('Q', [0])
+        for value in values:
+            data += value.encode()
+            offsets.append(len(data))
+        return bytes(data), offsets.tobytes(), len(offsets) - 1
+
+    if column_format.endswith('s') and column_format[:-1].isdigit():
+        width = int(column_format[:-1])
+        data = bytearray()
+        for value in values:
+            if len(value) != width:
+                raise ValueError("%r is not %d bytes long" % (value, width))
+            data += value
+        return bytes(data), None, len(data) // width
+
+    raise ValueError("unsupported column format: %s" % column_format)
+
+
+def _padded(length: int) -> int:
+    return -(-length // _ALIGNMENT) * _ALIGNMENT
@@ -1,9 +1,10 @@
-from utils.crypto.rsa import generate_keys
+from utils.crypto.key_pool import get_keys
 
-G1_priv, G1_pub = generate_keys()
-G2_priv, G2_pub = generate_keys()
+# keys are taken from the pre-generated pool, each name always gets the same key
+G1_priv, G1_pub = get_keys(0)
+G2_priv, G2_pub = get_keys(1)
 
-C1_priv, C1_pub = generate_keys()
-C2_priv, C2_pub = generate_keys()
-C3_priv, C3_pub = generate_keys()
-C4_priv, C4_pub = generate_keys()
+C1_priv, C1_pub = get_keys(2)
+C2_priv, C2_pub = get_keys(3)
+C3_priv, C3_pub = get_keys(4)
+C4_priv, C4_pub = get_keys(5)
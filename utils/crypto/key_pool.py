@@ -0,0 +1,141 @@
+"""
+Pool of pre-generated RSA keys for tests and benchmarks.
+
+Generating a 2048-bit key takes tens to hundreds of milliseconds, which
+dominates the run time of the test suites and delays the start of the
+benchmark tools. A key pool generates its keys once, in parallel across
+processes, and keeps them in a JSON fixture file. Key pairs are handed out
+by index, so the same index always gets the same key pair from the same
+fixture file.
+
+The default pool uses the fixture distributed with this module, its path
+can be changed with the GROUP_BANK_KEY_POOL environment variable.
+
+These keys are public, never use them outside tests and benchmarks.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.crypto.rsa import generate_keys
+
+DEFAULT_PATH = os.environ.get(
+    'GROUP_BANK_KEY_POOL',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'keys.json')
+)
+
+
+class KeyPool:
+    """
+    Key pairs persisted in a JSON file as a list of [private key, public
+    key] pairs. Missing keys are generated when they are first requested
+    and appended to the file.
+    """
+
+    def __init__(self, path: str, workers=None):
+        """
+        :param path:    path of the fixture file, created if it does not exist.
+        :param workers: processes used to generate keys, defaults to the
+                        number of CPUs.
+        """
+        self.path = path
+        self.workers = workers
+
+        self._keys = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load())
+
+    def get(self, index: int) -> (str, str):
+        """
+        Returns the key pair at the given index, generating it if needed.
+
+        :return: 2-tuple with the private and public key in string format.
+        """
+        return self.take(1, start=index)[0]
+
+    def take(self, count: int, start=0) -> list:
+        """
+        Returns 'count' consecutive key pairs, starting at index 'start'.
+
+        :return: list of 2-tuples with the private and public keys.
+        """
+        self.ensure(start + count)
+
+        with self._lock:
+            return self._keys[start:start + count]
+
+    def ensure(self, count: int):
+        """ Makes sure the pool holds at least 'count' key pairs """
+        with self._lock:
+            keys = self._load()
+            missing = count - len(keys)
+
+            if missing <= 0:
+                return
+
+            with ProcessPoolExecutor(self.workers) as executor:
+                generated = list(executor.map(_generate_keys, range(missing)))
+
+            # another process may have extended the file in the meantime,
+            # its keys take precedence so that every index keeps its key
+            stored = self._read()
+            if len(stored) > len(keys):
+                keys = stored
+
+            keys.extend(generated[:max(0, count - len(keys))])
+            self._write(keys)
+            self._keys = keys
+
+    def _load(self) -> list:
+        if self._keys is None:
+            self._keys = self._read()
+
+        return self._keys
+
+    def _read(self) -> list:
+        try:
+            with open(self.path) as fixture_file:
+                return [tuple(pair) for pair in json.load(fixture_file)]
+        except FileNotFoundError:
+            return []
+
+    def _write(self, keys: list):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # replace the file atomically, readers never see a partial file
+        tmp_path = "%s.%d.tmp" % (self.path, os.getpid())
+        with open(tmp_path, 'w') as fixture_file:
+            json.dump(keys, fixture_file, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def _generate_keys(index):
+    return generate_keys()
+
+
+#
+# Default pool
+#
+
+_pool = None  # type: KeyPool
+
+
+def get_pool() -> KeyPool:
+    """ Returns the pool backed by the default fixture file """
+    global _pool
+
+    if _pool is None:
+        _pool = KeyPool(DEFAULT_PATH)
+
+    return _pool
+
+
+def get_keys(index: int) -> (str, str):
+    """ Returns the key pair at the given index of the default pool """
+    return get_pool().get(index)
@@ -0,0 +1,172 @@
+"""
+Append-only Merkle trees with the hashes and inclusion proofs of Certificate
+Transparency (RFC 9162, section 2.1).
+
+Only the nodes that are roots of complete subtrees are stored: the node
+(level, index) is the root of the subtree with the leaves from
+index * 2**level to (index + 1) * 2**level - 1. Appending a leaf completes at
+most log(n) nodes, and the root and the inclusion proofs of a tree with n
+leaves are computed from O(log n) nodes: the nodes are read through a
+function given the level and the index of each node, which lets the caller
+keep them anywhere, e.g. in a database.
+"""
+import hashlib
+
+# root of a tree without leaves
+EMPTY_ROOT = hashlib.sha256(b'').digest()
+
+
+def leaf_hash(data: bytes) -> bytes:
+    return hashlib.sha256(b'\x00' + data).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+
+def peaks(size: int) -> list:
+    """
+    Returns the (level, index) of the complete subtrees a tree with 'size'
+    leaves is split into, from left to right. Their roots are all the nodes
+    needed to compute the root of the tree or to append a leaf to it.
+    """
+    result = []
+    start = 0
+    for level in reversed(range(size.bit_length())):
+        if size & (1 << level):
+            result.append((level, start >> level))
+            start += 1 << level
+
+    return result
+
+
+def append(size: int, leaf: bytes, node) -> list:
+    """
+    Appends a leaf to a tree.
+
+    :param size: number of leaves of the tree before the leaf is appended.
+    :param leaf: hash of the leaf.
+    :param node: function returning the hash of a node given its level and index.
+    :return: list with the (level, index, hash) of the nodes completed by the
+             leaf, starting with the leaf itself.
+    """
+    level, index, value = 0, size, leaf
+    completed = [(level, index, value)]
+
+    while index % 2 == 1:
+        value = node_hash(node(level, index - 1), value)
+        level, index = level + 1, index // 2
+        completed.append((level, index, value))
+
+    return completed
+
+
+def root(size: int, node) -> bytes:
+    """
+    Returns the root of a tree.
+
+    :param size: number of leaves of the tree.
+    :param node: function returning the hash of a node given its level and index.
+    """
+    if size == 0:
+        return EMPTY_ROOT
+
+    hashes = [node(level, index) for level, index in peaks(size)]
+
+    value = hashes.pop()
+    while hashes:
+        value = node_hash(hashes.pop(), value)
+
+    return value
+
+
+def proof_nodes(leaf_index: int, size: int) -> list:
+    """
+    Returns the (level, index) of the nodes read by 'inclusion_proof': the
+    peaks of the tree and the siblings of the leaf's ancestors in its peak.
+    """
+    nodes = peaks(size)
+
+    top = next(level for level, index in nodes
+               if index << level <= leaf_index < (index + 1) << level)
+
+    return nodes + [(level, (leaf_index >> level) ^ 1) for level in range(top)]
+
+
+def inclusion_proof(leaf_index: int, size: int, node) -> list:
+    """
+    Returns the inclusion proof of a leaf: the hashes needed to compute the
+    root of the tree from the leaf, from the bottom of the tree up.
+
+    :param leaf_index: index of the leaf.
+    :param size:       number of leaves of the tree.
+    :param node:       function returning the hash of a node given its level and index.
+    :raise IndexError: if the leaf is not in the tree.
+    """
+    if not 0 <= leaf_index < size:
+        raise IndexError("leaf %d is not in a tree of size %d" % (leaf_index, size))
+
+    return _path(leaf_index, 0, size, node)
+
+
+def verify_inclusion(leaf: bytes, leaf_index: int, size: int, proof: list,
+                     tree_root: bytes) -> bool:
+    """
+    Checks the inclusion proof of a leaf against the root of a tree.
+
+    :param leaf:       hash of the leaf.
+    :param leaf_index: index of the leaf.
+    :param size:       number of leaves of the tree.
+    :param proof:      hashes of the inclusion proof.
+    :param tree_root:  root of the tree.
+    :return: True if the leaf is in the tree.
+    """
+    if not 0 <= leaf_index < size:
+        return False
+
+    index, last = leaf_index, size - 1
+    value = leaf
+    for sibling in proof:
+        if last == 0:
+            return False
+
+        if index % 2 == 1 or index == last:
+            value = node_hash(sibling, value)
+            # skip the levels where the node has no right sibling
+            while index % 2 == 0 and index != 0:
+                index, last = index >> 1, last >> 1
+        else:
+            value = node_hash(value, sibling)
+
+        index, last = index >> 1, last >> 1
+
+    return last == 0 and value == tree_root
+
+
+def _split(size: int) -> int:
+    """ Largest power of two smaller than size """
+    return 1 << ((size - 1).bit_length() - 1)
+
+
+def _subtree_root(start: int, size: int, node) -> bytes:
+    if size & (size - 1) == 0:
+        # complete subtree
+        level = size.bit_length() - 1
+        return node(level, start >> level)
+
+    middle = _split(size)
+    return node_hash(_subtree_root(start, middle, node),
+                     _subtree_root(start + middle, size - middle, node))
+
+
+def _path(leaf_index: int, start: int, size: int, node) -> list:
+    if size == 1:
+        return []
+
+    middle = _split(size)
+    if leaf_index < start + middle:
+        return _path(leaf_index, start, middle, node) + \
+               [_subtree_root(start + middle, size - middle, node)]
+
+    return _path(leaf_index, start + middle, size - middle, node) + \
+        [_subtree_root(start, middle, node)]
@@ -0,0 +1,236 @@
+"""
+Worker pool for the cryptographic operations.
+
+Signing and verifying with RSA keys is CPU bound. By default these
+operations run inline, on the thread that requests them. Once the pool is
+configured with one or more workers, the operations are handed over to a
+pool of threads or processes, which allows concurrent requests (and batches
+of signatures) to spread the work across all cores.
+
+The pool is a module level singleton, configured once per process with the
+'configure' function. Users of the pool should call 'run' or 'submit' and
+never care if the pool is enabled or not.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+
+from utils import metrics
+
+THREAD = 'thread'
+PROCESS = 'process'
+
+
+class CryptoPool:
+    """
+    Pool of workers that executes cryptographic operations. Keeps track of
+    the number of operations waiting to complete (queue depth) and of the
+    latency of each operation.
+
+    The underlying executor is only created when the first operation is
+    submitted. Executors do not survive a fork, so if the pool is used by
+    a different process (e.g. a pre-forked WSGI worker) a new executor is
+    created for that process.
+    """
+
+    def __init__(self, workers=None, kind=THREAD):
+        """
+        :param workers: number of workers. Defaults to the number of CPUs.
+        :param kind:    type of workers, either THREAD or PROCESS.
+        :raise ValueError: if the kind of workers is not supported.
+        """
+        if kind not in (THREAD, PROCESS):
+            raise ValueError("unsupported kind of workers: %s" % kind)
+
+        self.workers = workers or os.cpu_count() or 1
+        self.kind = kind
+
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+        self._total_run_time = 0.0
+
+    def submit(self, function, *args) -> Future:
+        """
+        Submits a function to be executed by one of the workers. When the pool
+        uses processes, the function and its arguments must be picklable.
+
+        :param function: function to execute.
+        :param args:     arguments for the function.
+        :return: future holding the result of the function.
+        """
+        future = Future()
+        submitted_at = time.perf_counter()
+
+        def on_done(inner_future):
+            latency = time.perf_counter() - submitted_at
+
+            try:
+                run_time, result = inner_future.result()
+            except BaseException as error:
+                self._record(latency, 0.0, failed=True)
+                future.set_exception(error)
+            else:
+                self._record(latency, run_time, failed=False)
+                future.set_result(result)
+
+        with self._lock:
+            self._submitted += 1
+
+        self._get_executor().submit(_timed_call, function, *args) \
+            .add_done_callback(on_done)
+
+        return future
+
+    def run(self, function, *args):
+        """
+        Executes a function in one of the workers and waits for its result.
+        Exceptions raised by the function are raised again in the caller.
+        """
+        return self.submit(function, *args).result()
+
+    def stats(self) -> dict:
+        """ Returns a snapshot of the queue depth and latency metrics """
+        with self._lock:
+            finished = self._completed + self._failed
+
+            return {
+                'kind': self.kind,
+                'workers': self.workers,
+                'queue_depth': self._submitted - finished,
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'avg_latency': self._total_latency / finished if finished else 0.0,
+                'max_latency': self._max_latency,
+                'avg_run_time': self._total_run_time / finished if finished else 0.0,
+            }
+
+    def shutdown(self, wait=True):
+        """ Stops the workers. The pool can still be used afterwards. """
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=wait)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                if self.kind == THREAD:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+
+            return self._executor
+
+    def _record(self, latency, run_time, failed):
+        with self._lock:
+            if failed:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+            self._total_run_time += run_time
+
+
+def _timed_call(function, *args):
+    """ Calls the function and returns its run time along with the result """
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+#
+# Process wide pool
+#
+
+_pool = None  # type: CryptoPool
+
+
+def configure(workers=0, kind=THREAD):
+    """
+    Configures the pool used by this process. With 0 workers the pool is
+    disabled and operations run inline on the calling thread.
+
+    :param workers: number of workers, 0 disables the pool.
+    :param kind:    type of workers, either THREAD or PROCESS.
+    """
+    global _pool
+
+    if _pool is not None:
+        _pool.shutdown(wait=False)
+
+    _pool = CryptoPool(workers, kind) if workers else None
+
+
+def get_pool() -> CryptoPool:
+    """ Returns the pool used by this process or None if it is disabled """
+    return _pool
+
+
+def run(function, *args):
+    """ Executes the function in the pool, or inline if it is disabled """
+    if _pool is None:
+        return function(*args)
+
+    return _pool.run(function, *args)
+
+
+def submit(function, *args) -> Future:
+    """
+    Submits the function to the pool and returns a future for its result.
+    If the pool is disabled the function is executed immediately and the
+    returned future is already done.
+    """
+    if _pool is not None:
+        return _pool.submit(function, *args)
+
+    future = Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as error:
+        future.set_exception(error)
+
+    return future
+
+
+def stats() -> dict:
+    """ Returns the metrics of the pool or an empty dict if it is disabled """
+    return _pool.stats() if _pool is not None else {}
+
+
+def _collect_metrics():
+    """ Exports the metrics of the pool of this process """
+    pool_stats = stats()
+    if not pool_stats:
+        return []
+
+    queue_depth = metrics.Gauge('crypto_pool_queue_depth',
+                                'Operations submitted to the crypto pool and not finished')
+    queue_depth.set(pool_stats['queue_depth'])
+
+    operations = metrics.Counter('crypto_pool_operations',
+                                 'Operations finished by the crypto pool', ('result',))
+    operations.inc(pool_stats['completed'], result='completed')
+    operations.inc(pool_stats['failed'], result='failed')
+
+    latency = metrics.Gauge('crypto_pool_latency_seconds',
+                            'Latency of the operations of the crypto pool', ('stat',))
+    latency.set(pool_stats['avg_latency'], stat='avg')
+    latency.set(pool_stats['max_latency'], stat='max')
+
+    return [queue_depth, operations, latency]
+
+
+metrics.register_collector(_collect_metrics)
@@ -1,5 +1,7 @@
 import base64
 import binascii  # for the binascii.Error exception
+import struct
+import threading
 
 from cryptography import exceptions
 from cryptography.hazmat.backends import default_backend
@@ -7,6 +9,7 @@ from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import utils
 
 # cryptography suggests this value for
 # the public exponent, stating that "65537 should almost always be used"
@@ -106,46 +109,108 @@ def dump_pubkey(pubkey: str, key_filepath):
         key_file.write(_str_to_pem(pubkey, _PUBLIC_BEGIN_TAG, _PUBLIC_END_TAG))
 
 
-def sign(key: str, *values: str) -> str:
-    # TODO: *values is a list but the function does not receive a list
+_PADDING = padding.PSS(
+    mgf=padding.MGF1(hashes.SHA256()),
+    salt_length=padding.PSS.MAX_LENGTH
+)
+
+
+# each value of the signed data is prefixed by its length in bytes, so that
+# different sequences of values never have the same encoding
+_LENGTH = struct.Struct('>I')
+
+# buffer reused by each thread to encode the values it signs
+_buffers = threading.local()
+
+
+def encode_into(buffer: bytearray, values):
+    """
+    Appends the canonical encoding of a sequence of values to a buffer. Each
+    value is converted to string and encoded in UTF-8 (bytes are kept as they
+    are) and is prefixed by its length as a 4-byte big-endian integer. Values
+    given as iterators of chunks are written chunk by chunk, their length is
+    filled in after the last chunk.
+
+    :param buffer: buffer to write the encoding to.
+    :param values: values to encode.
     """
-    Signs a list of values with the given key.
+    for value in values:
+        start = len(buffer)
+        buffer += bytes(_LENGTH.size)  # the length is filled in below
 
-    :param key:     private key used to sign the values.
-    :param values:  list of values to sign.
-    :return: signature encoded in base 64.
+        if hasattr(value, '__next__'):
+            for chunk in value:
+                buffer += chunk if isinstance(chunk, bytes) else chunk.encode()
+        elif isinstance(value, bytes):
+            buffer += value
+        else:
+            buffer += str(value).encode()
+
+        _LENGTH.pack_into(buffer, start, len(buffer) - start - _LENGTH.size)
+
+
+def encode(values) -> bytes:
+    """ Returns the canonical encoding of a sequence of values """
+    buffer = bytearray()
+    encode_into(buffer, values)
+    return bytes(buffer)
+
+
+def digest(chunks) -> bytes:
     """
-    key_object = _str_to_key(key)  # type: rsa.RSAPrivateKey
+    Computes the SHA-256 digest of a sequence of chunks. The chunks are fed
+    to the hash one at a time, they are never joined in memory.
 
-    signer = key_object.signer(
-        padding.PSS(
-            mgf=padding.MGF1(hashes.SHA256()),
-            salt_length=padding.PSS.MAX_LENGTH
-        ),
-        hashes.SHA256()
-    )
+    :param chunks: iterable of chunks in bytes or string format.
+    :return: digest of the concatenation of all chunks.
+    """
+    hash_object = hashes.Hash(hashes.SHA256(), backend=default_backend())
 
-    to_sign = ""
-    for value in values:
-        to_sign += str(value)
+    for chunk in chunks:
+        hash_object.update(chunk.encode() if isinstance(chunk, str) else chunk)
+
+    return hash_object.finalize()
+
+
+def digest_values(values) -> bytes:
+    """
+    Computes the SHA-256 digest of the canonical encoding of a sequence of
+    values (see 'encode_into'). This is the digest signed by 'sign'.
+    """
+    buffer = getattr(_buffers, 'buffer', None)
+    if buffer is None:
+        buffer = _buffers.buffer = bytearray()
+
+    try:
+        encode_into(buffer, values)
+        return digest([buffer])
+    finally:
+        del buffer[:]
+
+
+def sign_digest(key: str, data_digest: bytes) -> str:
+    """
+    Signs data given its SHA-256 digest (see the 'digest' function).
+
+    :param key:         private key used to sign the data.
+    :param data_digest: SHA-256 digest of the data.
+    :return: signature encoded in base 64.
+    """
+    key_object = _str_to_key(key)  # type: rsa.RSAPrivateKey
 
-    signer.update(to_sign.encode())
-    signature = signer.finalize()
+    signature = key_object.sign(data_digest, _PADDING,
+                                utils.Prehashed(hashes.SHA256()))
 
     return base64.b64encode(signature).decode()
 
 
-def verify(pubkey: str, signature: str, *values: str):
-    # TODO: *values is a list but the function does not receive a list
+def verify_digest(pubkey: str, signature: str, data_digest: bytes):
     """
-    Verifies if a signature is valid. Expects the list of values included in
-    the signature to be in the same order as they were signed. If the
-    verification fails it raises an InvalidSignature exception.
+    Verifies a signature of data given the SHA-256 digest of the data.
 
     :param pubkey:      public key used to verify the signature.
     :param signature:   signature to verify encoded in base 64.
-    :param values:      values included in the signature.
-    :return:
+    :param data_digest: SHA-256 digest of the data.
     :raise InvalidSignature: if the signature is invalid.
     """
     # The signature is expected in base 64 and must be decoded
@@ -156,30 +221,46 @@ def verify(pubkey: str, signature: str, *values: str):
         # hides the cryptographic library used
         raise InvalidSignature()
 
-
     pubkey_object = _str_to_pubkey(pubkey)  # type: rsa.RSAPublicKey
 
     # Padding is done using the recommended PSS scheme and not
     # legacy PKCS1v15
-    verifier = pubkey_object.verifier(
-        signature,
-        padding.PSS(
-            mgf=padding.MGF1(hashes.SHA256()),
-            salt_length=padding.PSS.MAX_LENGTH
-        ),
-        hashes.SHA256()
-    )
-
-    verifier.update("".join(values).encode())
-
     try:
-        verifier.verify()
+        pubkey_object.verify(signature, data_digest, _PADDING,
+                             utils.Prehashed(hashes.SHA256()))
     except exceptions.InvalidSignature:
         # raise custom invalid signature exception
         # hides the cryptographic library used
         raise InvalidSignature()
 
 
+def sign(key: str, *values: str) -> str:
+    """
+    Signs a list of values with the given key. The values are converted to
+    strings and signed in their canonical encoding (see 'encode_into').
+
+    :param key:     private key used to sign the values.
+    :param values:  list of values to sign.
+    :return: signature encoded in base 64.
+    """
+    return sign_digest(key, digest_values(values))
+
+
+def verify(pubkey: str, signature: str, *values: str):
+    """
+    Verifies if a signature is valid. Expects the list of values included in
+    the signature to be in the same order as they were signed. If the
+    verification fails it raises an InvalidSignature exception.
+
+    :param pubkey:      public key used to verify the signature.
+    :param signature:   signature to verify encoded in base 64.
+    :param values:      values included in the signature.
+    :return:
+    :raise InvalidSignature: if the signature is invalid.
+    """
+    verify_digest(pubkey, signature, digest_values(values))
+
+
 #
 # Private functions
 #
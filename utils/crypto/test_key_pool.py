@@ -0,0 +1,45 @@
+import json
+
+from pytest import fixture
+
+from utils.crypto import key_pool as kp
+from utils.crypto.key_pool import KeyPool
+from utils.crypto.rsa import sign, verify
+
+
+class TestKeyPool:
+
+    @fixture
+    def fixture_path(self, tmpdir):
+        path = tmpdir.join("keys.json")
+        path.write(json.dumps([["p1", "k1"], ["p2", "k2"], ["p3", "k3"]]))
+        return str(path)
+
+    def test_take_KeysInFixture_ReturnsThemInOrder(self, fixture_path):
+        pool = KeyPool(fixture_path)
+
+        assert pool.take(2, start=1) == [("p2", "k2"), ("p3", "k3")]
+        assert pool.get(0) == ("p1", "k1")
+
+    def test_take_MissingKeys_GeneratesAndPersistsThem(self, fixture_path):
+        pool = KeyPool(fixture_path, workers=2)
+
+        keys = pool.take(2, start=3)
+
+        stored = KeyPool(fixture_path)
+        assert len(stored) == 5
+        assert stored.take(2, start=3) == keys
+
+        key, pubkey = keys[0]
+        verify(pubkey, sign(key, "data"), "data")
+
+    def test_ensure_FixtureDoesNotExist_CreatesIt(self, tmpdir):
+        path = tmpdir.join("new", "keys.json")
+
+        KeyPool(str(path), workers=1).ensure(1)
+
+        assert len(json.loads(path.read())) == 1
+
+    def test_default_pool_SameIndex_AlwaysTheSameKey(self):
+        assert kp.get_keys(2) == kp.get_pool().get(2)
+        assert kp.get_keys(2) != kp.get_keys(3)
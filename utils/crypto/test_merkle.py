@@ -0,0 +1,89 @@
+import pytest
+from pytest import raises
+
+from utils.crypto import merkle
+
+
+def reference_root(leaves: list) -> bytes:
+    """ Root of a tree computed from all its leaves, as defined by RFC 9162 """
+    if not leaves:
+        return merkle.EMPTY_ROOT
+    if len(leaves) == 1:
+        return leaves[0]
+
+    middle = merkle._split(len(leaves))
+    return merkle.node_hash(reference_root(leaves[:middle]), reference_root(leaves[middle:]))
+
+
+def build(size: int):
+    """ Appends 'size' leaves to a tree and returns the leaves and the stored nodes """
+    leaves = [merkle.leaf_hash(b'uome %d' % i) for i in range(size)]
+    nodes = {}
+
+    for index, leaf in enumerate(leaves):
+        for level, node_index, value in merkle.append(index, leaf, lambda *key: nodes[key]):
+            nodes[level, node_index] = value
+
+    return leaves, nodes
+
+
+class TestMerkle:
+
+    def test_EmptyTree_RootIsTheHashOfNothing(self):
+        assert merkle.root(0, lambda *key: None) == merkle.EMPTY_ROOT
+
+    @pytest.mark.parametrize("size", (1, 2, 3, 5, 8, 13))
+    def test_AppendedLeaves_RootIsTheRootOfAllTheLeaves(self, size):
+        leaves, nodes = build(size)
+
+        assert merkle.root(size, lambda *key: nodes[key]) == reference_root(leaves)
+
+    def test_Peaks_AreTheCompleteSubtreesOfTheTree(self):
+        assert merkle.peaks(13) == [(3, 0), (2, 2), (0, 12)]
+
+    def test_AppendingALeaf_OnlyReadsThePeaksOfTheTree(self):
+        leaves, nodes = build(7)
+        read = []
+
+        merkle.append(7, merkle.leaf_hash(b'new'), lambda *key: read.append(key) or nodes[key])
+
+        assert set(read) <= set(merkle.peaks(7))
+
+    @pytest.mark.parametrize("size", (1, 2, 3, 6, 7, 16, 21))
+    def test_InclusionProofOfEveryLeaf_IsVerified(self, size):
+        leaves, nodes = build(size)
+        tree_root = merkle.root(size, lambda *key: nodes[key])
+
+        for index, leaf in enumerate(leaves):
+            proof = merkle.inclusion_proof(index, size, lambda *key: nodes[key])
+
+            assert merkle.verify_inclusion(leaf, index, size, proof, tree_root)
+
+    def test_InclusionProof_OnlyReadsTheProofNodes(self):
+        leaves, nodes = build(21)
+        read = set()
+
+        merkle.inclusion_proof(9, 21, lambda *key: read.add(key) or nodes[key])
+
+        assert read <= set(merkle.proof_nodes(9, 21))
+
+    def test_InclusionProof_IsLogarithmic(self):
+        leaves, nodes = build(1000)
+
+        assert len(merkle.inclusion_proof(500, 1000, lambda *key: nodes[key])) == 10
+
+    def test_InclusionProofOfAnotherLeaf_IsNotVerified(self):
+        leaves, nodes = build(6)
+        tree_root = merkle.root(6, lambda *key: nodes[key])
+        proof = merkle.inclusion_proof(2, 6, lambda *key: nodes[key])
+
+        assert not merkle.verify_inclusion(leaves[3], 2, 6, proof, tree_root)
+        assert not merkle.verify_inclusion(leaves[2], 3, 6, proof, tree_root)
+        assert not merkle.verify_inclusion(leaves[2], 2, 6, proof[:-1], tree_root)
+        assert not merkle.verify_inclusion(leaves[2], 2, 6, proof[::-1], tree_root)
+
+    def test_InclusionProofOfLeafOutsideTheTree_RaisesIndexError(self):
+        leaves, nodes = build(3)
+
+        with raises(IndexError):
+            merkle.inclusion_proof(3, 3, lambda *key: nodes[key])
@@ -0,0 +1,72 @@
+from pytest import fixture
+from pytest import raises
+
+from utils.crypto import pool
+from utils.crypto import rsa
+from utils.messages.testing_utils import example_key, example_pub_key
+
+
+class TestCryptoPool:
+
+    @fixture
+    def thread_pool(self):
+        crypto_pool = pool.CryptoPool(workers=2, kind=pool.THREAD)
+        yield crypto_pool
+        crypto_pool.shutdown()
+
+    @fixture
+    def configured_pool(self):
+        pool.configure(workers=2, kind=pool.THREAD)
+        yield pool.get_pool()
+        pool.configure(workers=0)
+
+    def test_init_UnsupportedKind_RaisesValueError(self):
+        with raises(ValueError):
+            pool.CryptoPool(workers=1, kind='fiber')
+
+    def test_run_SignAndVerifyInThreads_SignatureIsValid(self, thread_pool):
+        signature = thread_pool.run(rsa.sign, example_key, "some text")
+
+        thread_pool.run(rsa.verify, example_pub_key, signature, "some text")
+
+    def test_run_InvalidSignature_RaisesInvalidSignatureInCaller(self, thread_pool):
+        with raises(rsa.InvalidSignature):
+            thread_pool.run(rsa.verify, example_pub_key, "bogus", "some text")
+
+    def test_stats_AfterOneSuccessAndOneFailure_CountsBoth(self, thread_pool):
+        thread_pool.run(rsa.sign, example_key, "some text")
+
+        with raises(rsa.InvalidSignature):
+            thread_pool.run(rsa.verify, example_pub_key, "bogus", "some text")
+
+        stats = thread_pool.stats()
+        assert stats['submitted'] == 2
+        assert stats['completed'] == 1
+        assert stats['failed'] == 1
+        assert stats['queue_depth'] == 0
+        assert stats['max_latency'] > 0
+
+    def test_submit_ManySignatures_AllResultsAreReturned(self, thread_pool):
+        futures = [thread_pool.submit(rsa.sign, example_key, str(i)) for i in range(8)]
+
+        for i, future in enumerate(futures):
+            rsa.verify(example_pub_key, future.result(), str(i))
+
+    def test_run_PoolIsDisabled_RunsInline(self):
+        pool.configure(workers=0)
+
+        assert pool.get_pool() is None
+        assert pool.run(str.upper, "abc") == "ABC"
+        assert pool.submit(str.upper, "abc").result() == "ABC"
+        assert pool.stats() == {}
+
+    def test_configure_PoolIsEnabled_MessagesAreSignedInThePool(self, configured_pool):
+        from utils.messages.message_formats import RegisterGroup
+
+        signature = RegisterGroup.sign(example_key, 'group', group_name="name",
+                                       group_key=example_pub_key)
+        RegisterGroup.submit_verify(example_pub_key, 'group', signature,
+                                    group_name="name",
+                                    group_key=example_pub_key).result()
+
+        assert configured_pool.stats()['completed'] == 2
@@ -38,6 +38,27 @@ class TestRSA:
             valid_signature = rsa.sign(key_1, plain_text)
             rsa.verify(pubkey_2, valid_signature, plain_text)
 
+    def test_SigningValues_VerifiesAsTheirDigest(self):
+        key, pubkey = rsa.generate_keys()
+
+        signature = rsa.sign(key, "some", 10)
+        rsa.verify_digest(pubkey, signature, rsa.digest_values(["some", "10"]))
+
+        with raises(rsa.InvalidSignature):
+            rsa.verify_digest(pubkey, signature, rsa.digest_values(["some", "11"]))
+
+    def test_SigningValues_DoesNotVerifyForTheSameTextSplitDifferently(self):
+        key, pubkey = rsa.generate_keys()
+
+        signature = rsa.sign(key, "ab", "c")
+
+        with raises(rsa.InvalidSignature):
+            rsa.verify(pubkey, signature, "a", "bc")
+
+    def test_Encode_PrefixesEachValueWithItsLength(self):
+        assert rsa.encode(["ab", 7, b"", iter(["x", b"yz"])]) == \
+            b"\0\0\0\2ab" b"\0\0\0\x017" b"\0\0\0\0" b"\0\0\0\3xyz"
+
     def test_DumpingAPrivateKeyAndLoadingTheRespectiveReturnsTheSameKey(self, tmpfile):
         key, pubkey = rsa.generate_keys()
 
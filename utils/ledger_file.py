@@ -0,0 +1,191 @@
+"""
+Append-only ledger files: one file per group with a record for each accepted
+UOMe, that can be replayed through a memory map much faster than the rows of
+a database can be read.
+
+Each record is framed by its length and the CRC-32 of its content, both
+4-byte little-endian integers. The content is the fixed-width part of the
+entry ('<QqI16sHHH': ledger index, accept time in microseconds since
+1970-01-01 UTC, value, UOMe uuid and the lengths of the strings) followed by
+the UTF-8 encoded lender key, borrower key and description.
+
+Records are written with a single write to a file opened in append mode, so
+that processes appending to the same file do not interleave their records.
+A crash may still leave a torn record at the end of a file: reading stops at
+the first record that is incomplete or fails its checksum, and 'truncate'
+removes it. A writer truncates each file when it first opens it, so that no
+record is appended after a torn one.
+"""
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import namedtuple
+
+_FRAME = struct.Struct('<II')
+_FIXED = struct.Struct('<QqI16sHHH')
+
+Entry = namedtuple('Entry', ['ledger_index', 'accepted_at', 'value', 'uome_uuid',
+                             'lender', 'borrower', 'description'])
+
+
+def encode(entry: Entry) -> bytes:
+    """ Returns the framed record of an entry """
+    lender, borrower, description = (entry.lender.encode(), entry.borrower.encode(),
+                                     entry.description.encode())
+
+    content = _FIXED.pack(entry.ledger_index, entry.accepted_at, entry.value, entry.uome_uuid,
+                          len(lender), len(borrower), len(description)) \
+        + lender + borrower + description
+
+    return _FRAME.pack(len(content), zlib.crc32(content)) + content
+
+
+class LedgerReader:
+    """
+    Reads the entries of a ledger file through a memory map. After the
+    entries were iterated, 'end' is the size of the valid part of the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.end = 0
+
+    def __iter__(self):
+        with open(self.path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield from self._entries(data)
+
+    def _entries(self, data):
+        position = 0
+        size = len(data)
+
+        while position + _FRAME.size <= size:
+            length, checksum = _FRAME.unpack_from(data, position)
+            start = position + _FRAME.size
+            if start + length > size or length < _FIXED.size:
+                break
+
+            content = data[start:start + length]
+            if zlib.crc32(content) != checksum:
+                break
+
+            ledger_index, accepted_at, value, uome_uuid, lender_length, borrower_length, \
+                description_length = _FIXED.unpack_from(content)
+
+            borrower_start = _FIXED.size + lender_length
+            description_start = borrower_start + borrower_length
+            yield Entry(ledger_index, accepted_at, value, uome_uuid,
+                        content[_FIXED.size:borrower_start].decode(),
+                        content[borrower_start:description_start].decode(),
+                        content[description_start:description_start + description_length].decode())
+
+            position = self.end = start + length
+
+
+def truncate(path) -> int:
+    """
+    Removes the torn record left at the end of a ledger file by a crash, if
+    there is one.
+
+    :return: number of bytes removed.
+    """
+    reader = LedgerReader(path)
+    for _ in reader:
+        pass
+
+    size = os.path.getsize(path)
+    if reader.end < size:
+        os.truncate(path, reader.end)
+
+    return size - reader.end
+
+
+class LedgerWriter:
+    """
+    Appends entries to the ledger files of a directory. The files are synced
+    to disk in batches: at most every 'fsync_interval' seconds by a
+    background thread, or after every entry if the interval is 0.
+    """
+
+    def __init__(self, directory, fsync_interval=0.1):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+
+        self._files = {}  # name -> file descriptor
+        self._dirty = set()
+        self._lock = threading.Lock()
+        # held while syncing and closing, so that no closed descriptor is synced
+        self._sync_lock = threading.Lock()
+        self._flusher = None  # (thread, event stopping it)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name + '.ledger')
+
+    def append(self, name: str, entry: Entry):
+        """ Appends an entry to the ledger file with the given name """
+        record = encode(entry)
+
+        with self._lock:
+            descriptor = self._files.get(name)
+            if descriptor is None:
+                # remove the torn record a crash may have left
+                if os.path.exists(self.path(name)):
+                    truncate(self.path(name))
+
+                descriptor = os.open(self.path(name), os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                                     0o640)
+                self._files[name] = descriptor
+
+            os.write(descriptor, record)
+
+            if self.fsync_interval > 0:
+                self._dirty.add(descriptor)
+                if self._flusher is None:
+                    stopped = threading.Event()
+                    thread = threading.Thread(target=self._flush_periodically, args=(stopped,),
+                                              name='ledger-fsync', daemon=True)
+                    self._flusher = thread, stopped
+                    thread.start()
+                return
+
+        with self._sync_lock:
+            # unless the file was closed meanwhile, which synced it
+            if self._files.get(name) == descriptor:
+                os.fsync(descriptor)
+
+    def flush(self):
+        """ Syncs the files appended to since the last flush """
+        with self._sync_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+
+            for descriptor in dirty:
+                os.fsync(descriptor)
+
+    def close(self):
+        """ Stops the background thread, syncs and closes every file """
+        with self._lock:
+            flusher, self._flusher = self._flusher, None
+
+        if flusher is not None:
+            thread, stopped = flusher
+            stopped.set()
+            thread.join()
+
+        with self._sync_lock:
+            with self._lock:
+                files, self._files = self._files, {}
+                self._dirty = set()
+
+            for descriptor in files.values():
+                os.fsync(descriptor)
+                os.close(descriptor)
+
+    def _flush_periodically(self, stopped: threading.Event):
+        while not stopped.wait(self.fsync_interval):
+            self.flush()
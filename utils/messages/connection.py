@@ -1,4 +1,7 @@
 import http.client as http
+import threading
+import zlib
+from contextlib import contextmanager
 from urllib.parse import urlencode
 
 from utils.messages.message import Message
@@ -44,11 +47,108 @@ error_exception = {
 }
 
 
+# Content codings accepted in the responses, decoded by 'read_body'
+ACCEPT_ENCODING = "gzip, deflate"
+
+# errors of a connection closed by the server before it sent any response bytes
+_CLOSED_CONNECTION_ERRORS = (http.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+def read_body(http_response) -> bytes:
+    """
+    Reads the body of an HTTP response and decodes it according to its
+    Content-Encoding header.
+
+    :raise UnknownError: if the content coding is not supported or the body
+                         can not be decoded.
+    """
+    body = http_response.read()
+    encoding = (http_response.getheader('Content-Encoding') or 'identity').strip().lower()
+
+    if encoding == 'identity':
+        return body
+
+    if encoding not in ('gzip', 'deflate'):
+        raise UnknownError("unsupported content encoding: %s" % encoding)
+
+    try:
+        # +32 detects the gzip or zlib header
+        return zlib.decompress(body, zlib.MAX_WBITS | 32)
+    except zlib.error as error:
+        raise UnknownError("invalid %s body: %s" % (encoding, error))
+
+
 def connect(server_url):
     """ Entry method to connect to a server using an URL """
     return Connection(server_url, http.HTTPConnection(server_url))
 
 
+class ConnectionPool:
+    """
+    Keeps idle HTTP connections to a server open so that following requests
+    reuse them instead of establishing a new connection each time.
+    """
+
+    def __init__(self, server_url, size=4, timeout=None):
+        """
+        :param server_url: URL of the HTTP server in the format "address:port"
+        :param size:       maximum number of idle connections kept open.
+        :param timeout:    timeout in seconds of the blocking operations.
+        """
+        self.server_url = server_url
+        self.size = size
+        self.timeout = timeout
+
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connect(self):
+        """
+        Provides a connection to the server. The connection is returned to
+        the pool at the end of the 'with' block, unless an error occurred.
+        Connections must be used to make a request and get its response.
+        """
+        with self._lock:
+            http_connection = self._idle.pop() if self._idle else None
+
+        reconnect = None
+        if http_connection is None:
+            http_connection = self._new_connection()
+        else:
+            # the server may have closed the idle connection in the meantime
+            def reconnect():
+                nonlocal http_connection
+                http_connection = self._new_connection()
+                return http_connection
+
+        try:
+            yield Connection(self.server_url, http_connection, reconnect)
+        except BaseException:
+            # the connection may be in an inconsistent state
+            http_connection.close()
+            raise
+
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(http_connection)
+                http_connection = None
+
+        if http_connection is not None:
+            http_connection.close()
+
+    def _new_connection(self) -> http.HTTPConnection:
+        return http.HTTPConnection(self.server_url, timeout=self.timeout)
+
+    def close(self):
+        """ Closes every idle connection """
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        for http_connection in idle:
+            http_connection.close()
+
+
 class Connection:
     """
     Abstraction of an HTTP or HTTPS connection which supports our own request
@@ -59,7 +159,7 @@ class Connection:
     Might seem silly, but this separation facilitates testing.
     """
 
-    def __init__(self, server_url, http_connection: http.HTTPConnection):
+    def __init__(self, server_url, http_connection: http.HTTPConnection, reconnect=None):
         """
         THIS INITIALIZER SHOULD NOT BE USED - use the 'connect' function instead
 
@@ -70,9 +170,15 @@ class Connection:
         :param server_url: URL of the HTTP server to connect to in the format
                            "address:port"
         :param http_connection: established HTTP connection with the server
+        :param reconnect: for a reused connection, function returning a new
+                          HTTP connection on which an idempotent request is
+                          sent again once if the server closed the connection
+                          before responding.
         """
         self.server_url = server_url
         self._http_connection = http_connection
+        self._reconnect = reconnect
+        self._request = None
 
     def close(self):
         """
@@ -108,8 +214,17 @@ class Connection:
 
         :param request: request to be issued.
         """
+        self._request = request
+
+        try:
+            self._send(request)
+        except _CLOSED_CONNECTION_ERRORS as error:
+            self._retry(error)
+
+    def _send(self, request: Message):
         headers = {"Content-type": "application/x-www-form-urlencoded",
-                   "Accept": "text/plain"}
+                   "Accept": "text/plain",
+                   "Accept-Encoding": ACCEPT_ENCODING}
 
         self._http_connection.request(
             method='POST',
@@ -118,6 +233,20 @@ class Connection:
             headers=headers
         )
 
+    def _retry(self, error: Exception):
+        """
+        Sends the last request again on a new connection if the connection
+        was reused and the request is idempotent, otherwise raises the error
+        of the closed connection: the server may have handled the request.
+        """
+        if self._reconnect is None or not self._request.idempotent:
+            raise error
+
+        reconnect, self._reconnect = self._reconnect, None
+        self._http_connection.close()
+        self._http_connection = reconnect()
+        self._send(self._request)
+
     def get_response(self, response_type: Message):
         """
         Waits for a response to a request. The expected type of the request
@@ -129,12 +258,19 @@ class Connection:
         :param response_type: type for the expected response
         :return: response message from the server.
         """
-        http_response = self._http_connection.getresponse()
+        try:
+            http_response = self._http_connection.getresponse()
+        except _CLOSED_CONNECTION_ERRORS as error:
+            self._retry(error)
+            http_response = self._http_connection.getresponse()
+
+        # a response was received: the request must not be sent again
+        self._reconnect = None
         status = http_response.status
 
         if status == 200 or status == 201 or status == 202:
             # request was successful
-            body = http_response.read().decode()
+            body = read_body(http_response).decode()
             return response_type.load_response(body)
 
         else:
@@ -144,5 +280,5 @@ class Connection:
                 # unknown status code
                 exception = UnknownError
 
-            error_message = http_response.read()
+            error_message = read_body(http_response)
             raise exception(error_message)
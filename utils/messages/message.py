@@ -1,6 +1,14 @@
 import json
+from concurrent.futures import Future
+from operator import itemgetter
 
-from utils.crypto.rsa import sign, verify
+from utils import metrics, timing
+from utils.crypto import pool
+from utils.crypto.rsa import digest_values, sign, sign_digest, verify, InvalidSignature
+
+_signature_failures = metrics.counter('signature_failures',
+                                      'Signatures that failed verification',
+                                      labels=('message', 'signature'))
 
 
 class DecodeError(Exception):
@@ -33,6 +41,9 @@ class Message:
     request_params = None  # type: {str: type}
     response_params = None  # type: {str: type}
     signature_formats = None  # type: {str: [str]}
+    # whether the server handles the request twice as once, so that it can
+    # be sent again when the response was lost
+    idempotent = False
 
     @classmethod
     def _check_class(cls):
@@ -103,6 +114,7 @@ class Message:
         return cls('response', **given_parameters)
 
     @classmethod
+    @timing.timed('decode')
     def load(cls, message_type, request_body: str):
         """
         Loads a request from a JSON string. All subclasses must implement
@@ -170,22 +182,49 @@ class Message:
         return json.dumps(parameters)
 
     @classmethod
-    def _order_signature_parameters(cls, signature_name, **parameters):
-        # raises KeyError if the signature_name isn't found in the Message sub-class
-        signature_format = cls.signature_formats[signature_name]
+    def _signature_getter(cls, signature_name):
+        """
+        Returns the function that extracts the values of a signature from the
+        parameters, in the order of its format. Getters are compiled once per
+        signature format of each sub-class.
+        """
+        getters = cls.__dict__.get('_signature_getters')
+        if getters is None:
+            getters = {}
+            cls._signature_getters = getters
 
-        # make a list with all the parameters in the correct order
-        signature_values = []
-        for parameter_name in signature_format:
-            # TODO: check types, maybe?
-            try:
-                parameter = parameters[parameter_name]
-                signature_values.append(str(parameter))
-            except KeyError:
-                error_msg = "missing parameter '%s' required for '%s' signature"
-                raise AttributeError(error_msg % (parameter_name, signature_name))
+        try:
+            return getters[signature_name]
+        except KeyError:
+            # raises KeyError if the signature_name isn't found in the Message sub-class
+            signature_format = cls.signature_formats[signature_name]
+
+            if len(signature_format) == 1:
+                name = signature_format[0]
+                getter = lambda parameters: (parameters[name],)
+            elif signature_format:
+                getter = itemgetter(*signature_format)
+            else:
+                getter = lambda parameters: ()
 
-        return signature_values
+            getters[signature_name] = getter
+            return getter
+
+    @classmethod
+    def _signature_values(cls, signature_name, parameters) -> tuple:
+        try:
+            return cls._signature_getter(signature_name)(parameters)
+        except KeyError as error:
+            if signature_name not in cls.signature_formats:
+                raise
+
+            error_msg = "missing parameter '%s' required for '%s' signature"
+            raise AttributeError(error_msg % (error.args[0], signature_name))
+
+    @classmethod
+    def _order_signature_parameters(cls, signature_name, **parameters):
+        # make a list with all the parameters in the correct order
+        return [str(value) for value in cls._signature_values(signature_name, parameters)]
 
     @classmethod
     def sign(cls, key, signature_name, **parameters):
@@ -205,7 +244,25 @@ class Message:
         """
         signature_values = cls._order_signature_parameters(signature_name, **parameters)
 
-        return sign(key, *signature_values)
+        with timing.phase('sign'):
+            return pool.run(sign, key, *signature_values)
+
+    @classmethod
+    def sign_chunks(cls, key, signature_name, **parameters):
+        """
+        Same as sign() but parameters may also be given as iterators of
+        string chunks, such as the output of json.JSONEncoder.iterencode(),
+        which are encoded as they are produced instead of being joined first.
+        Produces the same signature as sign() with the joined values.
+
+        :raises KeyError: signature_name is not the name of a signature for this class
+        :raises AttributeError: at least one signature parameter was not given
+        """
+        signature_values = cls._signature_values(signature_name, parameters)
+
+        with timing.phase('sign'):
+            # only the digest crosses to the crypto pool
+            return pool.run(sign_digest, key, digest_values(signature_values))
 
     @classmethod
     def verify(cls, key, signature_name, signature, **parameters):
@@ -227,7 +284,40 @@ class Message:
         """
         signature_values = cls._order_signature_parameters(signature_name, **parameters)
 
-        verify(key, signature, *signature_values)
+        with timing.phase('verify'):
+            try:
+                pool.run(verify, key, signature, *signature_values)
+            except InvalidSignature:
+                _signature_failures.inc(message=cls.__name__, signature=signature_name)
+                raise
+
+    @classmethod
+    def submit_sign(cls, key, signature_name, **parameters) -> Future:
+        """
+        Same as sign_chunks() but does not wait for the signature. Returns a
+        future holding the signature instead. The values are hashed by the
+        caller, only the digest is submitted to the crypto pool.
+        """
+        signature_values = cls._signature_values(signature_name, parameters)
+
+        return pool.submit(sign_digest, key, digest_values(signature_values))
+
+    @classmethod
+    def submit_verify(cls, key, signature_name, signature, **parameters) -> Future:
+        """
+        Same as verify() but does not wait for the verification. Returns a
+        future instead, calling its result() method raises InvalidSignature
+        if the signature is invalid.
+        """
+        signature_values = cls._order_signature_parameters(signature_name, **parameters)
+
+        def count_failure(future):
+            if isinstance(future.exception(), InvalidSignature):
+                _signature_failures.inc(message=cls.__name__, signature=signature_name)
+
+        future = pool.submit(verify, key, signature, *signature_values)
+        future.add_done_callback(count_failure)
+        return future
 
     def __str__(self):
         return self.message_type + str(self.__dict__)
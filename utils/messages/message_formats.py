@@ -106,6 +106,61 @@ class ConfirmJoin(Message):
     }
 
 
+class EmailKeyMap(Message):
+    """
+    Sent to the Group server by a confirmed user to get the e-mail and key of every
+    confirmed user of the group, so that the client can translate keys into names.
+    Each member is a [email, key] pair. The cursor identifies the version of the
+    map and can be used to get only the newer members with EmailKeyMapDelta.
+    """
+
+    url = "email-key-map"
+    idempotent = True
+
+    request_params = {
+        'group_uuid': str,
+        'user': str,
+        'request_type': str,
+        'signature': str
+    }
+
+    response_params = {
+        'members': list,
+        'cursor': int
+    }
+
+    signature_formats = {
+        'user': ['group_uuid', 'request_type'],
+    }
+
+
+class EmailKeyMapDelta(Message):
+    """
+    Same as EmailKeyMap but only returns the members confirmed after the given
+    cursor, which is the cursor returned by a previous key map request.
+    """
+
+    url = "email-key-map-delta"
+    idempotent = True
+
+    request_params = {
+        'group_uuid': str,
+        'user': str,
+        'request_type': str,
+        'cursor': int,
+        'signature': str
+    }
+
+    response_params = {
+        'members': list,
+        'cursor': int
+    }
+
+    signature_formats = {
+        'user': ['group_uuid', 'request_type', 'cursor'],
+    }
+
+
 class MainServerJoin(Message):
     """
     Sent to the Main Server by a user to join a group in the Main server.
@@ -114,6 +169,7 @@ class MainServerJoin(Message):
     """
 
     url = "join-group"
+    idempotent = True
 
     request_params = {
         'group_uuid': str,
@@ -220,6 +276,7 @@ class GetPendingUOMes(Message):
     """
 
     url = "get-pending-uomes"
+    idempotent = True
 
     request_params = {
         'group_uuid': str,
@@ -263,10 +320,46 @@ class AcceptUOMe(Message):
     }
 
 
+class GetInclusionProof(Message):
+    """
+    Sent to the Main Server by a user to get the proof that an accepted UOMe is
+    in the ledger of the group: a Merkle tree over the accepted UOMes (see
+    utils.crypto.merkle). The main server only signs the root of the ledger,
+    which commits to every UOMe in it.
+    """
+
+    url = "get-inclusion-proof"
+    idempotent = True
+
+    request_params = {
+        'group_uuid': str,
+        'user': str,
+        'uome_uuid': str,
+        'user_signature': str
+    }
+
+    response_params = {
+        'leaf_index': int,
+        'tree_size': int,
+        'root': str,  # hex
+        'proof': list,  # of hex hashes
+        'main_signature': str
+    }
+
+    signature_formats = {
+        'user': ['group_uuid', 'user', 'uome_uuid'],
+        'main': ['group_uuid', 'tree_size', 'root'],
+    }
+
+
 class CheckTotals(Message):
     """
     Sent to the Main Server by a user to get his total debt and the suggested amounts
     he should pay to each person.
+
+    The balance is always up to date, the suggestions may lag behind it when the
+    server settles the groups in the background: they were computed when the
+    group had accepted 'settlement_version' UOMes.
     """
     # TODO: From my experience in my group of friends it would also be useful to list
     # the users to whom the user can pay his debt in full, trading global optimality for
@@ -274,6 +367,7 @@ class CheckTotals(Message):
     # all the users in the group. Probably for after the course is done.
 
     url = "get-totals"
+    idempotent = True
 
     request_params = {
         'group_uuid': str,
@@ -283,7 +377,8 @@ class CheckTotals(Message):
 
     response_params = {
         'user_balance': int,
-        'suggested_transactions': dict
+        'suggested_transactions': dict,
+        'settlement_version': int
     }
 
     # TODO: Check if the signature can be abused by the Group Server, if it's the same
@@ -1,11 +1,14 @@
-from unittest.mock import Mock, MagicMock
+import gzip
+import http.client
+import zlib
+from unittest.mock import Mock, MagicMock, patch
 
 import pytest
 from pytest import raises
 
 from utils.messages.connection import Connection, BadRequestError, \
     UnauthorizedError, ForbiddenError, ConflictError, NotFoundError, \
-    UnknownError
+    UnknownError, ConnectionPool
 from utils.messages.message import Message
 from utils.messages.testing_utils import fake_http_response
 
@@ -25,8 +28,14 @@ class FakeMessage(Message):
         return b"{}"
 
 
-def fake_http_connection(response_status=200, response_body=b"{}"):
-    http_response = fake_http_response(response_status, response_body)
+class FakeIdempotentMessage(FakeMessage):
+    """ Fake message of a request that can be sent again """
+
+    idempotent = True
+
+
+def fake_http_connection(response_status=200, response_body=b"{}", headers=None):
+    http_response = fake_http_response(response_status, response_body, headers)
     connection = Mock()
     connection.getresponse = MagicMock(return_value=http_response)
 
@@ -58,3 +67,110 @@ class TestConnection:
         with raises(exception):
             connection.get_response(FakeMessage)
 
+    @pytest.mark.parametrize("encoding, compress", (
+            ('gzip', gzip.compress),
+            ('deflate', zlib.compress),
+    ))
+    def test_get_response_CompressedBody_IsDecoded(self, encoding, compress):
+        connection = Connection("http://url.com", fake_http_connection(
+            response_body=compress(b'{"value": 1}'),
+            headers={'Content-Encoding': encoding}))
+
+        class ValueMessage(FakeMessage):
+            response_params = {'value': int}
+
+        assert connection.get_response(ValueMessage).value == 1
+
+    def test_get_response_UnsupportedEncoding_RaisesUnknownError(self):
+        connection = Connection("http://url.com", fake_http_connection(
+            headers={'Content-Encoding': 'br'}))
+
+        with raises(UnknownError):
+            connection.get_response(FakeMessage)
+
+    def test_request_AcceptsCompressedResponses(self):
+        http_connection = Mock()
+        connection = Connection("http://url.com", http_connection)
+
+        connection.request(FakeMessage.make_request())
+
+        headers = http_connection.request.call_args[1]['headers']
+        assert headers['Accept-Encoding'] == "gzip, deflate"
+
+
+class TestConnectionPool:
+
+    def test_connect_TwoConsecutiveConnections_ReuseTheSameHTTPConnection(self):
+        with patch('utils.messages.connection.http.HTTPConnection') as http_connection:
+            pool = ConnectionPool("url.com:8000")
+
+            with pool.connect() as connection:
+                first = connection._http_connection
+            with pool.connect() as connection:
+                second = connection._http_connection
+
+        assert first is second
+        http_connection.assert_called_once_with("url.com:8000", timeout=None)
+
+    def test_connect_ErrorInsideTheBlock_ConnectionIsClosedAndNotReused(self):
+        with patch('utils.messages.connection.http.HTTPConnection',
+                   side_effect=lambda *args, **kwargs: Mock()):
+            pool = ConnectionPool("url.com:8000")
+
+            with raises(ConflictError):
+                with pool.connect() as connection:
+                    broken = connection._http_connection
+                    raise ConflictError()
+
+            with pool.connect() as connection:
+                assert connection._http_connection is not broken
+
+        broken.close.assert_called_once_with()
+
+    def test_connect_ReusedConnectionClosedByTheServer_RequestIsSentAgainOnANewOne(self):
+        stale = fake_http_connection()
+        stale.getresponse.side_effect = http.client.RemoteDisconnected()
+        fresh = fake_http_connection()
+
+        with patch('utils.messages.connection.http.HTTPConnection',
+                   side_effect=[stale, fresh]):
+            pool = ConnectionPool("url.com:8000")
+            with pool.connect():
+                pass
+
+            with pool.connect() as connection:
+                connection.request(FakeIdempotentMessage.make_request())
+                connection.get_response(FakeIdempotentMessage)
+
+            with pool.connect() as connection:
+                assert connection._http_connection is fresh
+
+        stale.close.assert_called_once_with()
+        fresh.request.assert_called_once()
+
+    def test_connect_ReusedConnectionClosedAfterANonIdempotentRequest_ErrorIsRaised(self):
+        stale = fake_http_connection()
+        stale.getresponse.side_effect = http.client.RemoteDisconnected()
+
+        with patch('utils.messages.connection.http.HTTPConnection', side_effect=[stale]):
+            pool = ConnectionPool("url.com:8000")
+            with pool.connect():
+                pass
+
+            with raises(http.client.RemoteDisconnected):
+                with pool.connect() as connection:
+                    connection.request(FakeMessage.make_request())
+                    connection.get_response(FakeMessage)
+
+        stale.request.assert_called_once()
+
+    def test_connect_NewConnectionClosedByTheServer_ErrorIsRaised(self):
+        stale = fake_http_connection()
+        stale.request.side_effect = BrokenPipeError()
+
+        with patch('utils.messages.connection.http.HTTPConnection', side_effect=[stale]):
+            pool = ConnectionPool("url.com:8000")
+
+            with raises(BrokenPipeError):
+                with pool.connect() as connection:
+                    connection.request(FakeMessage.make_request())
@@ -192,7 +192,49 @@ class TestMessageSignatures:
         with raises(InvalidSignature):
             test_class.verify(example_pub_key, 'a', "a", a=42)
 
+    def test_sign_chunks_verifies_as_the_joined_values(self):
+        test_class = type('TestClass', (Message,), {'url': 'test',
+                                                    'request_params': {'a': str},
+                                                    'response_params': {'a': str},
+                                                    'signature_formats': {'a': ['a', 'b']}})
+
+        signature = test_class.sign_chunks(example_key, 'a', a=10,
+                                           b=iter(['[1, ', '"x"', ']']))
+        test_class.verify(example_pub_key, 'a', signature, a=10, b='[1, "x"]')
+
+    def test_submit_sign_chunks_verifies_as_the_joined_values(self):
+        test_class = type('TestClass', (Message,), {'url': 'test',
+                                                    'request_params': {'a': str},
+                                                    'response_params': {'a': str},
+                                                    'signature_formats': {'a': ['a', 'b']}})
+
+        future = test_class.submit_sign(example_key, 'a', a=10, b=iter(['[1, ', '"x"', ']']))
+        test_class.verify(example_pub_key, 'a', future.result(), a=10, b='[1, "x"]')
+
+    def test_sign_chunks_missing_parameter(self):
+        test_class = type('TestClass', (Message,), {'url': 'test',
+                                                    'request_params': {'a': str},
+                                                    'response_params': {'a': str},
+                                                    'signature_formats': {'a': ['a']}})
+
+        with raises(AttributeError):
+            test_class.sign_chunks(example_key, 'a')
 
+    def test_signature_values_in_format_order(self):
+        test_class = type('TestClass', (Message,), {'url': 'test',
+                                                    'request_params': {'a': str},
+                                                    'response_params': {'a': str},
+                                                    'signature_formats': {'a': ['b', 'a'],
+                                                                          'b': ['a']}})
 
+        assert test_class._order_signature_parameters('a', a=1, b=2, c=3) == ['2', '1']
+        assert test_class._order_signature_parameters('b', a=1, b=2) == ['1']
 
+    def test_sign_unknown_signature_name(self):
+        test_class = type('TestClass', (Message,), {'url': 'test',
+                                                    'request_params': {'a': str},
+                                                    'response_params': {'a': str},
+                                                    'signature_formats': {'a': ['a']}})
 
+        with raises(KeyError):
+            test_class.sign(example_key, 'b', a=1)
@@ -4,10 +4,11 @@ from unittest.mock import Mock, MagicMock
 
 from pytest import fixture
 
-from utils.crypto.rsa import generate_keys, InvalidSignature
+from utils.crypto.key_pool import get_keys
+from utils.crypto.rsa import InvalidSignature
 
 
-example_key, example_pub_key = generate_keys()
+example_key, example_pub_key = get_keys(6)
 
 
 def fake_body(parameters: dict) -> str:
@@ -17,17 +18,22 @@ def fake_body(parameters: dict) -> str:
     return json.dumps(parameters)
 
 
-def fake_http_response(status=200, body=bytes()) -> HTTPResponse:
+def fake_http_response(status=200, body=bytes(), headers=None) -> HTTPResponse:
     """
     Creates a fake HTTP response.
 
     :param status:  status code of the response.
     :param body:    body of the response in bytes
+    :param headers: dict with the headers of the response.
     :return: fake http response (mock object)
     """
+    headers = headers or {}
+
     http_response = Mock()
     http_response.status = status
     http_response.read = MagicMock(return_value=body)
+    http_response.getheader = Mock(side_effect=lambda name, default=None:
+                                   headers.get(name, default))
 
     # noinspection PyTypeChecker
     return http_response
@@ -1,6 +1,6 @@
 import json
 
-from utils.crypto import rsa
+from utils.crypto import merkle, rsa
 
 
 class UOMeTools:
@@ -16,3 +16,10 @@ class UOMeTools:
 
         array = [group_uuid, issuer, borrower, str(value), description, uome_uuid]
         return rsa.verify(public_key, signature, *array)
+
+    @staticmethod
+    def leaf(group_uuid, issuer, borrower, value, description, uome_uuid) -> bytes:
+        """ Hash of the UOMe as a leaf of the group's ledger (see utils.crypto.merkle) """
+
+        array = [group_uuid, issuer, borrower, str(value), description, uome_uuid]
+        return merkle.leaf_hash(rsa.encode(array))
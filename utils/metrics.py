@@ -0,0 +1,243 @@
+"""
+Cheap in-process metrics exposed in the Prometheus text format.
+
+Metrics are created with the 'counter', 'gauge' and 'histogram' functions,
+which register them in the process wide registry. Values that are already
+tracked somewhere else can be exported by registering a collector function
+with 'register_collector'. The 'render' function renders every registered
+metric in the text exposition format.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Label value used to fold the series of a metric once it reaches its limit
+OTHER = 'other'
+
+
+class _Metric:
+    """
+    << Abstract Class >>
+
+    Base of every metric type. A metric holds one series per combination of
+    label values. The number of series can be capped with 'max_series', in
+    that case further combinations are all accounted in a single series where
+    every label is set to OTHER.
+    """
+
+    type = None  # type: str
+
+    def __init__(self, name: str, documentation: str, labels=(), max_series=None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.max_series = max_series
+
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        key = tuple(str(labels[label]) for label in self.labels)
+
+        if self.max_series is not None and key not in self._series \
+                and len(self._series) >= self.max_series:
+            key = (OTHER,) * len(self.labels)
+
+        return key
+
+    def samples(self):
+        """ Yields a (name suffix, labels, value) tuple for each sample """
+        raise NotImplementedError()
+
+    def render(self) -> str:
+        lines = ["# HELP %s %s" % (self.name, self.documentation),
+                 "# TYPE %s %s" % (self.name, self.type)]
+
+        for suffix, labels, value in self.samples():
+            lines.append("%s%s%s %s" % (self.name, suffix, _format_labels(labels),
+                                        _format_value(value)))
+
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """ Value that only goes up, such as the number of requests """
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._series.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            series = list(self._series.items())
+
+        for key, value in sorted(series):
+            yield '_total', dict(zip(self.labels, key)), value
+
+
+class Gauge(_Metric):
+    """ Value that can go up and down, such as the size of a queue """
+
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        return self._series.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            series = list(self._series.items())
+
+        for key, value in sorted(series):
+            yield '', dict(zip(self.labels, key)), value
+
+
+class Histogram(_Metric):
+    """ Distribution of values, such as the duration of requests """
+
+    type = 'histogram'
+
+    DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, documentation: str, labels=(), buckets=None,
+                 max_series=None):
+        super().__init__(name, documentation, labels, max_series)
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+
+    def observe(self, value, **labels):
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            key = self._key(labels)
+            try:
+                counts, total = self._series[key]
+            except KeyError:
+                # one count per bucket plus the +Inf bucket
+                counts, total = [0] * (len(self.buckets) + 1), 0
+
+            counts[index] += 1
+            self._series[key] = counts, total + value
+
+    @contextmanager
+    def time(self, **labels):
+        """ Observes the time spent, in seconds, in the body of the block """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            series = [(key, list(counts), total)
+                      for key, (counts, total) in self._series.items()]
+
+        for key, counts, total in sorted(series):
+            labels = dict(zip(self.labels, key))
+
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield '_bucket', dict(labels, le=_format_value(bound)), cumulative
+
+            yield '_sum', labels, total
+            yield '_count', labels, cumulative
+
+
+#
+# Process wide registry
+#
+
+_metrics = {}  # type: {str: _Metric}
+_collectors = []
+_registry_lock = threading.Lock()
+
+
+def _register(metric_class, name, *args, **kwargs):
+    """
+    Creates and registers a metric. Registering a metric with a name already
+    registered returns the existing metric.
+    """
+    with _registry_lock:
+        try:
+            return _metrics[name]
+        except KeyError:
+            metric = _metrics[name] = metric_class(name, *args, **kwargs)
+            return metric
+
+
+def counter(name, documentation, labels=(), max_series=None) -> Counter:
+    return _register(Counter, name, documentation, labels, max_series=max_series)
+
+
+def gauge(name, documentation, labels=(), max_series=None) -> Gauge:
+    return _register(Gauge, name, documentation, labels, max_series=max_series)
+
+
+def histogram(name, documentation, labels=(), buckets=None,
+              max_series=None) -> Histogram:
+    return _register(Histogram, name, documentation, labels, buckets=buckets,
+                     max_series=max_series)
+
+
+def register_collector(collector):
+    """
+    Registers a function called at each rendering. The function must return
+    an iterable of metrics to render along with the registered ones.
+    """
+    with _registry_lock:
+        if collector not in _collectors:
+            _collectors.append(collector)
+
+
+def render() -> str:
+    """ Renders every metric in the Prometheus text exposition format """
+    with _registry_lock:
+        metrics = sorted(_metrics.values(), key=lambda metric: metric.name)
+        collectors = list(_collectors)
+
+    for collector in collectors:
+        metrics.extend(collector())
+
+    return "".join(metric.render() + "\n" for metric in metrics)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+
+    return "{%s}" % ",".join('%s="%s"' % (name, _escape(value))
+                             for name, value in labels.items())
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
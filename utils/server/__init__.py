@@ -0,0 +1,4 @@
+"""
+The server package includes the Django components shared by the main server
+and the group server, such as middleware and diagnostic views.
+"""
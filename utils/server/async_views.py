@@ -0,0 +1,55 @@
+"""
+Helpers of the async views, which the servers run in the event loop when
+they are deployed under ASGI.
+
+Async views must never block the event loop. Database queries are wrapped
+with 'database', which runs them in the sync thread of the request, where
+its database connection lives. Signing and verifying are awaited with
+'crypto', through the future of the crypto pool, and other CPU bound work
+is wrapped with 'in_executor', which runs it in a thread of the executor.
+"""
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed
+
+from utils import timing
+
+
+def require_POST(view):
+    """ Same as django.views.decorators.http.require_POST for async views """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def database(function):
+    """ Makes a function that queries the database awaitable """
+    return sync_to_async(function, thread_sensitive=True)
+
+
+def in_executor(function):
+    """ Makes a CPU bound function awaitable, it runs in the executor """
+    return sync_to_async(function, thread_sensitive=False)
+
+
+async def crypto(phase: str, submit, *args, **kwargs):
+    """
+    Awaits a cryptographic operation given the function that submits it to
+    the crypto pool, such as Message.submit_verify. The operation is
+    submitted from a thread of the executor, where its values are encoded
+    and hashed, and the future of the pool is awaited without holding that
+    thread. If the pool is disabled the operation runs in the executor.
+
+    :param phase: timing phase the wait is added to (see utils.timing).
+    """
+    with timing.phase(phase):
+        future = await in_executor(submit)(*args, **kwargs)
+        return await asyncio.wrap_future(future)
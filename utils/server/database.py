@@ -0,0 +1,133 @@
+"""
+Database configuration of the servers, selected with environment variables.
+
+    DATABASE_ENGINE        'sqlite' (default) or 'postgresql'
+    DATABASE_NAME          path of the SQLite file or name of the PostgreSQL database
+    DATABASE_USER          PostgreSQL user
+    DATABASE_PASSWORD      PostgreSQL password
+    DATABASE_HOST          PostgreSQL host (defaults to the local socket)
+    DATABASE_PORT          PostgreSQL port
+    DATABASE_CONN_MAX_AGE  seconds each connection is kept open and reused
+    DATABASE_POOLER        set to 'pgbouncer' when connecting through PgBouncer
+    SQLITE_BUSY_TIMEOUT    milliseconds a SQLite writer waits for a lock
+    DATABASE_SHARDS        number of databases the data is spread across
+
+PostgreSQL connections are persistent: each worker thread keeps its
+connection open for DATABASE_CONN_MAX_AGE seconds, so workers reuse a small
+pool of connections instead of connecting on every request. For a pool
+shared between processes, point the servers to a PgBouncer instance in
+transaction mode and set DATABASE_POOLER=pgbouncer.
+
+With more than one shard, the default database is the first shard and each
+additional shard is a database named after it (see 'shard_databases').
+
+SQLite connections are tuned for concurrency when they are created (see
+'configure_sqlite'): the WAL journal lets readers proceed while a writer
+commits, and writers wait for the lock instead of failing immediately.
+"""
+import os
+
+SQLITE = 'sqlite'
+POSTGRESQL = 'postgresql'
+
+DEFAULT_CONN_MAX_AGE = 60
+DEFAULT_SQLITE_BUSY_TIMEOUT = 5000
+
+
+def database_from_env(default_name: str, sqlite_path: str, environ=os.environ) -> dict:
+    """
+    Creates the settings of the default database from environment variables.
+
+    :param default_name: name of the PostgreSQL database if none is given.
+    :param sqlite_path:  path of the SQLite file if none is given.
+    :param environ:      environment variables to read the settings from.
+    :return: settings for the default entry of DATABASES.
+    :raise ValueError: if the engine is not supported.
+    """
+    engine = environ.get('DATABASE_ENGINE', SQLITE)
+
+    if engine == SQLITE:
+        busy_timeout = int(environ.get('SQLITE_BUSY_TIMEOUT',
+                                       DEFAULT_SQLITE_BUSY_TIMEOUT))
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': environ.get('DATABASE_NAME', sqlite_path),
+            'CONN_MAX_AGE': int(environ.get('DATABASE_CONN_MAX_AGE', 0)),
+            'OPTIONS': {
+                # seconds the sqlite3 module waits for a locked database
+                'timeout': busy_timeout / 1000,
+            },
+        }
+
+    elif engine == POSTGRESQL:
+        database = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': environ.get('DATABASE_NAME', default_name),
+            'USER': environ.get('DATABASE_USER', ''),
+            'PASSWORD': environ.get('DATABASE_PASSWORD', ''),
+            'HOST': environ.get('DATABASE_HOST', ''),
+            'PORT': environ.get('DATABASE_PORT', ''),
+            'CONN_MAX_AGE': int(environ.get('DATABASE_CONN_MAX_AGE',
+                                            DEFAULT_CONN_MAX_AGE)),
+        }
+
+        if environ.get('DATABASE_POOLER') == 'pgbouncer':
+            # server side cursors do not work with transaction pooling
+            database['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+        return database
+
+    else:
+        raise ValueError("unsupported database engine: %s" % engine)
+
+
+def shard_databases(default: dict, environ=os.environ) -> dict:
+    """
+    Creates the settings of the additional shards from the settings of the
+    default database, which is the first shard. Each shard is a copy of the
+    default database with its own name: 'db.sqlite3' becomes
+    'db.shard1.sqlite3' for SQLite and 'main_server' becomes
+    'main_server_shard1' for PostgreSQL.
+
+    :param default: settings of the default database.
+    :param environ: environment variables to read the number of shards from.
+    :return: settings of the additional shards, keyed by their alias.
+    :raise ValueError: if the number of shards is not positive.
+    """
+    count = int(environ.get('DATABASE_SHARDS', 1))
+    if count < 1:
+        raise ValueError("the number of shards must be positive: %d" % count)
+
+    shards = {}
+    for index in range(1, count):
+        database = dict(default, OPTIONS=dict(default.get('OPTIONS', {})))
+
+        if default['ENGINE'] == 'django.db.backends.sqlite3':
+            root, extension = os.path.splitext(default['NAME'])
+            database['NAME'] = '%s.shard%d%s' % (root, index, extension)
+        else:
+            database['NAME'] = '%s_shard%d' % (default['NAME'], index)
+
+        shards['shard%d' % index] = database
+
+    return shards
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Receiver of the 'connection_created' signal that tunes new SQLite
+    connections for concurrent access. Connections to other databases are
+    left untouched.
+    """
+    if connection.vendor != 'sqlite':
+        return
+
+    busy_timeout = int(connection.settings_dict.get('OPTIONS', {})
+                       .get('timeout', DEFAULT_SQLITE_BUSY_TIMEOUT / 1000) * 1000)
+
+    with connection.cursor() as cursor:
+        # WAL is persistent and does not apply to in-memory databases
+        cursor.execute('PRAGMA journal_mode=WAL')
+        # with WAL, NORMAL only syncs at checkpoints and is still corruption safe
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA busy_timeout=%d' % busy_timeout)
@@ -0,0 +1,315 @@
+import asyncio
+import cProfile
+import gzip
+import logging
+import os
+import random
+import time
+import zlib
+from contextlib import ExitStack
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from utils import metrics, timing
+
+logger = logging.getLogger(__name__)
+
+_requests = metrics.counter('http_requests', 'Requests handled per view and status code',
+                            labels=('view', 'status'))
+_request_duration = metrics.histogram('http_request_duration_seconds',
+                                      'Time spent handling requests per view',
+                                      labels=('view',))
+_requests_in_progress = metrics.gauge('http_requests_in_progress',
+                                      'Requests currently being handled')
+_response_bytes = metrics.counter('http_response_bytes',
+                                  'Bytes of the response bodies before compression',
+                                  labels=('encoding',))
+_compression_saved_bytes = metrics.counter('http_compression_saved_bytes',
+                                           'Bytes saved by compressing the response bodies',
+                                           labels=('encoding',))
+
+# supported content codings, in order of preference
+_ENCODINGS = {
+    'gzip': lambda content, level: gzip.compress(content, compresslevel=level, mtime=0),
+    'deflate': lambda content, level: zlib.compress(content, level),
+}
+
+
+class _QueryCounter:
+    """ Database execute wrapper that counts queries and the time they take """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - start
+
+
+class _AsyncCapable:
+    """
+    Base of the middleware that supports both sync and async requests. Under
+    ASGI, with every middleware async capable, async views run in the event
+    loop instead of being moved to a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._async = asyncio.iscoroutinefunction(get_response)
+
+        if self._async:
+            # makes Django see the middleware as a coroutine function
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self._async:
+            return self.__acall__(request)
+
+        return self.handle(request)
+
+    def handle(self, request):
+        raise NotImplementedError()
+
+    async def __acall__(self, request):
+        raise NotImplementedError()
+
+
+class TimingMiddleware(_AsyncCapable):
+    """
+    Records the time each request spends in each phase (decoding, verifying,
+    signing, simplifying and querying the database) and the number of
+    database queries it executes. The statistics are aggregated per endpoint
+    (see utils.timing) and a log line is written for every request.
+
+    Optionally, a sample of the requests is run under cProfile. The profile
+    is dumped to TIMING_PROFILE_DIR only if the request turns out to be slow.
+
+    Settings:
+        TIMING_SLOW_REQUEST: duration in seconds from which a request is slow.
+        TIMING_PROFILE_RATE: fraction of requests to profile, 0 disables it.
+        TIMING_PROFILE_DIR:  directory where the profiles are dumped.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.slow_request = getattr(settings, 'TIMING_SLOW_REQUEST', 0.5)
+        self.profile_rate = getattr(settings, 'TIMING_PROFILE_RATE', 0.0)
+        self.profile_dir = getattr(settings, 'TIMING_PROFILE_DIR', None)
+
+    def handle(self, request):
+        queries = _QueryCounter()
+        profiler = None
+        if self.profile_dir and random.random() < self.profile_rate:
+            profiler = cProfile.Profile()
+
+        timing.start()
+        start = time.perf_counter()
+        try:
+            with self._count_queries(queries):
+                if profiler:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler:
+                        profiler.disable()
+        finally:
+            duration = time.perf_counter() - start
+            phases = timing.stop()
+
+        self._report(request, response, duration, phases, queries)
+
+        if profiler and duration >= self.slow_request:
+            profile_name = "%s-%d.prof" % (_endpoint_name(request).replace(':', '-'),
+                                           int(time.time() * 1000))
+            profiler.dump_stats(os.path.join(self.profile_dir, profile_name))
+
+        return response
+
+    async def __acall__(self, request):
+        # async requests are not profiled: cProfile only sees one thread
+        queries = _QueryCounter()
+
+        timing.start()
+        start = time.perf_counter()
+        try:
+            # async views query the database from the request's sync thread
+            stack = await sync_to_async(self._count_queries)(queries)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            duration = time.perf_counter() - start
+            phases = timing.stop()
+
+        self._report(request, response, duration, phases, queries)
+
+        return response
+
+    @staticmethod
+    def _count_queries(queries) -> ExitStack:
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(queries))
+
+        return stack
+
+    def _report(self, request, response, duration, phases, queries):
+        phases['db'] = queries.time
+
+        endpoint = _endpoint_name(request)
+        timing.record(endpoint, duration, phases, queries.count)
+
+        level = logging.WARNING if duration >= self.slow_request else logging.INFO
+        logger.log(level, "%s %d %.1fms queries=%d %s", endpoint,
+                   response.status_code, duration * 1000, queries.count,
+                   " ".join("%s=%.1fms" % (name, phase_time * 1000)
+                            for name, phase_time in sorted(phases.items())))
+
+
+class MetricsMiddleware(_AsyncCapable):
+    """
+    Counts the requests handled by each view per status code and observes
+    how long they take. Requests that do not match any view are accounted
+    under the 'unresolved' view to keep the number of series bounded.
+    """
+
+    def handle(self, request):
+        _requests_in_progress.inc()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _requests_in_progress.dec()
+
+        return self._record(request, response, start)
+
+    async def __acall__(self, request):
+        _requests_in_progress.inc()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _requests_in_progress.dec()
+
+        return self._record(request, response, start)
+
+    @staticmethod
+    def _record(request, response, start):
+        view = _endpoint_name(request, default='unresolved')
+        _request_duration.observe(time.perf_counter() - start, view=view)
+        _requests.inc(view=view, status=response.status_code)
+
+        return response
+
+
+class CompressionMiddleware(_AsyncCapable):
+    """
+    Compresses the response bodies with gzip or deflate (zlib), whichever the
+    client prefers according to its Accept-Encoding header. Small bodies and
+    streaming responses are sent as they are. The bytes of the bodies and the
+    bytes saved are counted per encoding.
+
+    Settings:
+        COMPRESSION_MIN_SIZE: size in bytes from which the bodies are compressed.
+        COMPRESSION_LEVEL:    zlib compression level, from 1 (fastest) to 9.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.level = getattr(settings, 'COMPRESSION_LEVEL', 6)
+
+    def handle(self, request):
+        return self._compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._compress(request, await self.get_response(request))
+
+    def _compress(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+
+        size = len(response.content)
+        if size < self.min_size:
+            _response_bytes.inc(size, encoding='identity')
+            return response
+
+        # the body sent depends on the Accept-Encoding header of the request
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            _response_bytes.inc(size, encoding='identity')
+            return response
+
+        with timing.phase('compress'):
+            content = _ENCODINGS[encoding](response.content, self.level)
+
+        if len(content) >= size:
+            _response_bytes.inc(size, encoding='identity')
+            return response
+
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+
+        _response_bytes.inc(size, encoding=encoding)
+        _compression_saved_bytes.inc(size - len(content), encoding=encoding)
+
+        return response
+
+
+def negotiate_encoding(accept_encoding: str):
+    """
+    Chooses the content coding of a response from the Accept-Encoding header
+    of the request, e.g. "gzip;q=0.5, deflate".
+
+    :return: the supported coding with the highest quality value or None if
+             the client accepts none of them.
+    """
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, _, parameters = item.partition(';')
+        quality = 1.0
+
+        parameter = parameters.strip().replace(' ', '')
+        if parameter.startswith('q='):
+            try:
+                quality = float(parameter[2:])
+            except ValueError:
+                quality = 0.0
+
+        qualities[coding.strip().lower()] = quality
+
+    default = qualities.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for coding in _ENCODINGS:
+        quality = qualities.get(coding, default)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+
+    return best
+
+
+def _endpoint_name(request, default=None) -> str:
+    """
+    Name of the view that handled the request. If no view did, returns the
+    default or the request's path if no default is given.
+    """
+    if getattr(request, 'resolver_match', None):
+        return request.resolver_match.view_name
+
+    return default or request.path
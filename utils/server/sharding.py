@@ -0,0 +1,53 @@
+"""
+Routing of the data of each group to one of several databases (shards).
+
+No query of the servers spans more than one group, so the data of each group
+can be kept in a single shard. The shard of a group is given by a
+deterministic shard map (see 'shard_for'): every process maps a group to the
+same shard without coordination. Adding a shard only moves the groups that
+the map assigns to the new shard.
+
+The shard used by the queries of the current context (a thread or an async
+task) is selected with 'use_shard' and read by the database routers with
+'current_shard'.
+"""
+import contextvars
+import hashlib
+from contextlib import contextmanager
+from uuid import UUID
+
+_current = contextvars.ContextVar('shard', default=None)
+
+
+def shard_for(group_uuid, shards) -> str:
+    """
+    Returns the shard of a group according to the shard map. Uses rendezvous
+    hashing: each shard gets a score computed from its name and the group's
+    uuid and the shard with the highest score holds the group.
+
+    :param group_uuid: uuid of the group, as a UUID or a string.
+    :param shards:     names of the shards.
+    :return: name of the shard of the group.
+    :raise ValueError: if the uuid is not valid.
+    """
+    group = UUID(str(group_uuid)).bytes
+
+    return max(shards, key=lambda shard: hashlib.sha256(shard.encode() + group).digest())
+
+
+def current_shard():
+    """ Returns the shard selected for the current context or None """
+    return _current.get()
+
+
+@contextmanager
+def use_shard(shard: str):
+    """
+    Context manager that routes the queries of the current context to the
+    given shard. Can be nested, the previous shard is restored on exit.
+    """
+    token = _current.set(shard)
+    try:
+        yield shard
+    finally:
+        _current.reset(token)
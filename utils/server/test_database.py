@@ -0,0 +1,76 @@
+from pytest import raises
+
+from utils.server.database import database_from_env, shard_databases
+
+
+class TestDatabaseFromEnv:
+
+    def test_NoEnvironment_UsesSQLiteAtTheDefaultPath(self):
+        database = database_from_env('main_server', '/srv/db.sqlite3', environ={})
+
+        assert database['ENGINE'] == 'django.db.backends.sqlite3'
+        assert database['NAME'] == '/srv/db.sqlite3'
+        assert database['OPTIONS']['timeout'] == 5
+
+    def test_SQLiteWithBusyTimeout_TimeoutIsConvertedToSeconds(self):
+        database = database_from_env('main_server', '/srv/db.sqlite3',
+                                     environ={'SQLITE_BUSY_TIMEOUT': '1500'})
+
+        assert database['OPTIONS']['timeout'] == 1.5
+
+    def test_PostgreSQL_UsesPersistentConnections(self):
+        database = database_from_env('main_server', '/srv/db.sqlite3', environ={
+            'DATABASE_ENGINE': 'postgresql',
+            'DATABASE_USER': 'bank',
+            'DATABASE_HOST': 'db.local',
+        })
+
+        assert database['ENGINE'] == 'django.db.backends.postgresql'
+        assert database['NAME'] == 'main_server'
+        assert database['USER'] == 'bank'
+        assert database['HOST'] == 'db.local'
+        assert database['CONN_MAX_AGE'] == 60
+        assert 'DISABLE_SERVER_SIDE_CURSORS' not in database
+
+    def test_PostgreSQLThroughPgBouncer_DisablesServerSideCursors(self):
+        database = database_from_env('main_server', '/srv/db.sqlite3', environ={
+            'DATABASE_ENGINE': 'postgresql',
+            'DATABASE_POOLER': 'pgbouncer',
+        })
+
+        assert database['DISABLE_SERVER_SIDE_CURSORS'] is True
+
+    def test_UnsupportedEngine_RaisesValueError(self):
+        with raises(ValueError):
+            database_from_env('main_server', '/srv/db.sqlite3',
+                              environ={'DATABASE_ENGINE': 'oracle'})
+
+
+class TestShardDatabases:
+
+    def test_NoEnvironment_HasNoAdditionalShards(self):
+        default = database_from_env('main_server', '/srv/db.sqlite3', environ={})
+
+        assert shard_databases(default, environ={}) == {}
+
+    def test_SQLiteShards_AreFilesNextToTheDefaultDatabase(self):
+        default = database_from_env('main_server', '/srv/db.sqlite3', environ={})
+
+        shards = shard_databases(default, environ={'DATABASE_SHARDS': '3'})
+
+        assert sorted(shards) == ['shard1', 'shard2']
+        assert shards['shard2']['NAME'] == '/srv/db.shard2.sqlite3'
+        assert shards['shard2']['OPTIONS'] == default['OPTIONS']
+        assert default['NAME'] == '/srv/db.sqlite3'
+
+    def test_PostgreSQLShards_AreDatabasesNamedAfterTheDefault(self):
+        default = database_from_env('main_server', '/srv/db.sqlite3',
+                                    environ={'DATABASE_ENGINE': 'postgresql'})
+
+        shards = shard_databases(default, environ={'DATABASE_SHARDS': '2'})
+
+        assert shards['shard1']['NAME'] == 'main_server_shard1'
+
+    def test_NoShards_RaisesValueError(self):
+        with raises(ValueError):
+            shard_databases({}, environ={'DATABASE_SHARDS': '0'})
@@ -0,0 +1,19 @@
+from utils.server.middleware import negotiate_encoding
+
+
+class TestNegotiateEncoding:
+
+    def test_NoHeader_ReturnsNone(self):
+        assert negotiate_encoding('') is None
+
+    def test_BothAccepted_PrefersGzip(self):
+        assert negotiate_encoding('deflate, gzip') == 'gzip'
+
+    def test_QualityValues_ChooseTheHighest(self):
+        assert negotiate_encoding('gzip;q=0.5, deflate') == 'deflate'
+
+    def test_ZeroQuality_IsNotAccepted(self):
+        assert negotiate_encoding('gzip;q=0, br') is None
+
+    def test_Wildcard_AcceptsTheUnlistedCodings(self):
+        assert negotiate_encoding('gzip;q=0, *') == 'deflate'
@@ -0,0 +1,46 @@
+from collections import Counter
+from uuid import uuid4
+
+from pytest import raises
+
+from utils.server.sharding import current_shard, shard_for, use_shard
+
+
+class TestShardFor:
+
+    def test_SameGroup_AlwaysMapsToTheSameShard(self):
+        group_uuid = uuid4()
+
+        assert shard_for(group_uuid, ['a', 'b', 'c']) == \
+            shard_for(str(group_uuid), ['c', 'b', 'a'])
+
+    def test_ManyGroups_AreSpreadAcrossAllShards(self):
+        shards = Counter(shard_for(uuid4(), ['a', 'b', 'c']) for _ in range(300))
+
+        assert set(shards) == {'a', 'b', 'c'}
+        assert min(shards.values()) > 50
+
+    def test_AddingAShard_OnlyMovesGroupsToTheNewShard(self):
+        groups = [uuid4() for _ in range(200)]
+
+        for group in groups:
+            before = shard_for(group, ['a', 'b'])
+            after = shard_for(group, ['a', 'b', 'c'])
+            assert after in (before, 'c')
+
+    def test_InvalidUUID_RaisesValueError(self):
+        with raises(ValueError):
+            shard_for('not a uuid', ['a'])
+
+
+class TestUseShard:
+
+    def test_NestedShards_RestoreThePreviousShardOnExit(self):
+        assert current_shard() is None
+
+        with use_shard('a'):
+            with use_shard('b'):
+                assert current_shard() == 'b'
+            assert current_shard() == 'a'
+
+        assert current_shard() is None
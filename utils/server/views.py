@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from utils import metrics, timing
+
+# diagnostic views are only served to requests coming from the local machine
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+
+def _is_local(request) -> bool:
+    return request.META.get('REMOTE_ADDR') in LOCAL_ADDRESSES
+
+
+@require_GET
+def timing_stats(request):
+    """ Returns the timing statistics of each endpoint in JSON format """
+    if not _is_local(request):
+        return HttpResponseForbidden()
+
+    return JsonResponse(timing.snapshot())
+
+
+@require_GET
+def metrics_text(request):
+    """
+    Returns every metric in the Prometheus text format. Only the addresses
+    in the METRICS_ALLOWED_ADDRESSES setting may scrape the metrics.
+    """
+    allowed = getattr(settings, 'METRICS_ALLOWED_ADDRESSES', LOCAL_ADDRESSES)
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4')
@@ -0,0 +1,85 @@
+import array
+
+from pytest import fixture, raises
+
+from utils import columnar
+
+
+class TestColumnar:
+
+    @fixture
+    def path(self, tmpdir):
+        return str(tmpdir.join("ledger.cols"))
+
+    @fixture
+    def written(self, path):
+        columnar.write(path, {'group': 'test'}, {
+            'users': {
+                'key': ('str', ["C1", "C2", "çé"]),
+                'balance': ('q', [-10, 7, 3]),
+            },
+            'uomes': {
+                'borrower': ('I', array.array('I', [0, 0, 1, 2])),
+                'value': ('I', [1, 2, 3, 4]),
+                'uuid': ('16s', [bytes([i]) * 16 for i in range(4)]),
+            },
+        })
+        return path
+
+    def test_WrittenFile_MetadataAndColumnsAreReadBack(self, written):
+        with columnar.ColumnarFile(written) as file:
+            users = file['users']
+
+            assert file.metadata == {'group': 'test'}
+            assert len(users) == 3
+            assert list(users['key']) == ["C1", "C2", "çé"]
+            assert users['key'][-1] == "çé"
+            assert list(users['balance']) == [-10, 7, 3]
+            assert file['uomes']['uuid'][3] == b'\x03' * 16
+
+    def test_IntegerColumns_AreViewsOfTheMappedFile(self, written):
+        with columnar.ColumnarFile(written) as file:
+            values = file['uomes']['value']
+
+            assert isinstance(values, memoryview)
+            assert sum(values) == 10
+            values.release()
+
+    def test_EmptyTable_HasNoRows(self, path):
+        columnar.write(path, {}, {'uomes': {'value': ('I', []), 'note': ('str', [])}})
+
+        with columnar.ColumnarFile(path) as file:
+            assert len(file['uomes']) == 0
+            assert list(file['uomes']['note']) == []
+
+    def test_ColumnsWithDifferentLengths_RaiseValueError(self, path):
+        with raises(ValueError):
+            columnar.write(path, {}, {'uomes': {'a': ('I', [1]), 'b': ('I', [1, 2])}})
+
+    def test_NotAColumnarFile_RaisesFormatError(self, path):
+        with open(path, 'wb') as file:
+            file.write(b'{"not": "columnar"}')
+
+        with raises(columnar.FormatError):
+            columnar.ColumnarFile(path)
+
+    def test_FileTruncatedInTheHeader_RaisesFormatError(self, written):
+        with open(written, 'rb') as file:
+            data = file.read()
+
+        for length in (len(columnar.MAGIC) + 4, len(columnar.MAGIC) + 16):
+            with open(written, 'wb') as file:
+                file.write(data[:length])
+
+            with raises(columnar.FormatError):
+                columnar.ColumnarFile(written)
+
+    def test_FileTruncatedInAColumn_RaisesFormatError(self, written):
+        with open(written, 'rb') as file:
+            data = file.read()
+        with open(written, 'wb') as file:
+            file.write(data[:-8])
+
+        with columnar.ColumnarFile(written) as file:
+            with raises(columnar.FormatError):
+                file['uomes']['uuid']
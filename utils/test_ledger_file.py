@@ -0,0 +1,95 @@
+import os
+import threading
+
+from pytest import fixture
+
+from utils import ledger_file
+from utils.ledger_file import Entry
+
+
+def entry(index: int, value: int = 1) -> Entry:
+    return Entry(ledger_index=index, accepted_at=1500000000000000 + index, value=value,
+                 uome_uuid=bytes([index]) * 16, lender="C1", borrower="çé",
+                 description="UOMe %d" % index)
+
+
+class TestLedgerFile:
+
+    @fixture
+    def writer(self, tmpdir):
+        writer = ledger_file.LedgerWriter(str(tmpdir), fsync_interval=0)
+        yield writer
+        writer.close()
+
+    def test_AppendedEntries_AreReadBackInOrder(self, writer):
+        entries = [entry(index, value) for index, value in enumerate((5, 7, 9))]
+        for item in entries:
+            writer.append('group', item)
+
+        assert list(ledger_file.LedgerReader(writer.path('group'))) == entries
+
+    def test_EmptyFile_HasNoEntries(self, writer):
+        open(writer.path('group'), 'wb').close()
+
+        assert list(ledger_file.LedgerReader(writer.path('group'))) == []
+
+    def test_TornRecord_StopsTheReadingAndIsTruncated(self, writer):
+        writer.append('group', entry(0))
+        writer.append('group', entry(1))
+        valid_size = os.path.getsize(writer.path('group'))
+
+        with open(writer.path('group'), 'ab') as file:
+            file.write(ledger_file.encode(entry(2))[:-3])
+
+        assert len(list(ledger_file.LedgerReader(writer.path('group')))) == 2
+        assert ledger_file.truncate(writer.path('group')) > 0
+        assert os.path.getsize(writer.path('group')) == valid_size
+        assert ledger_file.truncate(writer.path('group')) == 0
+
+    def test_CorruptedRecord_FailsItsChecksum(self, writer):
+        writer.append('group', entry(0))
+        writer.append('group', entry(1))
+
+        with open(writer.path('group'), 'r+b') as file:
+            file.seek(-1, os.SEEK_END)
+            file.write(b'!')
+
+        reader = ledger_file.LedgerReader(writer.path('group'))
+        assert list(reader) == [entry(0)]
+        assert reader.end == len(ledger_file.encode(entry(0)))
+
+    def test_BatchedWriter_SyncsOnFlush(self, tmpdir):
+        writer = ledger_file.LedgerWriter(str(tmpdir), fsync_interval=60)
+        writer.append('group', entry(0))
+
+        assert writer._dirty
+        writer.flush()
+        assert not writer._dirty
+
+        writer.close()
+        assert list(ledger_file.LedgerReader(writer.path('group'))) == [entry(0)]
+
+    def test_TornRecordOfACrash_IsTruncatedBeforeAppendingAgain(self, tmpdir):
+        writer = ledger_file.LedgerWriter(str(tmpdir), fsync_interval=0)
+        writer.append('group', entry(0))
+        with open(writer.path('group'), 'ab') as file:
+            file.write(ledger_file.encode(entry(1))[:-3])
+        writer.close()
+
+        # the restarted server
+        writer = ledger_file.LedgerWriter(str(tmpdir), fsync_interval=0)
+        writer.append('group', entry(1))
+        writer.close()
+
+        assert list(ledger_file.LedgerReader(writer.path('group'))) == [entry(0), entry(1)]
+        assert ledger_file.truncate(writer.path('group')) == 0
+
+    def test_Close_StopsTheFlusherBeforeClosingTheFiles(self, tmpdir):
+        writer = ledger_file.LedgerWriter(str(tmpdir), fsync_interval=0.001)
+        for index in range(50):
+            writer.append('group', entry(index))
+            writer.close()
+
+        assert writer._flusher is None
+        assert not any(thread.name == 'ledger-fsync' for thread in threading.enumerate())
+        assert len(list(ledger_file.LedgerReader(writer.path('group')))) == 50
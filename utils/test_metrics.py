@@ -0,0 +1,51 @@
+from utils import metrics
+
+
+class TestMetrics:
+
+    def test_counter_IncrementedWithLabels_RendersTotalPerSeries(self):
+        counter = metrics.Counter('requests', 'Requests', labels=('status',))
+        counter.inc(status=200)
+        counter.inc(status=200)
+        counter.inc(status=401)
+
+        rendered = counter.render()
+
+        assert '# TYPE requests counter' in rendered
+        assert 'requests_total{status="200"} 2' in rendered
+        assert 'requests_total{status="401"} 1' in rendered
+
+    def test_counter_MaxSeriesReached_FoldsNewSeriesIntoOther(self):
+        counter = metrics.Counter('accepts', 'Accepts', labels=('group',), max_series=2)
+        for group in ('A', 'B', 'C', 'D'):
+            counter.inc(group=group)
+
+        assert counter.value(group='A') == 1
+        assert counter.value(group=metrics.OTHER) == 2
+
+    def test_histogram_ObservedValues_RendersCumulativeBuckets(self):
+        histogram = metrics.Histogram('latency', 'Latency', buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        rendered = histogram.render()
+
+        assert 'latency_bucket{le="0.1"} 1' in rendered
+        assert 'latency_bucket{le="1.0"} 2' in rendered
+        assert 'latency_bucket{le="+Inf"} 3' in rendered
+        assert 'latency_count 3' in rendered
+        assert 'latency_sum 5.55' in rendered
+
+    def test_gauge_LabelValueWithQuotes_IsEscaped(self):
+        gauge = metrics.Gauge('size', 'Size', labels=('name',))
+        gauge.set(3, name='a"b')
+
+        assert 'size{name="a\\"b"} 3' in gauge.render()
+
+    def test_counter_RegisteredTwice_ReturnsTheSameMetric(self):
+        first = metrics.counter('test_registered_twice', 'Test')
+        second = metrics.counter('test_registered_twice', 'Test')
+
+        assert first is second
+        assert 'test_registered_twice' in metrics.render()
@@ -0,0 +1,45 @@
+import time
+
+from utils import timing
+
+
+class TestTiming:
+
+    def test_phase_ThreadIsNotRecording_NothingIsRecorded(self):
+        with timing.phase('sign'):
+            pass
+
+        assert timing.stop() == {}
+
+    def test_phase_TwoPhasesWithTheSameName_DurationsAreAdded(self):
+        timing.start()
+
+        with timing.phase('sign'):
+            time.sleep(0.01)
+        with timing.phase('sign'):
+            time.sleep(0.01)
+
+        phases = timing.stop()
+        assert list(phases) == ['sign']
+        assert phases['sign'] >= 0.02
+
+    def test_timed_DecoratedFunction_RecordsPhaseAndReturnsResult(self):
+        @timing.timed('simplify')
+        def simplify(value):
+            return value * 2
+
+        timing.start()
+        assert simplify(21) == 42
+        assert 'simplify' in timing.stop()
+
+    def test_snapshot_TwoRequestsToOneEndpoint_ReturnsAverages(self):
+        timing.reset()
+        timing.record('get_totals', 0.2, {'verify': 0.1}, queries=3)
+        timing.record('get_totals', 0.4, {'verify': 0.3}, queries=5)
+
+        stats = timing.snapshot()['get_totals']
+        assert stats['requests'] == 2
+        assert abs(stats['avg_time'] - 0.3) < 1e-9
+        assert stats['max_time'] == 0.4
+        assert stats['avg_queries'] == 4
+        assert abs(stats['avg_phases']['verify'] - 0.2) < 1e-9
@@ -0,0 +1,133 @@
+"""
+Lightweight timing of the phases of a request.
+
+The code executed during a request marks its expensive phases (decoding the
+message, verifying or creating signatures, simplifying debt, ...) with the
+'phase' context manager or the 'timed' decorator. Durations are only
+recorded when the current context is recording, i.e. between a call to
+'start' and a call to 'stop'. Otherwise, marking a phase costs almost
+nothing. The recording follows the context of the request, so it includes
+the phases that async views run in executor threads.
+
+The aggregated durations per endpoint are kept in memory and can be
+obtained with 'snapshot'.
+"""
+import contextvars
+import functools
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+_phases = contextvars.ContextVar('timing_phases', default=None)
+
+
+def start():
+    """ Starts recording the phases executed in the current context """
+    _phases.set(defaultdict(float))
+
+
+def stop() -> dict:
+    """
+    Stops recording the phases executed in the current context.
+
+    :return: dict with the time spent, in seconds, in each phase.
+    """
+    phases = _phases.get()
+    _phases.set(None)
+
+    return dict(phases) if phases else {}
+
+
+@contextmanager
+def phase(name: str):
+    """ Adds the time spent in the body of the 'with' block to a phase """
+    phases = _phases.get()
+
+    if phases is None:
+        # the context is not recording
+        yield
+        return
+
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] += time.perf_counter() - start_time
+
+
+def timed(name: str):
+    """ Decorator that adds the time spent in the function to a phase """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+#
+# Aggregated statistics per endpoint
+#
+
+class EndpointStats:
+    """ Aggregated timing statistics of the requests to one endpoint """
+
+    def __init__(self):
+        self.requests = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.queries = 0
+        self.phases = defaultdict(float)
+
+    def add(self, duration: float, phases: dict, queries: int):
+        self.requests += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.queries += queries
+
+        for name, phase_time in phases.items():
+            self.phases[name] += phase_time
+
+    def to_dict(self) -> dict:
+        return {
+            'requests': self.requests,
+            'avg_time': self.total_time / self.requests,
+            'max_time': self.max_time,
+            'avg_queries': self.queries / self.requests,
+            'avg_phases': {name: phase_time / self.requests
+                           for name, phase_time in self.phases.items()},
+        }
+
+
+_stats = defaultdict(EndpointStats)
+_stats_lock = threading.Lock()
+
+
+def record(endpoint: str, duration: float, phases: dict, queries: int):
+    """
+    Adds a request to the statistics of an endpoint.
+
+    :param endpoint: name of the endpoint.
+    :param duration: total duration of the request in seconds.
+    :param phases:   time spent, in seconds, in each phase.
+    :param queries:  number of database queries executed.
+    """
+    with _stats_lock:
+        _stats[endpoint].add(duration, phases, queries)
+
+
+def snapshot() -> dict:
+    """ Returns the statistics of every endpoint in a dict """
+    with _stats_lock:
+        return {endpoint: stats.to_dict() for endpoint, stats in _stats.items()}
+
+
+def reset():
+    """ Clears the statistics of every endpoint """
+    with _stats_lock:
+        _stats.clear()